@@ -47,6 +47,7 @@ __email__ = 'hut@hut.pm'
 RANGERDIR = os.path.dirname(__file__)
 TICKS_BEFORE_COLLECTING_GARBAGE = 100
 TIME_BEFORE_FILE_BECOMES_GARBAGE = 1200
+TIME_BETWEEN_DIRECTORY_EVICTIONS = 1
 MAX_RESTORABLE_TABS = 3
 MACRO_DELIMITER = '%'
 MACRO_DELIMITER_ESC = '%%'
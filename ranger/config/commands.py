@@ -1898,13 +1898,71 @@ class flat(Command):
 class reset_previews(Command):
     """:reset_previews
 
-    Reset the file previews.
+    Reset the file previews, including the ones stored in the cache directory.
     """
     def execute(self):
-        self.fm.previews = {}
+        self.fm.previews.clear(disk=True)
         self.fm.ui.need_redraw = True
 
 
+class cache_stats(Command):
+    """:cache_stats
+
+    Show how much the caches of previews and image previews hold and how often
+    they were used.
+    """
+
+    def execute(self):
+        from ranger.ext.human_readable import human_readable
+
+        previews = self.fm.previews.get_stats()
+        thumbnails = self.fm.thumbnails.get_stats()
+        limit = thumbnails['limit']
+        lines = [
+            "Previews:",
+            "  {0} in memory, {1}".format(
+                previews['entries'], human_readable(previews['bytes'])),
+            "  {0} found in memory, {1} on disk, {2} generated".format(
+                previews['memory_hits'], previews['disk_hits'], previews['misses']),
+            "",
+            "Image previews:",
+            "  {0} images, {1} of {2}".format(
+                thumbnails['images'], human_readable(thumbnails['bytes']),
+                human_readable(limit) if limit else "unlimited"),
+            "  {0} found, {1} not found".format(thumbnails['hits'], thumbnails['misses']),
+        ]
+        pager = self.fm.ui.open_pager()
+        pager.set_source(lines)
+
+
+class cache_prune(Command):
+    """:cache_prune [<size>]
+
+    Remove the cached image previews of files that were changed or removed,
+    and the least recently shown ones beyond preview_images_cache_size, or
+    beyond the given size in MiB.  A size of 0 removes all of them.
+    """
+
+    def execute(self):
+        from ranger.ext.human_readable import human_readable
+
+        max_bytes = None
+        if self.arg(1):
+            try:
+                max_bytes = int(self.arg(1)) * 1024 * 1024
+            except ValueError:
+                max_bytes = -1
+            if max_bytes < 0:
+                self.fm.notify("The size must be a number of MiB", bad=True)
+                return
+        if max_bytes == 0:
+            count, size = self.fm.thumbnails.clear()
+        else:
+            count, size = self.fm.thumbnails.prune(max_bytes, check_sources=True)
+        self.fm.notify("Removed {0} image previews, {1}".format(
+            count, human_readable(size)))
+
+
 # Version control commands
 # --------------------------------
 
@@ -3,21 +3,27 @@
 
 from __future__ import (absolute_import, division, print_function)
 
+import bisect
 import locale
 import os.path
-from os import stat as os_stat, lstat as os_lstat
+try:
+    from os import scandir
+except ImportError:
+    scandir = None  # pylint: disable=invalid-name
 import random
 import re
 from collections import deque
 from time import time
 
-from ranger.container.fsobject import BAD_INFO, FileSystemObject
+from ranger.container.directory_entries import iter_stat_entries, mtimelevel, walklevel
+from ranger.container.fsobject import BAD_INFO, FileSystemObject, natural_sort_key
 from ranger.core import filter_stack
 from ranger.core.filter_stack import InodeFilterConstants, accept_file
-from ranger.core.loader import Loadable
+from ranger.core.loader import PRIORITY_DIRECTORY, CumulativeSizeLoader, Loadable
 from ranger.ext.mount_path import mount_path
 from ranger.container.file import File
 from ranger.ext.accumulator import Accumulator
+from ranger.ext.thread_pool import Job
 from ranger.ext.lazy_property import lazy_property
 from ranger.ext.human_readable import human_readable
 from ranger.container.settings import LocalSettings
@@ -31,7 +37,7 @@ def sort_by_basename(path):
 
 def sort_by_basename_icase(path):
     """returns case-insensitive path.relative_path (for sorting)"""
-    return path.relative_path_lower
+    return path.relative_path.lower()
 
 
 def sort_by_directory(path):
@@ -40,11 +46,11 @@ def sort_by_directory(path):
 
 
 def sort_naturally(path):
-    return path.basename_natural
+    return natural_sort_key(path.relative_path)
 
 
 def sort_naturally_icase(path):
-    return path.basename_natural_lower
+    return natural_sort_key(path.relative_path.lower())
 
 
 def sort_unicode_wrapper_string(old_sort_func):
@@ -59,25 +65,79 @@ def sort_unicode_wrapper_list(old_sort_func):
     return sort_unicode
 
 
-def walklevel(some_dir, level):
-    some_dir = some_dir.rstrip(os.path.sep)
-    followlinks = level > 0
-    assert os.path.isdir(some_dir)
-    num_sep = some_dir.count(os.path.sep)
-    for root, dirs, files in os.walk(some_dir, followlinks=followlinks):
-        yield root, dirs, files
-        num_sep_this = root.count(os.path.sep)
-        if level != -1 and num_sep + level <= num_sep_this:
-            del dirs[:]
+# Sort keys that don't look at the stat() of the files.  Directories sorted
+# by any of these can postpone stat()ing their entries until they're drawn.
+STAT_FREE_SORT_KEYS = frozenset(('basename', 'natural', 'random', 'type', 'extension'))
 
 
-def mtimelevel(path, level):
-    mtime = os.stat(path).st_mtime
-    for dirpath, dirnames, _ in walklevel(path, level):
-        dirlist = [os.path.join("/", dirpath, d) for d in dirnames
-                   if level == -1 or dirpath.count(os.path.sep) - path.count(os.path.sep) <= level]
-        mtime = max([mtime] + [os.stat(d).st_mtime for d in dirlist])
-    return mtime
+# Sort keys that only depend on the name of a file.  They are computed once
+# per file and sort mode and cached in FileSystemObject.sort_keys.
+CACHEABLE_SORT_KEYS = frozenset(('basename', 'natural', 'type', 'extension'))
+
+
+def cached_sort_key(sort_func, mode):
+    """Wraps sort_func to remember its result for each file in the given mode
+
+    The keys of all used modes are kept, so switching back and forth between
+    sort modes doesn't compute them again.  They are stored as a flat tuple
+    of modes and keys, which takes much less memory than a dict per file.
+    """
+    def sort_key(fobj):
+        keys = fobj.sort_keys
+        if keys is None:
+            key = sort_func(fobj)
+            fobj.sort_keys = (mode, key)
+            return key
+        for i in range(0, len(keys), 2):
+            if keys[i] == mode:
+                return keys[i + 1]
+        key = sort_func(fobj)
+        fobj.sort_keys = keys + (mode, key)
+        return key
+    return sort_key
+
+
+# A rough guess of the bytes that a loaded entry takes, including its File
+# object and strings.  See Directory.estimate_memory_usage()
+ESTIMATED_ENTRY_SIZE = 1024
+
+
+class ReversedSortKey(object):  # pylint: disable=too-few-public-methods
+    """Wraps a sort key to reverse the order"""
+    __slots__ = ('key',)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+    def __lt__(self, other):
+        return other.key < self.key
+
+
+class SortKeySequence(object):  # pylint: disable=too-few-public-methods
+    """The sort keys of a list of files, computed when accessed
+
+    This lets bisect search a sorted list of files with only a logarithmic
+    number of sort key calculations.
+    """
+
+    def __init__(self, files, key, reverse=False):
+        self.files = files
+        self.key = key
+        self.reverse = reverse
+
+    def get_key(self, fobj):
+        if self.reverse:
+            return ReversedSortKey(self.key(fobj))
+        return self.key(fobj)
+
+    def __len__(self):
+        return len(self.files)
+
+    def __getitem__(self, index):
+        return self.get_key(self.files[index])
 
 
 class Directory(  # pylint: disable=too-many-instance-attributes,too-many-public-methods
@@ -88,6 +148,7 @@ class Directory(  # pylint: disable=too-many-instance-attributes,too-many-public
     cycle_list = None
     loading = False
     progressbar_supported = True
+    priority_class = PRIORITY_DIRECTORY
     flat = 0
 
     filenames = None
@@ -100,7 +161,7 @@ class Directory(  # pylint: disable=too-many-instance-attributes,too-many-public
     scroll_begin = 0
 
     mount_path = '/'
-    disk_usage = 0
+    _disk_usage = 0
 
     last_update_time = -1
     load_content_mtime = -1
@@ -112,8 +173,15 @@ class Directory(  # pylint: disable=too-many-instance-attributes,too-many-public
     has_vcschild = False
     _vcs_signal_handler_installed = False
 
+    # Whether the fm.watcher notices changes of the content
+    watched = False
+
     cumulative_size_calculated = False
 
+    # Maps the paths of files_all to their inodes, if they were read with
+    # scandir().  Reloads compare them to tell which entries were replaced
+    entry_inodes = None
+
     sort_dict = {
         'basename': sort_by_basename,
         'natural': sort_naturally,
@@ -223,6 +291,26 @@ class Directory(  # pylint: disable=too-many-instance-attributes,too-many-public
     def get_list(self):
         return self.files
 
+    @property
+    def disk_usage(self):
+        """The summed up size of the contained files
+
+        Entries whose stat() was postponed while loading get loaded here.
+        """
+        if self._disk_usage is None:
+            disk_usage = 0
+            for fobj in self.files_all or ():
+                if not fobj.is_directory:
+                    fobj.load_once()
+                    disk_usage += fobj.size
+            self._disk_usage = disk_usage
+        return self._disk_usage
+
+    @disk_usage.setter
+    def disk_usage(self, value):
+        """Set to None to have it summed up again when needed"""
+        self._disk_usage = value
+
     def mark_item(self, item, val):
         item.mark_set(val)
         if val:
@@ -347,6 +435,7 @@ class Directory(  # pylint: disable=too-many-instance-attributes,too-many-public
         self.load_if_outdated()
 
         basename_is_rel_to = self.path if self.flat else None
+        cached_listing = None
 
         try:  # pylint: disable=too-many-nested-blocks
             if self.runnable:
@@ -355,9 +444,14 @@ class Directory(  # pylint: disable=too-many-instance-attributes,too-many-public
 
                 self.mount_path = mount_path(mypath)
 
+                # Watch the directories before reading them (or right after,
+                # in flat mode), so that changes made meanwhile aren't missed
+                self.fm.watcher.unwatch(self)
+                watched = True
                 if self.flat:
                     filelist = []
                     for dirpath, dirnames, filenames in walklevel(mypath, self.flat):
+                        watched = self.fm.watcher.watch(self, dirpath) and watched
                         dirlist = [
                             os.path.join("/", dirpath, d)
                             for d in dirnames
@@ -368,12 +462,31 @@ class Directory(  # pylint: disable=too-many-instance-attributes,too-many-public
                         filelist += dirlist
                         filelist += [os.path.join("/", dirpath, f) for f in filenames]
                     filenames = filelist
-                    self.load_content_mtime = mtimelevel(mypath, self.flat)
+                    entries = None
+                    if not watched:
+                        self.load_content_mtime = mtimelevel(mypath, self.flat)
                 else:
-                    filelist = os.listdir(mypath)
-                    filenames = [mypath + (mypath == '/' and fname or '/' + fname)
-                                 for fname in filelist]
-                    self.load_content_mtime = os.stat(mypath).st_mtime
+                    watched = self.fm.watcher.watch(self, mypath)
+                    # stat() before reading, so changes made in between
+                    # are noticed by load_content_if_outdated()
+                    dirstat = os.stat(mypath)
+                    self.load_content_mtime = dirstat.st_mtime
+                    if self.files_all is None and self.settings.cache_directory_listings:
+                        cached_listing = self.fm.listing_cache.get(mypath, dirstat)
+                    if cached_listing is not None:
+                        entries = None
+                        filelist = filenames = [result[0] for result in cached_listing]
+                    elif scandir is not None:
+                        entries = {}
+                        for entry in scandir(mypath):
+                            entries[mypath + (mypath == '/' and entry.name
+                                              or '/' + entry.name)] = entry
+                        filelist = filenames = list(entries)
+                    else:
+                        entries = None
+                        filelist = os.listdir(mypath)
+                        filenames = [mypath + (mypath == '/' and fname or '/' + fname)
+                                     for fname in filelist]
 
                 if self.cumulative_size_calculated:
                     # If self.content_loaded is true, this is not the first
@@ -397,36 +510,61 @@ class Directory(  # pylint: disable=too-many-instance-attributes,too-many-public
 
                 marked_paths = [obj.path for obj in self.marked_items]
 
+                # On a reload, only the entries that were added or replaced
+                # need to be stat()ed.  An entry was replaced, e.g. by an
+                # editor that saves by renaming a new file over the old one,
+                # if its inode changed.  The others keep their objects,
+                # removed ones are dropped.  Listings from the cache or from
+                # flat mode are always fully reloaded.
+                inodes = None if entries is None else \
+                    dict((path, entry.inode()) for path, entry in entries.items())
+                incremental = self.files_all is not None and inodes is not None \
+                    and self.entry_inodes is not None
+                if incremental:
+                    old_inodes = self.entry_inodes
+                    new_filenames = [path for path in filenames
+                                     if old_inodes.get(path) != inodes[path]]
+                    removed_filenames = set(old_inodes).difference(filenames)
+                    removed_filenames.update(path for path in new_filenames
+                                             if path in old_inodes)
+                else:
+                    new_filenames = filenames
+
                 files = []
                 disk_usage = 0
-
-                has_vcschild = False
-                for name in filenames:
-                    try:
-                        file_lstat = os_lstat(name)
-                        if file_lstat.st_mode & 0o170000 == 0o120000:
-                            file_stat = os_stat(name)
-                        else:
-                            file_stat = file_lstat
-                    except OSError:
-                        file_lstat = None
-                        file_stat = None
-                    if file_lstat and file_stat:
-                        stats = (file_stat, file_lstat)
-                        is_a_dir = file_stat.st_mode & 0o170000 == 0o040000
-                    else:
-                        stats = None
-                        is_a_dir = False
+                # Without a stat-based sort key, the d_type of the directory
+                # entries is all we need for now.  The stat() of each entry
+                # is postponed until something asks for it, see load_once().
+                defer_stat = entries is not None \
+                    and self.settings.sort in STAT_FREE_SORT_KEYS
+
+                if cached_listing is not None:
+                    # Nothing to stat(), everything is in the cache
+                    results = cached_listing
+                else:
+                    results = iter_stat_entries(self.fm.loader, new_filenames, entries,
+                                                defer_stat)
+                listing = []
+
+                has_vcschild = incremental and self.has_vcschild
+                for result in results:
+                    if isinstance(result, Job):
+                        yield result
+                        continue
+                    listing.append(result)
+                    name, stats, is_a_dir, deferred = result
 
                     if is_a_dir:
                         item = self.fm.get_directory(name, preload=stats, path_is_abs=True,
                                                      basename_is_rel_to=basename_is_rel_to)
-                        item.load_if_outdated()
+                        if not deferred or item.loaded:
+                            item.load_if_outdated()
                         if self.flat:
                             item.relative_path = os.path.relpath(item.path, self.path)
                         else:
                             item.relative_path = item.basename
                         item.relative_path_lower = item.relative_path.lower()
+                        item.sort_keys = None
                         if item.vcs and item.vcs.track:
                             if item.vcs.is_root_pointer:
                                 has_vcschild = True
@@ -439,33 +577,55 @@ class Directory(  # pylint: disable=too-many-instance-attributes,too-many-public
                     else:
                         item = File(name, preload=stats, path_is_abs=True,
                                     basename_is_rel_to=basename_is_rel_to)
-                        item.load()
-                        disk_usage += item.size
+                        if deferred:
+                            disk_usage = None
+                        else:
+                            item.load()
+                            if disk_usage is not None:
+                                disk_usage += item.size
                         if self.vcs and self.vcs.track:
                             item.vcsstatus = \
                                 self.vcs.rootvcs.status_subpath(  # pylint: disable=no-member
                                     os.path.join(self.realpath, item.basename))
 
                     files.append(item)
-                    self.percent = 100 * len(files) // len(filenames)
+                    self.percent = 100 * len(files) // len(new_filenames)
                     yield
                 self.has_vcschild = has_vcschild
-                self.disk_usage = disk_usage
-
-                self.filenames = filenames
-                self.files_all = files
-
-                self._clear_marked_items()
-                for item in self.files_all:
-                    if item.path in marked_paths:
-                        item.mark_set(True)
-                        self.marked_items.append(item)
-                    else:
-                        item.mark_set(False)
+                self.watched = watched
+                self.entry_inodes = inodes
+
+                if incremental:
+                    # The listing cache isn't updated here, since it needs
+                    # the stats of all entries
+                    self._disk_usage = None
+                    self.filenames = filenames
+                    self._update_files(files, removed_filenames)
+                    # Replaced entries stay marked
+                    for item in files:
+                        if item.path in marked_paths:
+                            item.mark_set(True)
+                            self.marked_items.append(item)
+                else:
+                    self._disk_usage = disk_usage
+                    if cached_listing is None and not self.flat \
+                            and self.settings.cache_directory_listings:
+                        self.fm.listing_cache.set(dirstat, listing)
+
+                    self.filenames = filenames
+                    self.files_all = files
+
+                    self._clear_marked_items()
+                    for item in self.files_all:
+                        if item.path in marked_paths:
+                            item.mark_set(True)
+                            self.marked_items.append(item)
+                        else:
+                            item.mark_set(False)
 
-                self.sort()
+                    self.sort()
 
-                if files:
+                if self.files_all:
                     if self.pointed_obj is not None:
                         self.sync_index()
                     else:
@@ -480,6 +640,11 @@ class Directory(  # pylint: disable=too-many-instance-attributes,too-many-public
             self.last_update_time = time()
             self.correct_pointer()
 
+            if cached_listing is not None:
+                # Show the cached listing for now and revalidate it with
+                # a regular load in the background
+                self.content_outdated = True
+
         finally:
             self.loading = False
             self.fm.signal_emit("finished_loading_dir", directory=self)
@@ -489,8 +654,34 @@ class Directory(  # pylint: disable=too-many-instance-attributes,too-many-public
 
     def unload(self):
         self.loading = False
+        # Without the inodes, the next load stat()s every entry again, so
+        # an explicit reload also notices files that changed in place
+        self.entry_inodes = None
+        if self.load_generator is not None:
+            # Cancels the jobs that are still queued in the thread pool
+            self.load_generator.close()
         self.load_generator = None
 
+    def unload_content(self):
+        """Forget the loaded files to free memory
+
+        The directory keeps its pointer, filters and settings, so it looks the
+        same once it's loaded again.
+        """
+        self.unload()
+        self.files_all = None
+        self.files = None
+        self.filenames = None
+        self.cycle_list = None
+        self.content_loaded = False
+        self.load_content_mtime = -1
+
+    def estimate_memory_usage(self):
+        """Returns a rough estimate of the bytes taken by the loaded files"""
+        if self.files_all is None:
+            return 0
+        return len(self.files_all) * ESTIMATED_ENTRY_SIZE
+
     def load_content(self, schedule=None):
         """Loads the contents of the directory.
 
@@ -526,12 +717,8 @@ class Directory(  # pylint: disable=too-many-instance-attributes,too-many-public
                     pass
                 self.load_generator = None
 
-    def sort(self):
-        """Sort the contained files"""
+    def _get_sort_func(self):
         # pylint: disable=comparison-with-callable
-        if self.files_all is None:
-            return
-
         try:
             sort_func = self.sort_dict[self.settings.sort]
         except KeyError:
@@ -552,37 +739,83 @@ class Directory(  # pylint: disable=too-many-instance-attributes,too-many-public
             elif sort_func in (sort_by_basename, sort_by_basename_icase):
                 sort_func = sort_unicode_wrapper_string(sort_func)
 
-        self.files_all.sort(key=sort_func)
+        return sort_func
 
-        if self.settings.sort_reverse:
-            self.files_all.reverse()
+    def _get_sort_key(self):
+        """Returns the key for sorting with reverse=self.settings.sort_reverse
 
-        if self.settings.sort_directories_first:
-            self.files_all.sort(key=sort_by_directory)
+        Besides the sort key of the sort option, it includes whether the
+        file is a directory, for sort_directories_first.
+        """
+        sort_func = self._get_sort_func()
+        directories_first = self.settings.sort_directories_first
+        reverse = self.settings.sort_reverse
+
+        if not directories_first:
+            sort_key = sort_func
+        elif reverse:
+            def sort_key(fobj):
+                return (fobj.is_directory, sort_func(fobj))
+        else:
+            def sort_key(fobj):
+                return (sort_by_directory(fobj), sort_func(fobj))
+
+        if self.settings.sort in CACHEABLE_SORT_KEYS:
+            # A string, since its hash is computed only once
+            sort_key = cached_sort_key(sort_key, '%s:%d%d%d%d' % (
+                self.settings.sort, bool(self.settings.sort_case_insensitive),
+                bool(self.settings.sort_unicode), bool(directories_first),
+                bool(directories_first and reverse)))
+        return sort_key
+
+    def load_entries(self):
+        """Load the entries whose stat() was postponed, see load_once()"""
+        for fobj in self.files_all or ():
+            fobj.load_once()
+
+    def sort(self):
+        """Sort the contained files"""
+        if self.files_all is None:
+            return
+
+        if self.settings.sort not in STAT_FREE_SORT_KEYS:
+            self.load_entries()
+
+        self.files_all.sort(key=self._get_sort_key(), reverse=self.settings.sort_reverse)
 
         self.refilter()
 
-    def _get_cumulative_size(self):
-        if self.size == 0:
-            return 0
-        cum = 0
-        realpath = os.path.realpath
-        for dirpath, _, filenames in os.walk(self.path, onerror=lambda _: None):
-            for fname in filenames:
-                try:
-                    if dirpath == self.path:
-                        stat = os_stat(realpath(dirpath + "/" + fname))
-                    else:
-                        stat = os_stat(dirpath + "/" + fname)
-                except OSError:
-                    continue
-                cum += stat.st_size
-        return cum
+    def _update_files(self, new_files, removed_paths):
+        """Add and remove files while keeping files_all sorted
+
+        The new files are inserted with bisect, unless there are so many
+        that sorting everything again is cheaper.
+        """
+        if removed_paths:
+            self.files_all = [fobj for fobj in self.files_all
+                              if fobj.path not in removed_paths]
+            self.marked_items[:] = [fobj for fobj in self.marked_items
+                                    if fobj.path not in removed_paths]
+        if len(new_files) > len(self.files_all) // 8:
+            self.files_all.extend(new_files)
+            self.sort()
+            return
+
+        if self.settings.sort not in STAT_FREE_SORT_KEYS:
+            for fobj in new_files:
+                fobj.load_once()
+        keys = SortKeySequence(self.files_all, self._get_sort_key(),
+                               reverse=self.settings.sort_reverse)
+        for fobj in new_files:
+            self.files_all.insert(bisect.bisect_right(keys, keys.get_key(fobj)), fobj)
+        self.refilter()
 
     def look_up_cumulative_size(self):
-        self.cumulative_size_calculated = True
-        self.size = self._get_cumulative_size()
-        self.infostring = ('-> ' if self.is_link else ' ') + human_readable(self.size)
+        """Calculate the cumulative size in the background"""
+        for item in self.fm.loader.queue:
+            if isinstance(item, CumulativeSizeLoader) and item.directory is self:
+                return
+        self.fm.loader.add(CumulativeSizeLoader(self), append=True)
 
     @lazy_property
     def size(self):  # pylint: disable=method-hidden
@@ -693,6 +926,10 @@ class Directory(  # pylint: disable=too-many-instance-attributes,too-many-public
             self.load_content(*a, **k)
             return True
 
+        if self.watched:
+            # The watcher sets content_outdated when something changes
+            return False
+
         try:
             if self.flat:
                 real_mtime = mtimelevel(self.path, self.flat)
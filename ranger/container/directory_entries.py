@@ -0,0 +1,100 @@
+# This file is part of ranger, the console file manager.
+# License: GNU GPL version 3, see the file "AUTHORS" for details.
+
+"""Reading the entries of a directory and their stat() while loading it"""
+
+from __future__ import (absolute_import, division, print_function)
+
+import os
+from collections import deque
+from os import stat as os_stat, lstat as os_lstat
+
+
+# Number of entries that are stat()ed in one go by iter_stat_entries()
+STAT_CHUNK_SIZE = 64
+
+
+def stat_entries(paths, entries, defer_stat):
+    """Returns a (path, stats, is_a_dir, deferred) tuple for each path
+
+    stats is the (stat, lstat) pair that FileSystemObject takes as preload,
+    or None if the stat() failed or was deferred.  entries maps the paths
+    to their os.DirEntry, if there is one.  If defer_stat is True, entries
+    that aren't symlinks are only classified with their d_type.
+    """
+    result = []
+    for path in paths:
+        entry = entries[path] if entries is not None else None
+        deferred = False
+        is_a_dir = False
+        file_lstat = file_stat = None
+        try:
+            if entry is None:
+                file_lstat = os_lstat(path)
+                if file_lstat.st_mode & 0o170000 == 0o120000:
+                    file_stat = os_stat(path)
+                else:
+                    file_stat = file_lstat
+            elif defer_stat and not entry.is_symlink():
+                deferred = True
+                is_a_dir = entry.is_dir(follow_symlinks=False)
+            else:
+                # DirEntry caches these, so no stat() is repeated
+                file_lstat = entry.stat(follow_symlinks=False)
+                if entry.is_symlink():
+                    file_stat = entry.stat()
+                else:
+                    file_stat = file_lstat
+        except OSError:
+            deferred = False
+            file_lstat = file_stat = None
+        if deferred:
+            stats = None
+        elif file_lstat and file_stat:
+            stats = (file_stat, file_lstat)
+            is_a_dir = file_stat.st_mode & 0o170000 == 0o040000
+        else:
+            stats = None
+        result.append((path, stats, is_a_dir, deferred))
+    return result
+
+
+def iter_stat_entries(loader, paths, entries, defer_stat):
+    """Yields the results of stat_entries() for each of the paths
+
+    The paths are stat()ed in chunks through loader.submit(), so that the
+    loader's worker threads can do it.  While waiting for a chunk, its Job
+    is yielded.  Closing this generator cancels the remaining chunks.
+    """
+    jobs = deque(loader.submit(stat_entries, paths[i:i + STAT_CHUNK_SIZE], entries, defer_stat)
+                 for i in range(0, len(paths), STAT_CHUNK_SIZE))
+    try:
+        while jobs:
+            while not jobs[0].done():
+                yield jobs[0]
+            for result in jobs.popleft().result():
+                yield result
+    finally:
+        for job in jobs:
+            job.cancel()
+
+
+def walklevel(some_dir, level):
+    some_dir = some_dir.rstrip(os.path.sep)
+    followlinks = level > 0
+    assert os.path.isdir(some_dir)
+    num_sep = some_dir.count(os.path.sep)
+    for root, dirs, files in os.walk(some_dir, followlinks=followlinks):
+        yield root, dirs, files
+        num_sep_this = root.count(os.path.sep)
+        if level != -1 and num_sep + level <= num_sep_this:
+            del dirs[:]
+
+
+def mtimelevel(path, level):
+    mtime = os.stat(path).st_mtime
+    for dirpath, dirnames, _ in walklevel(path, level):
+        dirlist = [os.path.join("/", dirpath, d) for d in dirnames
+                   if level == -1 or dirpath.count(os.path.sep) - path.count(os.path.sep) <= level]
+        mtime = max([mtime] + [os.stat(d).st_mtime for d in dirlist])
+    return mtime
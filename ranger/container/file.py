@@ -44,13 +44,42 @@ PREVIEW_WHITELIST = re.compile(r"""
 """, re.VERBOSE | re.IGNORECASE)  # pylint: disable=no-member
 
 
+# Attributes that every file gets once it's loaded.  Slots take much less
+# memory than an instance dictionary, which adds up in huge directories.
+FILE_SLOTS = (
+    'path', 'basename', 'relative_path', 'original_path', 'preload',
+    'loaded', 'last_load_time', 'stat', 'size', 'infostring', 'permissions',
+    'is_link', 'exists', 'accessible', 'marked', 'sort_keys',
+    '_mimetype', '_mimetype_tuple',
+)
+
+# The lazy properties of FileSystemObject that a file shows up with.  Their
+# slots stay empty until the property is evaluated, see File.__getattr__().
+LAZY_FILE_SLOTS = ('extension', 'linemode', 'realpath', 'relative_path_lower')
+
+
 class File(FileSystemObject):
+    __slots__ = FILE_SLOTS + LAZY_FILE_SLOTS
+
     is_file = True
     preview_data = None
     preview_known = False
     preview_loading = False
     _firstbytes = None
 
+    def __init__(self, *args, **kwargs):
+        # Unlike class attributes, slots have no value until they're assigned
+        for name, value in _SLOT_DEFAULTS:
+            setattr(self, name, value)
+        FileSystemObject.__init__(self, *args, **kwargs)
+
+    def __getattr__(self, name):
+        # Only called when the slot of a lazy property is still empty, since
+        # the slot hides the lazy_property of FileSystemObject
+        if name in LAZY_FILE_SLOTS:
+            return vars(FileSystemObject)[name].__get__(self, File)
+        raise AttributeError(name)
+
     @property
     def firstbytes(self):
         if self._firstbytes is not None:
@@ -110,3 +139,6 @@ class File(FileSystemObject):
 
     def __hash__(self):
         return hash(self.path)
+
+
+_SLOT_DEFAULTS = tuple((name, getattr(FileSystemObject, name, None)) for name in FILE_SLOTS)
@@ -4,6 +4,7 @@
 from __future__ import (absolute_import, division, print_function)
 
 import re
+import struct
 from grp import getgrgid
 from os import lstat, stat
 from os.path import abspath, basename, dirname, realpath, relpath, splitext, expanduser
@@ -41,6 +42,9 @@ DOCUMENT_BASENAMES = ('bugs', 'bugs', 'changelog', 'copying', 'credits',
 
 BAD_INFO = '?'
 
+# The few distinct size strings are shared between all files
+_INFOSTRINGS = {}
+
 _UNSAFE_CHARS = '\n' + ''.join(map(chr, range(32))) + ''.join(map(chr, range(128, 256)))
 _SAFE_STRING_TABLE = maketrans(_UNSAFE_CHARS, '?' * len(_UNSAFE_CHARS))
 _EXTRACT_NUMBER_RE = re.compile(r'\d+|\D+')
@@ -51,14 +55,90 @@ def safe_path(path):
     return path.translate(_SAFE_STRING_TABLE)
 
 
+def natural_sort_key(string):
+    """Splits the string into text and numbers for natural sorting
+
+    The key alternates between text and numbers.  Each text that is followed
+    by a number ends in a "0", so that the number sorts like a digit would
+    when it's compared to a longer text.
+    """
+    key = []
+    text = ''
+    for part in _EXTRACT_NUMBER_RE.findall(string):
+        if part[0] in _INTEGERS:
+            key.append(text + '0')
+            key.append(int(part))
+            text = ''
+        else:
+            text += part
+    if text or not key:
+        key.append(text)
+    return tuple(key)
+
+
+_FILE_STAT_FIELDS = (
+    ('st_mode', 'I'), ('st_ino', 'Q'), ('st_size', 'q'),
+    ('st_atime', 'd'), ('st_mtime', 'd'), ('st_ctime', 'd'),
+    ('st_uid', 'I'), ('st_gid', 'I'), ('st_nlink', 'Q'),
+)
+_FILE_STAT_STRUCT = struct.Struct('=' + ''.join(fmt for _, fmt in _FILE_STAT_FIELDS))
+
+
+def _file_stat_field(name):
+    offset = 0
+    for field_name, fmt in _FILE_STAT_FIELDS:
+        if field_name == name:
+            break
+        offset += struct.calcsize('=' + fmt)
+    unpack_from = struct.Struct('=' + fmt).unpack_from  # pylint: disable=undefined-loop-variable
+    return property(lambda self: unpack_from(self, offset)[0])
+
+
+def _mimetype_flag(key):
+    # The flags are kept in the mimetype_tuple only, rather than in an
+    # attribute each
+    return property(lambda self: key in self.mimetype_tuple)
+
+
+class FileStat(bytes):
+    """The fields of an os.stat_result that ranger uses, packed into bytes
+
+    It has the same st_* attributes for these fields, but needs a fraction
+    of the memory of an os.stat_result.
+    """
+    __slots__ = ()
+
+    def __new__(cls, stat_result):
+        return bytes.__new__(cls, _FILE_STAT_STRUCT.pack(
+            *[getattr(stat_result, name) for name, _ in _FILE_STAT_FIELDS]))
+
+    st_mode = _file_stat_field('st_mode')
+    st_ino = _file_stat_field('st_ino')
+    st_size = _file_stat_field('st_size')
+    st_atime = _file_stat_field('st_atime')
+    st_mtime = _file_stat_field('st_mtime')
+    st_ctime = _file_stat_field('st_ctime')
+    st_uid = _file_stat_field('st_uid')
+    st_gid = _file_stat_field('st_gid')
+    st_nlink = _file_stat_field('st_nlink')
+
+    def __repr__(self):
+        return 'FileStat(%s)' % ', '.join(
+            '%s=%r' % (name, getattr(self, name)) for name, _ in _FILE_STAT_FIELDS)
+
+
 class FileSystemObject(  # pylint: disable=too-many-instance-attributes,too-many-public-methods
         FileManagerAware, SettingsAware):
+    # Subclasses may put their most common attributes into slots
+    __slots__ = ('__dict__', '__weakref__')
+
     basename = None
     relative_path = None
     infostring = None
     original_path = None
     path = None
     permissions = None
+    preload = None
     stat = None
 
     content_loaded = False
@@ -79,13 +159,6 @@ class FileSystemObject(  # pylint: disable=too-many-instance-attributes,too-many
     stopped = False
     tagged = False
 
-    audio = False
-    container = False
-    document = False
-    image = False
-    media = False
-    video = False
-
     size = 0
 
     last_load_time = -1
@@ -93,6 +166,13 @@ class FileSystemObject(  # pylint: disable=too-many-instance-attributes,too-many
     vcsstatus = None
     vcsremotestatus = None
 
+    # Set by set_mimetype() when the mimetype is first needed
+    _mimetype = None
+    _mimetype_tuple = None
+
+    # The sort keys of this object as (mode, key, ...), see Directory.sort()
+    sort_keys = None
+
     linemode_dict = dict(
         (linemode.name, linemode()) for linemode in
         [DefaultLinemode, TitleLinemode, PermissionsLinemode, FileInfoLinemode,
@@ -112,7 +192,6 @@ class FileSystemObject(  # pylint: disable=too-many-instance-attributes,too-many
         else:
             self.relative_path = relpath(path, basename_is_rel_to)
         self.preload = preload
-        self.display_data = {}
 
     def __repr__(self):
         return "<{0} {1}>".format(self.__class__.__name__, self.path)
@@ -121,7 +200,7 @@ class FileSystemObject(  # pylint: disable=too-many-instance-attributes,too-many
     def extension(self):
         try:
             lastdot = self.basename.rindex('.') + 1
-            return self.basename[lastdot:].lower()
+            return self.basename[lastdot:].lower()  # pylint: disable=unsubscriptable-object
         except ValueError:
             return None
 
@@ -160,25 +239,11 @@ class FileSystemObject(  # pylint: disable=too-many-instance-attributes,too-many
 
     @lazy_property
     def basename_natural(self):
-        basename_list = []
-        for string in _EXTRACT_NUMBER_RE.findall(self.relative_path):
-            if string[0] in _INTEGERS:
-                basename_list.append(('0', int(string)))
-            else:
-                for char in string:
-                    basename_list.append((char,))
-        return basename_list
+        return natural_sort_key(self.relative_path)
 
     @lazy_property
     def basename_natural_lower(self):
-        basename_list = []
-        for string in _EXTRACT_NUMBER_RE.findall(self.relative_path_lower):
-            if string[0] in _INTEGERS:
-                basename_list.append(('0', int(string)))
-            else:
-                for char in string:
-                    basename_list.append((char,))
-        return basename_list
+        return natural_sort_key(self.relative_path_lower)
 
     @lazy_property
     def basename_without_extension(self):
@@ -202,9 +267,12 @@ class FileSystemObject(  # pylint: disable=too-many-instance-attributes,too-many
         except KeyError:
             return str(self.stat.st_gid)
 
-    for attr in ('video', 'audio', 'image', 'media', 'document', 'container'):
-        exec(  # pylint: disable=exec-used
-            "%s = lazy_property(lambda self: self.set_mimetype() or self.%s)" % (attr, attr))
+    video = _mimetype_flag('video')
+    audio = _mimetype_flag('audio')
+    image = _mimetype_flag('image')
+    media = _mimetype_flag('media')
+    document = _mimetype_flag('document')
+    container = _mimetype_flag('container')
 
     def __str__(self):
         """returns a string containing the absolute path"""
@@ -220,45 +288,36 @@ class FileSystemObject(  # pylint: disable=too-many-instance-attributes,too-many
         """assign attributes such as self.video according to the mimetype"""
         bname = self.basename
         if self.extension == 'part':
-            bname = bname[0:-5]
-        # pylint: disable=attribute-defined-outside-init
-        self._mimetype = self.fm.mimetypes.guess_type(bname, False)[0]
-        if self._mimetype is None:
-            self._mimetype = ''
-        # pylint: enable=attribute-defined-outside-init
-
-        self.video = self._mimetype.startswith('video')
-        self.image = self._mimetype.startswith('image')
-        self.audio = self._mimetype.startswith('audio')
-        self.media = self.video or self.image or self.audio
-        self.document = self._mimetype.startswith('text') \
-            or self.extension in DOCUMENT_EXTENSIONS \
-            or self.basename.lower() in DOCUMENT_BASENAMES
-        self.container = self.extension in CONTAINER_EXTENSIONS
-
-        # pylint: disable=attribute-defined-outside-init
-        keys = ('video', 'audio', 'image', 'media', 'document', 'container')
-        self._mimetype_tuple = tuple(key for key in keys if getattr(self, key))
-
-        if self._mimetype == '':
-            self._mimetype = None
-        # pylint: enable=attribute-defined-outside-init
+            bname = bname[0:-5]  # pylint: disable=unsubscriptable-object
+        mimetype = self.fm.mimetypes.guess_type(bname, False)[0] or ''
+
+        video = mimetype.startswith('video')
+        image = mimetype.startswith('image')
+        audio = mimetype.startswith('audio')
+        flags = (
+            ('video', video),
+            ('audio', audio),
+            ('image', image),
+            ('media', video or image or audio),
+            ('document', mimetype.startswith('text')
+             or self.extension in DOCUMENT_EXTENSIONS
+             or self.basename.lower() in DOCUMENT_BASENAMES),
+            ('container', self.extension in CONTAINER_EXTENSIONS),
+        )
+        self._mimetype_tuple = tuple(key for key, flag in flags if flag)
+        self._mimetype = mimetype or None
 
     @property
     def mimetype(self):
-        try:
-            return self._mimetype
-        except AttributeError:
+        if self._mimetype_tuple is None:
             self.set_mimetype()
-            return self._mimetype
+        return self._mimetype
 
     @property
     def mimetype_tuple(self):
-        try:
-            return self._mimetype_tuple
-        except AttributeError:
+        if self._mimetype_tuple is None:
             self.set_mimetype()
-            return self._mimetype_tuple
+        return self._mimetype_tuple
 
     def mark(self, _):
         directory = self.fm.get_directory(self.dirname)
@@ -288,7 +347,6 @@ class FileSystemObject(  # pylint: disable=too-many-instance-attributes,too-many
         if self.settings.freeze_files:
             return
 
-        self.display_data = {}
         self.fm.update_preview(self.path)
 
         # Get the stat object, either from preload or from [l]stat
@@ -334,14 +392,15 @@ class FileSystemObject(  # pylint: disable=too-many-instance-attributes,too-many
         elif self.is_file:
             if new_stat:
                 self.size = new_stat.st_size
-                self.infostring = ' ' + human_readable(self.size)
+                infostring = ' ' + human_readable(self.size)
+                self.infostring = _INFOSTRINGS.setdefault(infostring, infostring)
             else:
                 self.size = 0
                 self.infostring = '?'
         if self.is_link and not self.is_directory:
             self.infostring = '->' + self.infostring
 
-        self.stat = new_stat
+        self.stat = FileStat(new_stat) if new_stat else None
         self.last_load_time = time()
 
     def get_permission_string(self):
@@ -368,11 +427,21 @@ class FileSystemObject(  # pylint: disable=too-many-instance-attributes,too-many
         self.permissions = ''.join(perms)
         return self.permissions
 
+    def load_once(self):
+        """Calls load() if the information wasn't loaded yet"""
+        if not self.loaded:
+            self.load()
+            return True
+        return False
+
     def load_if_outdated(self):
         """Calls load() if the currently cached information is outdated"""
         if not self.loaded:
             self.load()
             return True
+        if self.is_file and not self.is_link and self.fm.watcher.is_watched(self.dirname):
+            # The watcher reloads the file when it changes
+            return False
         try:
             real_ctime = stat(self.path).st_ctime
         except OSError:
@@ -27,6 +27,7 @@ ALLOWED_SETTINGS = {
     'autoupdate_cumulative_size': bool,
     'bidi_support': bool,
     'binary_size_prefix': bool,
+    'cache_directory_listings': bool,
     'cd_bookmarks': bool,
     'cd_tab_case': str,
     'cd_tab_fuzzy': bool,
@@ -36,6 +37,9 @@ ALLOWED_SETTINGS = {
     'column_ratios': (tuple, list),
     'confirm_on_delete': str,
     'confirm_on_trash': str,
+    'cumulative_size_one_file_system': bool,
+    'directory_cache_limit': int,
+    'directory_cache_memory': int,
     'dirname_in_tabs': bool,
     'display_size_in_main_column': bool,
     'display_size_in_status_bar': bool,
@@ -56,6 +60,8 @@ ALLOWED_SETTINGS = {
     'iterm2_font_width': int,
     'iterm2_font_height': int,
     'line_numbers': str,
+    'loader_concurrency': (tuple, list),
+    'loader_threads': int,
     'max_console_history_size': (int, type(None)),
     'max_history_size': (int, type(None)),
     'metadata_deep_search': bool,
@@ -67,9 +73,15 @@ ALLOWED_SETTINGS = {
     'preview_directories': bool,
     'preview_files': bool,
     'preview_images': bool,
+    'preview_images_cache_size': int,
     'preview_images_method': str,
+    'preview_cache_memory': int,
+    'preview_cache_persistent': bool,
     'preview_max_size': int,
+    'preview_prefetch': int,
+    'preview_prefetch_on_battery': bool,
     'preview_script': (str, type(None)),
+    'preview_workers': int,
     'relative_current_zero': bool,
     'save_backtick_bookmark': bool,
     'save_console_history': bool,
@@ -97,9 +109,11 @@ ALLOWED_SETTINGS = {
     'vcs_backend_hg': str,
     'vcs_backend_svn': str,
     'vcs_msg_length': int,
+    'vcs_status_ignored': bool,
     'viewmode': str,
     'w3m_delay': float,
     'w3m_offset': int,
+    'watch_directories': bool,
     'wrap_plaintext_previews': bool,
     'wrap_scroll': bool,
     'xterm_alt_key': bool,
@@ -167,6 +181,14 @@ class Settings(SignalDispatcher, FileManagerAware):
                 signal.value = [int(i) if str(i).isdigit() else 1
                                 for i in value]
 
+        elif name == 'loader_concurrency':
+            if isinstance(value, tuple):
+                value = list(value)
+            if not isinstance(value, list):
+                value = []
+            signal.value = [int(i) if str(i).isdigit() and int(i) > 0 else 1
+                            for i in value]
+
         elif name == 'colorscheme':
             _colorscheme_name_to_class(signal)
 
@@ -25,7 +25,10 @@ from ranger import PY3
 from ranger.container.directory import Directory
 from ranger.container.file import File
 from ranger.container.settings import ALLOWED_SETTINGS, ALLOWED_VALUES
-from ranger.core.loader import CommandLoader, CopyLoader
+from ranger.core.copy_journal import CopyJournal
+from ranger.core.copy_loader import CopyLoader
+from ranger.core.loader import (
+    PRIORITY_BACKGROUND, PRIORITY_PREVIEW, PreviewLoader, PreviewPrefetcher)
 from ranger.core.shared import FileManagerAware, SettingsAware
 from ranger.core.tab import Tab
 from ranger.ext.direction import Direction
@@ -49,6 +52,9 @@ class _MacroTemplate(string.Template):
 class Actions(  # pylint: disable=too-many-instance-attributes,too-many-public-methods
         FileManagerAware, SettingsAware):
 
+    # The PreviewPrefetcher that is queued in the loader, if any
+    preview_prefetcher = None
+
     # --------------------------
     # -- Basic Commands
     # --------------------------
@@ -67,7 +73,7 @@ class Actions(  # pylint: disable=too-many-instance-attributes,too-many-public-m
         Reset the filemanager, clearing the directory buffer, reload rifle config
         """
         old_path = self.thisdir.path
-        self.previews = {}
+        self.previews.clear()
         self.garbage_collect(-1)
         self.enter_dir(old_path)
         self.change_mode('normal')
@@ -607,6 +613,10 @@ class Actions(  # pylint: disable=too-many-instance-attributes,too-many-public-m
             if remember:
                 self.bookmarks.remember(cwd)
             self.change_mode('normal')
+            if cwd is not None and cwd != self.thisfile \
+                    and not any(cwd in tab.pathway for tab in self.tabs.values()):
+                # Stop loading the directory we left, since it isn't shown anymore
+                self.loader.remove(cwd)
         return result
 
     def cd(self, path, remember=True):  # pylint: disable=invalid-name
@@ -830,6 +840,7 @@ class Actions(  # pylint: disable=too-many-instance-attributes,too-many-public-m
         elif order in ('size', 'mimetype', 'ctime', 'mtime', 'atime'):
             cwd = self.thisdir
             if original_order is not None or not cwd.cycle_list:
+                cwd.load_entries()
                 lst = list(cwd.files)
                 if order == 'size':
                     def fnc(item):
@@ -1053,8 +1064,9 @@ class Actions(  # pylint: disable=too-many-instance-attributes,too-many-public-m
             inode_path = inode_path.encode('utf-8', 'backslashreplace')
         return '{0}.jpg'.format(sha512(inode_path).hexdigest())
 
-    def get_preview(self, fobj, width, height):
+    def get_preview(self, fobj, width, height, prefetch=False):
         # pylint: disable=too-many-return-statements,too-many-statements
+        # pylint: disable=too-many-branches,too-many-locals
         pager = self.ui.get_pager()
         path = fobj.realpath
 
@@ -1062,6 +1074,8 @@ class Actions(  # pylint: disable=too-many-instance-attributes,too-many-public-m
             return None
 
         if not self.settings.preview_script or not self.settings.use_preview_script:
+            if prefetch:
+                return None
             if PY3:
                 try:
                     return open(path, 'r', errors='ignore', encoding='utf-8')
@@ -1077,7 +1091,10 @@ class Actions(  # pylint: disable=too-many-instance-attributes,too-many-public-m
                 except IOError:
                     return None
 
-        # self.previews is a 2 dimensional dict:
+        if not prefetch and self.settings.preview_prefetch > 0 and fobj is self.thisfile:
+            self.prefetch_previews(width, height)
+
+        # self.previews is a PreviewCache that works like a 2 dimensional dict:
         # self.previews['/tmp/foo.jpg'][(80, 24)] = "the content..."
         # self.previews['/tmp/foo.jpg']['loading'] = False
         # A -1 in tuples means "any"; (80, -1) = wid. of 80 and any hei.
@@ -1091,7 +1108,17 @@ class Actions(  # pylint: disable=too-many-instance-attributes,too-many-public-m
             data = self.previews[path] = {'loading': False}
         else:
             if data['loading']:
-                return None
+                if prefetch:
+                    return None
+                loadable = data.get('loadable')
+                if loadable is not None and loadable.preview_prefetch:
+                    # The cursor caught up with a prefetched preview
+                    loadable.preview_prefetch = False
+                    loadable.priority_class = PRIORITY_PREVIEW
+                    if loadable in self.loader.queue:
+                        self.loader.move(self.loader.queue.index(loadable), 0)
+                # What the script printed so far, see on_output()
+                return data.get('partial')
 
         found = data.get(
             (-1, -1), data.get(
@@ -1103,6 +1130,9 @@ class Actions(  # pylint: disable=too-many-instance-attributes,too-many-public-m
             )
         )
         if found is not False:
+            if not prefetch:
+                self.previews.touch(path)
+                self.previews.memory_hits += 1
             return found
 
         try:
@@ -1122,28 +1152,66 @@ class Actions(  # pylint: disable=too-many-instance-attributes,too-many-public-m
         if 'directimagepreview' in data:
             data['foundpreview'] = True
             data['imagepreview'] = True
-            pager.set_image(path)
+            if not prefetch:
+                pager.set_image(path)
             data['loading'] = False
             return path
 
-        if not os.path.exists(ranger.args.cachedir):
-            os.makedirs(ranger.args.cachedir)
         fobj.load_if_outdated()
-        cacheimg = os.path.join(
-            ranger.args.cachedir,
-            self.sha512_encode(path, inode=fobj.stat.st_ino)
-        )
-        if (self.settings.preview_images and os.path.isfile(cacheimg)
-                and fobj.stat.st_mtime <= os.path.getmtime(cacheimg)):
+        cacheimg_name = self.sha512_encode(path, inode=fobj.stat.st_ino)
+        cacheimg = os.path.join(ranger.args.cachedir, cacheimg_name)
+        if self.settings.preview_images \
+                and self.thumbnails.get(cacheimg_name, fobj.stat.st_mtime) is not None:
             data['foundpreview'] = True
             data['imagepreview'] = True
-            pager.set_image(cacheimg)
+            if not prefetch:
+                pager.set_image(cacheimg)
             data['loading'] = False
             return cacheimg
 
+        try:
+            # A fresh stat(), since the one of fobj has no st_dev
+            file_key = self.previews.get_file_key(
+                os.stat(path), stat_, self.settings.preview_images)
+        except OSError:
+            file_key = None
+        stored = None if file_key is None else self.previews.load(file_key, width, height)
+        if stored is not None:
+            size_key, content = stored
+            if not prefetch:
+                self.previews.disk_hits += 1
+            data[size_key] = content
+            data['foundpreview'] = content is not None
+            data['loading'] = False
+            self.previews.update_size(path)
+            return content
+        if not prefetch:
+            self.previews.misses += 1
+
+        if not os.path.exists(ranger.args.cachedir):
+            os.makedirs(ranger.args.cachedir)
+
+        # The number of lines that were shown while the script was running
+        shown = [0]
+
+        def on_output(signal):
+            # The lines grow in place, so the pager shows them as they come.
+            # Once they fill the preview, more of them change nothing on the
+            # screen until the script is done.
+            lines = signal.loader.stdout_output.lines
+            data['partial'] = lines
+            if shown[0] <= height and len(lines) > shown[0] \
+                    and self.thisfile and self.thisfile.realpath == path:
+                shown[0] = len(lines)
+                self.ui.browser.need_redraw = True
+
         def on_after(signal):
-            rcode = signal.process.poll()
+            # A script that printed too much was killed, but what it printed
+            # is as good as the output of a successful run
+            rcode = 0 if signal.loader.truncated else signal.loader.returncode
             content = signal.loader.stdout_buffer
+            data.pop('partial', None)
+            data.pop('loadable', None)
             data['foundpreview'] = True
 
             if rcode == 0:
@@ -1156,6 +1224,7 @@ class Actions(  # pylint: disable=too-many-instance-attributes,too-many-public-m
                 data[(-1, -1)] = content
             elif rcode == 6:
                 data['imagepreview'] = True
+                self.thumbnails.add(cacheimg_name, path)
             elif rcode == 7:
                 data['directimagepreview'] = True
             elif rcode == 1:
@@ -1170,13 +1239,24 @@ class Actions(  # pylint: disable=too-many-instance-attributes,too-many-public-m
             else:
                 data[(-1, -1)] = None
 
+            # Complete text previews, and the lack of one, are kept for the
+            # next time
+            size_key = {0: (width, height), 1: (-1, -1), 2: (-1, -1), 3: (-1, height),
+                        4: (width, -1), 5: (-1, -1)}.get(rcode)
+            if size_key is not None and file_key is not None \
+                    and not signal.loader.truncated:
+                self.previews.store(file_key, size_key, data[size_key])
+            if self.previews.get(path) is data:
+                self.previews.update_size(path)
+
             if self.thisfile and self.thisfile.realpath == path:
                 self.ui.browser.need_redraw = True
 
             data['loading'] = False
 
             pager = self.ui.get_pager()
-            if self.thisfile and self.thisfile.is_file:
+            # A prefetched preview waits until the cursor gets to its file
+            if self.thisfile and self.thisfile.is_file and self.thisfile.realpath == path:
                 if 'imagepreview' in data:
                     pager.set_image(cacheimg)
                     return cacheimg
@@ -1194,19 +1274,86 @@ class Actions(  # pylint: disable=too-many-instance-attributes,too-many-public-m
             except KeyError:
                 pass
 
-        loadable = CommandLoader(
+        loadable = PreviewLoader(
             args=[self.settings.preview_script, path, str(width), str(height),
                   cacheimg, str(self.settings.preview_images)],
-            read=True,
-            silent=True,
             descr="Getting preview of %s" % path,
+            max_output=self.settings.preview_max_size or None,
         )
+        loadable.preview_path = path
+        loadable.signal_bind('output', on_output)
         loadable.signal_bind('after', on_after)
         loadable.signal_bind('destroy', on_destroy)
-        self.loader.add(loadable)
+        data['loadable'] = loadable
+        if prefetch:
+            # Behind the other background work, so that it doesn't pause it
+            loadable.preview_prefetch = True
+            loadable.priority_class = PRIORITY_BACKGROUND
+            self.loader.add(loadable, append=True)
+        else:
+            loadable.priority_class = PRIORITY_PREVIEW
+            self.loader.add(loadable)
 
         return None
 
+    def get_preview_neighbours(self):
+        """The files around the cursor whose previews are worth prefetching
+
+        These are up to preview_prefetch files below and above the current
+        one, nearest first.
+        """
+        cwd = self.thisdir
+        if cwd is None or not cwd.files or not self.settings.preview_script \
+                or not self.settings.use_preview_script:
+            return []
+        files = cwd.files
+        neighbours = []
+        for distance in range(1, self.settings.preview_prefetch + 1):
+            for index in (cwd.pointer + distance, cwd.pointer - distance):
+                if 0 <= index < len(files):
+                    fobj = files[index]
+                    fobj.load_once()
+                    if fobj.is_file and fobj.has_preview():
+                        neighbours.append(fobj)
+        return neighbours
+
+    def prefetch_previews(self, width, height):
+        """Generate the previews of the neighbours of the current file
+
+        They're generated in the background once the cursor rests for a
+        moment, see PreviewPrefetcher.
+        """
+        if not self.thisfile:
+            return
+        target = (self.thisfile.realpath, width, height)
+        prefetcher = self.preview_prefetcher
+        if prefetcher is not None:
+            if prefetcher.target == target:
+                return
+            self.loader.remove(item=prefetcher)
+        self.preview_prefetcher = PreviewPrefetcher(
+            target, self.get_preview_neighbours(), width, height)
+        self.loader.add(self.preview_prefetcher, append=True)
+
+    def cancel_previews(self, keep=None, neighbours=()):
+        """Stop the preview scripts that run for other files than keep
+
+        Their processes are killed and the previews are generated again when
+        they're needed.  The ones for the paths in neighbours go on in the
+        background, as if they had been prefetched.
+        """
+        for item in tuple(self.loader.queue):
+            path = getattr(item, 'preview_path', None)
+            if path is None or path == keep:
+                continue
+            if path in neighbours:
+                if not item.preview_prefetch:
+                    item.preview_prefetch = True
+                    item.priority_class = PRIORITY_BACKGROUND
+                    self.loader.move(self.loader.queue.index(item), -1)
+            else:
+                self.loader.remove(item=item)
+
     @staticmethod
     def read_text_file(path, count=None):
         """Encoding-aware reading of a text file."""
@@ -1648,6 +1795,34 @@ class Actions(  # pylint: disable=too-many-instance-attributes,too-many-public-m
         else:
             self.notify('Failed to paste. The destination is invalid.', bad=True)
 
+    def paste_resume(self, discard=False, append=False):
+        """:paste_resume [discard=True]
+
+        Resume the copy and move jobs that were interrupted because ranger
+        quit or crashed, or drop them with discard=True.
+        """
+        journals = CopyJournal.find_interrupted()
+        if not journals:
+            self.notify('There are no interrupted copy jobs.')
+            return
+        for journal in journals:
+            content = journal.load()
+            if discard or content is None or not isdir(content["dest"]):
+                journal.remove()
+                continue
+            sources = [File(path) for path in content["sources"] if os.path.lexists(path)]
+            if not sources:
+                journal.remove()
+                continue
+            loadable = CopyLoader(
+                sources,
+                do_cut=bool(content.get("do_cut")),
+                overwrite=bool(content.get("overwrite")),
+                dest=content["dest"],
+                journal=journal,
+            )
+            self.loader.add(loadable, append=append)
+
     def delete(self, files=None):
         # XXX: warn when deleting mount points/unseen marked files?
         # COMPAT: old command.py use fm.delete() without arguments
@@ -0,0 +1,106 @@
+# This file is part of ranger, the console file manager.
+# License: GNU GPL version 3, see the file "AUTHORS" for details.
+
+"""
+Journals of copy and move jobs, so that interrupted jobs can be resumed.
+
+While a CopyLoader copies files, it keeps a json file in ranger's cache
+directory that describes the job: the sources, the destination, where each
+source ends up and how far the files that are being copied got.  The file is
+removed once the job is done or cancelled, so the journals that are left
+belong to jobs that were interrupted by quitting ranger or by a crash.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+
+import errno
+import os
+from io import open
+from time import time
+
+import ranger
+from ranger.ext.atomic_json import dump_json
+
+
+COPY_JOURNAL_DIR_NAME = "copy_jobs"
+
+
+def _is_running(pid):
+    if pid <= 0:
+        # os.kill() would signal a whole group of processes
+        return False
+    try:
+        os.kill(pid, 0)
+    except OSError as ex:
+        return ex.errno == errno.EPERM
+    return True
+
+
+class CopyJournal(object):
+    """The journal of one copy or move job
+
+    The content is a dict with the keys:
+        pid: the process id of the ranger that runs the job
+        sources: the paths in the copy buffer
+        dest: the destination directory
+        do_cut, overwrite: like the arguments of CopyLoader
+        roots: maps each source that was started to its destination path
+        partial: maps the files that were being copied to a list
+            [destination, bytes copied]
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            path = os.path.join(self.get_directory(),
+                                '%x-%x.json' % (int(time() * 1000), os.getpid()))
+        self.path = path
+
+    @staticmethod
+    def get_directory():
+        return os.path.join(ranger.args.cachedir, COPY_JOURNAL_DIR_NAME)
+
+    @classmethod
+    def find_interrupted(cls):
+        """Returns the journals of the jobs that no running ranger works on"""
+        directory = cls.get_directory()
+        try:
+            names = sorted(os.listdir(directory))
+        except OSError:
+            return []
+        journals = []
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            journal = cls(os.path.join(directory, name))
+            content = journal.load()
+            if content is None:
+                continue
+            pid = content.get("pid")
+            if isinstance(pid, int) and _is_running(pid):
+                continue
+            journals.append(journal)
+        return journals
+
+    def load(self):
+        """Returns the content of the journal, or None if it can't be read"""
+        import json
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as fobj:
+                content = json.load(fobj)
+        except (IOError, OSError, ValueError):
+            return None
+        if not isinstance(content, dict) or "sources" not in content \
+                or "dest" not in content:
+            return None
+        return content
+
+    def save(self, content):
+        """Replaces the content of the journal"""
+        dump_json(self.path, content)
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
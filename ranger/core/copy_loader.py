@@ -0,0 +1,488 @@
+# This file is part of ranger, the console file manager.
+# License: GNU GPL version 3, see the file "AUTHORS" for details.
+
+"""Copying and moving the files of the copy buffer in the background"""
+
+from __future__ import (absolute_import, division, print_function)
+
+import os.path
+import os
+import stat
+from collections import deque
+from time import time
+
+from ranger.core.copy_journal import CopyJournal
+from ranger.core.loader import Loadable, list_entries
+from ranger.core.shared import FileManagerAware
+from ranger.ext.human_readable import human_readable
+from ranger.ext.safe_path import get_safe_path
+from ranger.ext.thread_pool import Job
+
+
+# How long CopyLoader walks the source trees in one step, and how many files
+# it may find ahead of the ones it copies
+COPY_WALK_TIME = 0.01
+COPY_WALK_AHEAD = 100000
+
+# How often CopyLoader saves its progress in its journal, in seconds
+JOURNAL_INTERVAL = 2
+
+
+class CopyLoader(Loadable, FileManagerAware):  # pylint: disable=too-many-instance-attributes
+    """Copies or moves the files in the copy buffer
+
+    The progress of copies is kept in a CopyJournal, so that a job that was
+    interrupted can be resumed with a new CopyLoader for the same journal.
+    Sources that were started then go to the same destination as before,
+    files that are there already with the same size and mtime are skipped
+    and files that were copied partially are continued.
+    """
+    progressbar_supported = True
+    cancelled = False
+
+    def __init__(  # pylint: disable=too-many-positional-arguments
+        self,
+        copy_buffer,
+        do_cut=False,
+        overwrite=False,
+        dest=None,
+        make_safe_path=get_safe_path,
+        journal=None,
+    ):
+        self.copy_buffer = tuple(copy_buffer)
+        self.do_cut = do_cut
+        self.original_copy_buffer = copy_buffer
+        self.original_path = dest if dest is not None else self.fm.thistab.path
+        self.overwrite = overwrite
+        self.make_safe_path = make_safe_path
+        self.percent = 0
+        # The size of the files found so far, see _copy_files()
+        self.size = 0
+        # Maps the sources that were started to their destination and the
+        # files that were copied partially to [destination, bytes copied]
+        self.roots = {}
+        self.partial = {}
+        if journal is None:
+            self.journal = CopyJournal()
+        else:
+            self.journal = journal
+            content = journal.load() or {}
+            self.roots = content.get("roots") or {}
+            self.partial = content.get("partial") or {}
+        # The sources whose destination is known to come from this job
+        self.resumed_roots = set(self.roots)
+        self._journal_time = None
+        if self.copy_buffer:
+            self.one_file = self.copy_buffer[0]
+        Loadable.__init__(self, self.generate(), 'Preparing...')
+
+    def _set_description(self, verb, size=None):
+        if len(self.copy_buffer) == 1:
+            self.description = verb + ": " + self.one_file.path
+        else:
+            self.description = verb + " files from: " + self.one_file.dirname
+        if size is not None:
+            self.description += " (" + human_readable(size) + ")"
+
+    def _save_journal(self, partial=None, force=False):
+        """Writes the journal, at most every JOURNAL_INTERVAL seconds
+
+        partial maps the files that are being copied to [destination, bytes
+        copied].  Without it, the last known state is saved again.
+        """
+        if partial is not None:
+            self.partial = partial
+        now = time()
+        if not force and self._journal_time is not None \
+                and now - self._journal_time < JOURNAL_INTERVAL:
+            return
+        self._journal_time = now
+        self.journal.save({
+            "pid": os.getpid(),
+            "sources": [fobj.path for fobj in self.copy_buffer],
+            "dest": self.original_path,
+            "do_cut": self.do_cut,
+            "overwrite": self.overwrite,
+            "roots": self.roots,
+            "partial": self.partial,
+        })
+
+    def _plan_roots(self, fobjs):
+        """Decide where each source goes and save that in the journal
+
+        Doing it for all sources at once needs one journal write per job
+        instead of one per source.  The sources whose destination would
+        collide with the one of another source are left to the walk.
+        """
+        taken = set(self.roots.values())
+        for fobj in fobjs:
+            if fobj.path in self.roots:
+                continue
+            dst = os.path.join(self.original_path, fobj.basename)
+            if not self.overwrite:
+                dst = self.make_safe_path(dst)
+            if dst not in taken:
+                taken.add(dst)
+                self.roots[fobj.path] = dst
+        self._save_journal(force=True)
+
+    def _copy_file(self, src, dst, offset, progress):
+        """Copy a file on a worker thread, see _copy_files()
+
+        The number of bytes copied so far is kept in progress[0].  If the
+        job is paused or cancelled, it stops there and leaves the thread to
+        other jobs.  Returns whether the copy is complete.
+        """
+        from ranger.ext import shutil_generatorized as shutil_g
+        copying = self._copy2(shutil_g, src, dst, offset)
+        try:
+            for done in copying:
+                progress[0] = done
+                if self.paused or self.cancelled:
+                    return False
+        finally:
+            copying.close()
+        return True
+
+    @staticmethod
+    def _finish_copies(jobs, pending, errors):
+        """Removes the done jobs of _copy_files(), returns the bytes they copied
+
+        The copies that were stopped by a pause go back to pending, with the
+        bytes copied so far as their offset.
+        """
+        from ranger.ext import shutil_generatorized as shutil_g
+        done = 0
+        for entry in [entry for entry in jobs if entry[4].done()]:
+            jobs.remove(entry)
+            src, dst, size, progress, job = entry
+            try:
+                if job.result():
+                    done += progress[0]
+                else:
+                    pending.appendleft((src, dst, size, progress[0]))
+            except (shutil_g.Error, EnvironmentError) as why:
+                errors.append((src, dst, str(why)))
+        return done
+
+    def _get_destination(self, src, dst):
+        """Returns the path that copy2() would copy src to"""
+        if os.path.isdir(dst):
+            dst = os.path.join(dst, os.path.basename(src))
+        if not self.overwrite:
+            dst = self.make_safe_path(dst)
+        return dst
+
+    def _copy2(self, shutil_g, src, dst, offset):
+        if offset is None:
+            return shutil_g.copy2(src, dst, symlinks=True, overwrite=self.overwrite,
+                                  make_safe_path=self.make_safe_path)
+        return shutil_g.copy2(src, dst, symlinks=True, overwrite=True, offset=offset)
+
+    def _get_file_task(self, src, dst, size, mtime, resumed):
+        """Returns the (source, destination, size, offset) of a file to copy
+
+        offset is None for a fresh copy.  In a resumed destination, where
+        the files are known to come from this job, it's the number of bytes
+        to keep, and the destination is None if the file is complete.
+        """
+        if not resumed:
+            return src, dst, size, None
+        try:
+            dst_stat = os.lstat(dst)
+        except OSError:
+            return src, dst, size, 0
+        if dst_stat.st_size == size and int(dst_stat.st_mtime) == int(mtime):
+            return src, None, size, size
+        offset = 0
+        partial = self.partial.get(src)
+        if partial and partial[0] == dst:
+            offset = max(0, min(partial[1], dst_stat.st_size, size))
+        return src, dst, size, offset
+
+    def _iter_copy_tasks(self, fobjs, dirs, errors):
+        """Yields a (source, destination, size, offset) for each file in fobjs
+
+        The directories are created on the way, like copytree() does, and
+        appended to dirs as (source, destination) tuples.  Symlinks are
+        copied right away.  Failures are appended to errors.  The size comes
+        from the lstat() that tells files, directories and symlinks apart,
+        so the walk doesn't need more system calls than copytree() does.
+        See _get_file_task() for the offset.
+        """
+        for fobj in fobjs:
+            src = fobj.path
+            try:
+                fstat = os.lstat(src)
+            except OSError as why:
+                errors.append((src, self.original_path, str(why)))
+                continue
+            resumed = src in self.resumed_roots
+            dst = self.roots.get(src)
+            if dst is None:
+                dst = os.path.join(self.original_path, fobj.basename)
+                if not self.overwrite:
+                    dst = self.make_safe_path(dst)
+                # The journal has to know the destination before anything
+                # is copied there
+                self.roots[src] = dst
+                self._save_journal(force=True)
+
+            if not stat.S_ISDIR(fstat.st_mode):
+                if stat.S_ISREG(fstat.st_mode):
+                    yield self._get_file_task(src, dst, fstat.st_size, fstat.st_mtime,
+                                              resumed)
+                elif resumed and os.path.lexists(dst):
+                    yield src, None, 0, 0
+                else:
+                    yield src, dst, 0, None
+                continue
+            if os.path.realpath(self.original_path).startswith(
+                    os.path.join(os.path.realpath(src), '')):
+                errors.append((src, dst, "Cannot copy a directory into itself"))
+                continue
+            for task in self._iter_tree_tasks(src, dst, resumed, dirs, errors):
+                yield task
+
+    def _copy_symlink(self, src, dst, resumed, errors):
+        from ranger.ext import shutil_generatorized as shutil_g
+        try:
+            linkto = os.readlink(src)
+            if (self.overwrite or resumed) and os.path.lexists(dst):
+                os.unlink(dst)
+            os.symlink(linkto, dst)
+            shutil_g.copystat(src, dst)
+        except EnvironmentError as why:
+            errors.append((src, dst, str(why)))
+
+    def _iter_tree_tasks(  # pylint: disable=too-many-positional-arguments,too-many-locals
+            self, root, root_dst, resumed, dirs, errors):
+        """Like _iter_copy_tasks(), for the directory tree at root"""
+        stack = [(root, root_dst)]
+        while stack:
+            src, dst = stack.pop()
+            try:
+                entries = list_entries(src)
+                try:
+                    os.makedirs(dst)
+                except OSError:
+                    # With overwrite or when resuming, copy into the
+                    # existing directory
+                    if not self.overwrite and not resumed:
+                        dst = self.make_safe_path(dst)
+                        os.makedirs(dst)
+                        if src == root:
+                            self.roots[src] = dst
+                            self._save_journal(force=True)
+            except OSError as why:
+                errors.append((src, dst, str(why)))
+                continue
+            dirs.append((src, dst))
+            for name, mode, size, mtime in entries:
+                srcname = os.path.join(src, name)
+                dstname = os.path.join(dst, name)
+                if stat.S_ISLNK(mode):
+                    self._copy_symlink(srcname, dstname, resumed, errors)
+                elif stat.S_ISDIR(mode):
+                    stack.append((srcname, dstname))
+                else:
+                    yield self._get_file_task(srcname, dstname, size, mtime, resumed)
+
+    def _copy_files(self, fobjs, threads):
+        # pylint: disable=too-many-branches,too-many-locals,too-many-statements
+        """Copy the files while walking their trees ahead of the copy
+
+        There's no separate pass that sums up the size before copying.
+        Instead, the walk runs up to COPY_WALK_AHEAD files ahead of the copy
+        and self.size is the size of the files found so far.  With threads,
+        up to 4 files per thread are copied at once on the background pool of
+        the loader, otherwise the main loop copies one file in small steps.
+        Copies that a pause stopped are submitted again from where they were.
+
+        Yields the number of bytes copied so far, or a Job to wait for.
+        """
+        from ranger.ext import shutil_generatorized as shutil_g
+        self._plan_roots(fobjs)
+        dirs = []
+        errors = []
+        tasks = self._iter_copy_tasks(fobjs, dirs, errors)
+        pending = deque()
+        # (source, destination, size, progress, job) of the submitted files
+        jobs = []
+        # (source, destination, generator) of the file the main loop copies
+        current = None
+        current_done = 0
+        done = 0
+        try:
+            while True:
+                if tasks is not None:
+                    deadline = time() + COPY_WALK_TIME
+                    while len(pending) < COPY_WALK_AHEAD and time() < deadline:
+                        task = next(tasks, None)
+                        if task is None:
+                            tasks = None
+                            self._set_description(
+                                "moving" if self.do_cut else "copying", self.size)
+                            break
+                        self.size += task[2]
+                        if task[1] is None:
+                            # Copied completely before the job was resumed
+                            done += task[2]
+                        else:
+                            pending.append(task)
+
+                if threads > 0:
+                    done += self._finish_copies(jobs, pending, errors)
+                    while pending and len(jobs) < 4 * threads:
+                        src, dst, size, offset = pending.popleft()
+                        if offset is None:
+                            # A copy that is paused resumes at an offset,
+                            # which needs the final destination
+                            dst = self._get_destination(src, dst)
+                            offset = 0
+                        progress = [offset]
+                        jobs.append((src, dst, size, progress, self.fm.loader.submit_background(
+                            self._copy_file, src, dst, offset, progress)))
+                    self._save_journal(dict(
+                        (src, [dst, progress[0]]) for src, dst, _, progress, _ in jobs))
+                    if not jobs and not pending and tasks is None:
+                        break
+                    if jobs and not jobs[0][4].done():
+                        yield jobs[0][4]
+                    yield done + sum(progress[0] for _, _, _, progress, _ in jobs)
+                    continue
+
+                if current is None:
+                    if not pending:
+                        if tasks is None:
+                            break
+                        yield done
+                        continue
+                    src, dst, _, offset = pending.popleft()
+                    current = (src, dst, self._copy2(shutil_g, src, dst, offset))
+                    current_done = offset or 0
+                try:
+                    current_done = next(current[2])
+                except StopIteration:
+                    current = None
+                    done += current_done
+                    current_done = 0
+                except (shutil_g.Error, EnvironmentError) as why:
+                    errors.append((current[0], current[1], str(why)))
+                    current = None
+                    current_done = 0
+                self._save_journal(
+                    {current[0]: [current[1], current_done]} if current else {})
+                yield done + current_done
+        finally:
+            for entry in jobs:
+                entry[4].cancel()
+            if current is not None:
+                current[2].close()
+        # Copy the stat info of the directories once their content is done,
+        # the deepest ones first
+        for src, dst in reversed(dirs):
+            try:
+                shutil_g.copystat(src, dst)
+            except OSError as why:
+                errors.append((src, dst, str(why)))
+        if errors:
+            raise shutil_g.Error(errors)
+
+    def _move_tags(self, fobj):
+        for path in self.fm.tags.tags:
+            if path == fobj.path or str(path).startswith(fobj.path):
+                tag = self.fm.tags.tags[path]
+                self.fm.tags.remove(path)
+                new_path = path.replace(
+                    fobj.path,
+                    os.path.join(self.original_path, fobj.basename))
+                self.fm.tags.tags[new_path] = tag
+                self.fm.tags.dump()
+
+    def _move_files(self):
+        """Move the buffer, copying only what can't simply be renamed
+
+        Yields the number of bytes copied so far, or a Job to wait for.
+        """
+        from ranger.ext import shutil_generatorized as shutil_g
+        self._set_description("moving")
+        try:
+            dest_dev = os.stat(self.original_path).st_dev
+        except OSError:
+            dest_dev = None
+        renames = []
+        copies = []
+        for fobj in self.copy_buffer:
+            try:
+                same_device = os.lstat(fobj.path).st_dev == dest_dev
+            except OSError:
+                # Already moved by the job that is resumed
+                continue
+            if fobj.path in self.roots:
+                # The job that is resumed started copying it
+                copies.append(fobj)
+            else:
+                (renames if same_device else copies).append(fobj)
+
+        # On the same file system, move() comes down to os.rename(), which
+        # takes no time regardless of the size
+        for i, fobj in enumerate(renames):
+            self._move_tags(fobj)
+            for _ in shutil_g.move(src=fobj.path, dst=self.original_path,
+                                   overwrite=self.overwrite,
+                                   make_safe_path=self.make_safe_path):
+                yield 0
+            self.percent = (i + 1) / len(self.copy_buffer) * 100.
+        if not copies:
+            return
+
+        # Otherwise, the sources are copied like a paste and removed once
+        # all of them are copied
+        for fobj in copies:
+            self._move_tags(fobj)
+        for result in self._copy_files(copies, self.fm.settings.loader_threads):
+            yield result
+        for fobj in copies:
+            if os.path.isdir(fobj.path) and not os.path.islink(fobj.path):
+                shutil_g.rmtree(fobj.path)
+            else:
+                os.unlink(fobj.path)
+
+    def generate(self):
+        if not self.copy_buffer:
+            return
+
+        if self.do_cut:
+            self.original_copy_buffer.clear()
+            files = self._move_files()
+        else:
+            self._set_description("copying")
+            files = self._copy_files(self.copy_buffer, self.fm.settings.loader_threads)
+        try:
+            for result in files:
+                if isinstance(result, Job):
+                    yield result
+                else:
+                    # The total grows while the walk is still going on
+                    if self.size:
+                        self.percent = min(100., (result / self.size) * 100.)
+                    yield
+        except Exception:
+            self.journal.remove()
+            raise
+        self.journal.remove()
+        cwd = self.fm.get_directory(self.original_path)
+        cwd.load_content()
+
+    def unload(self):
+        # Stops the copies that are running on worker threads
+        self.cancelled = True
+        self.load_generator.close()
+        self.journal.remove()
+
+    def destroy(self):
+        # Ranger quits in the middle of the job, so keep the journal
+        if not self.cancelled and self.load_generator is not None:
+            self.cancelled = True
+            self._save_journal(force=True)
@@ -182,6 +182,8 @@ class UniqueFilter(BaseFilter, FileManagerAware):
     def get_unique(self):
         unique = set()
         for dups in group_by_hash(self.fm.thisdir.files_all):
+            for fobj in dups:
+                fobj.load_once()
             try:
                 unique.add(min(dups, key=lambda fobj: fobj.stat.st_ctime))
             except ValueError:
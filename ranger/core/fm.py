@@ -24,10 +24,16 @@ from ranger.container.bookmarks import Bookmarks
 from ranger.container.directory import Directory
 from ranger.container.tags import Tags, TagsDummy
 from ranger.core.actions import Actions
+from ranger.core.copy_journal import CopyJournal
+from ranger.core.listing_cache import ListingCache
 from ranger.core.loader import Loader
 from ranger.core.metadata import MetadataManager
+from ranger.core.preview_cache import PreviewCache
+from ranger.core.preview_workers import PreviewWorkerPool
+from ranger.core.thumbnail_cache import ThumbnailCache
 from ranger.core.runner import Runner
 from ranger.core.tab import Tab
+from ranger.core.watcher import Watcher
 from ranger.ext import logutils
 from ranger.ext.img_display import get_image_displayer
 from ranger.ext.posix_signals import call_signal_handler, delay_signal
@@ -97,17 +103,24 @@ class FM(Actions,  # pylint: disable=too-many-instance-attributes
         self.tabs = {}
         self.tags = tags
         self.restorable_tabs = deque([], ranger.MAX_RESTORABLE_TABS)
-        self.previews = {}
+        self.previews = PreviewCache()
+        self.preview_prefetcher = None
+        self.preview_workers = PreviewWorkerPool()
+        self.thumbnails = ThumbnailCache()
         self.default_linemodes = deque()
         self.loader = Loader()
         self.copy_buffer = set()
         self.do_cut = False
         self.metadata = MetadataManager()
+        self.listing_cache = ListingCache()
+        self.watcher = Watcher()
         self.image_displayer = None
         self.run = None
         self.rifle = None
         self.thistab = None
         self.zombies = ProcessSet()
+        self.eviction_requested = False
+        self.next_eviction = 0
 
         try:
             self.username = pwd.getpwuid(os.geteuid()).pw_name
@@ -153,6 +166,16 @@ class FM(Actions,  # pylint: disable=too-many-instance-attributes
             lambda signal: signal.fm.previews.clear(),
         )
 
+        def set_preview_cache_limits():
+            self.previews.max_bytes = self.settings.preview_cache_memory * 1024 * 1024
+            self.previews.persistent = self.settings.preview_cache_persistent
+            self.thumbnails.max_bytes = self.settings.preview_images_cache_size * 1024 * 1024
+        set_preview_cache_limits()
+        for option in ('preview_cache_memory', 'preview_cache_persistent',
+                       'preview_images_cache_size'):
+            self.settings.signal_bind('setopt.' + option, set_preview_cache_limits,
+                                      priority=settings.SIGNAL_PRIORITY_AFTER_SYNC)
+
         if ranger.args.clean:
             self.tags = TagsDummy("")
         elif self.tags is None:
@@ -292,11 +315,42 @@ class FM(Actions,  # pylint: disable=too-many-instance-attributes
             'setopt.metadata_deep_search',
             lambda signal: setattr(signal.fm.metadata, 'deep_search', signal.value)
         )
+        for option in ('preview_script', 'preview_workers'):
+            self.settings.signal_bind(
+                'setopt.' + option,
+                lambda signal: signal.fm.preview_workers.shutdown(),
+            )
+        self.settings.signal_bind(
+            'setopt.watch_directories',
+            lambda signal: signal.fm.watcher.reset()
+        )
+        for option in ('directory_cache_limit', 'directory_cache_memory'):
+            self.settings.signal_bind(
+                'setopt.' + option,
+                lambda signal: signal.fm.evict_directories(),
+                priority=settings.SIGNAL_PRIORITY_AFTER_SYNC,
+            )
+        self.signal_bind('finished_loading_dir',
+                         lambda signal: signal.origin.request_eviction())
+
+        def cancel_previews(sig):
+            # The previews of files the cursor has left aren't needed anymore,
+            # unless they're close enough to be prefetched
+            if sig.tab is sig.origin.thistab:
+                sig.origin.cancel_previews(
+                    keep=sig.new.realpath if sig.new is not None else None,
+                    neighbours=[fobj.realpath for fobj
+                                in sig.origin.get_preview_neighbours()])
+        self.signal_bind('move', cancel_previews)
         self.settings.signal_bind(
             'setopt.save_backtick_bookmark',
             lambda signal: signal.fm.bookmarks.enable_saving_backtick_bookmark(signal.value)
         )
 
+        if CopyJournal.find_interrupted():
+            self.notify("Pasting was interrupted, type :paste_resume to resume it "
+                        "or :paste_resume discard=True to drop it")
+
     def destroy(self):
         debug = ranger.args.debug
         if self.ui:
@@ -311,6 +365,9 @@ class FM(Actions,  # pylint: disable=too-many-instance-attributes
             except Exception:  # pylint: disable=broad-except
                 if debug:
                     raise
+        self.watcher.destroy()
+        self.preview_workers.shutdown()
+        self.thumbnails.save()
 
     @staticmethod
     def get_log():
@@ -482,18 +539,72 @@ class FM(Actions,  # pylint: disable=too-many-instance-attributes
             del self.directories[key]
             if value.is_directory:
                 value.files = None
+                self.watcher.unwatch(value)
         self.settings.signal_garbage_collect()
         self.signal_garbage_collect()
 
+    def request_eviction(self):
+        """Let the main loop call evict_directories() soon
+
+        Going through all loaded directories after each one that finished
+        loading would be quadratic, so the main loop does it at most every
+        TIME_BETWEEN_DIRECTORY_EVICTIONS seconds.
+        """
+        self.eviction_requested = True
+
+    def evict_directories(self):
+        """Unload the least recently used directories beyond the cache budget
+
+        The budget is given by the settings directory_cache_limit (a number
+        of loaded directories) and directory_cache_memory (an estimate in
+        MiB).  Evicted directories stay in self.directories without their
+        files, so they keep their state and load again when they're visited.
+        """
+        self.eviction_requested = False
+        self.next_eviction = time() + ranger.TIME_BETWEEN_DIRECTORY_EVICTIONS
+        limit = self.settings.directory_cache_limit
+        memory = self.settings.directory_cache_memory * 1024 * 1024
+        if limit <= 0 and memory <= 0:
+            return
+
+        in_use = set()
+        for tab in self.tabs.values():
+            in_use.update(tab.pathway)
+            if tab.thisfile is not None and tab.thisfile.is_directory:
+                in_use.add(tab.thisfile)
+
+        loaded = [directory for directory in self.directories.values()
+                  if directory.files_all is not None]
+        count = len(loaded)
+        usage = sum(directory.estimate_memory_usage() for directory in loaded)
+        loaded.sort(key=lambda directory: directory.last_used)
+        for directory in loaded:
+            if (limit <= 0 or count <= limit) and (memory <= 0 or usage <= memory):
+                break
+            if directory in in_use or directory.loading or directory.marked_items:
+                continue
+            count -= 1
+            usage -= directory.estimate_memory_usage()
+            # Subdirectories that were never loaded are only referenced by
+            # this directory and would pile up otherwise
+            for fobj in directory.files_all:
+                if fobj.is_directory and not fobj.content_loaded and not fobj.loading \
+                        and fobj not in in_use and self.directories.get(fobj.path) is fobj:
+                    del self.directories[fobj.path]
+                    self.watcher.unwatch(fobj)
+            directory.unload_content()
+            self.watcher.unwatch(directory)
+
     def loop(self):
         """The main loop of ranger.
 
         It consists of:
         1. reloading bookmarks if outdated
-        2. letting the loader work
+        2. letting the watcher and the loader work
         3. drawing and finalizing ui
         4. reading and handling user input
         5. after X loops: collecting unused directory objects
+        6. unloading directories beyond the cache budget
         """
 
         self.enter_dir(self.thistab.path)
@@ -502,12 +613,14 @@ class FM(Actions,  # pylint: disable=too-many-instance-attributes
         ui = self.ui
         throbber = ui.throbber
         loader = self.loader
+        watcher = self.watcher
         zombies = self.zombies
 
         ranger.api.hook_ready(self)
 
         try:  # pylint: disable=too-many-nested-blocks
             while True:
+                watcher.poll()
                 loader.work()
                 if loader.has_work():
                     throbber(loader.status)
@@ -527,6 +640,9 @@ class FM(Actions,  # pylint: disable=too-many-instance-attributes
                         if zombie.poll() is not None:
                             zombies.remove(zombie)
 
+                if self.eviction_requested and time() >= self.next_eviction:
+                    self.evict_directories()
+
                 # gc_tick += 1
                 # if gc_tick > ranger.TICKS_BEFORE_COLLECTING_GARBAGE:
                     # gc_tick = 0
@@ -0,0 +1,105 @@
+# This file is part of ranger, the console file manager.
+# License: GNU GPL version 3, see the file "AUTHORS" for details.
+
+"""
+A persistent cache of directory listings.
+
+Each listing is stored as a json file in ranger's cache directory.  The file
+is named after the st_dev and st_ino of the directory and remembers the
+st_mtime of the directory at the time it was read.  A listing is only handed
+out while that mtime is unchanged, which is the same test that
+Directory.load_content_if_outdated() uses for directories in memory.
+
+Every PRUNE_INTERVAL stored listings, the ones that were stored longest ago
+are removed if there are more than MAX_LISTINGS.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+
+import os
+from io import open
+
+import ranger
+from ranger.ext.atomic_json import dump_json
+from ranger.ext.remove_oldest_files import remove_oldest_files
+
+
+LISTING_CACHE_DIR_NAME = "listings"
+MAX_LISTINGS = 2000
+PRUNE_INTERVAL = 100
+
+
+def _pack_stat(stat):
+    return [stat.st_mode, stat.st_ino, stat.st_dev, stat.st_nlink, stat.st_uid,
+            stat.st_gid, stat.st_size, stat.st_atime, stat.st_mtime, stat.st_ctime]
+
+
+class ListingCache(object):
+    """Stores and retrieves the entries of directories
+
+    A listing is a list of (path, stats, is_a_dir, deferred) tuples, just like
+    the ones returned by ranger.container.directory_entries.stat_entries().
+    """
+
+    def __init__(self, max_listings=MAX_LISTINGS):
+        self.max_listings = max_listings
+        # Prune on the first store, so that an oversized cache is noticed
+        self._stores_until_prune = 0
+
+    @property
+    def path(self):
+        return os.path.join(ranger.args.cachedir, LISTING_CACHE_DIR_NAME)
+
+    def _get_cachefile(self, dirstat):
+        return os.path.join(self.path, '%x-%x' % (dirstat.st_dev, dirstat.st_ino))
+
+    def get(self, dirpath, dirstat):
+        """Returns the listing of the directory, or None if it's outdated
+
+        dirstat is the current stat() of the directory at dirpath.
+        """
+        import json
+
+        try:
+            with open(self._get_cachefile(dirstat), "r", encoding="utf-8") as fobj:
+                content = json.load(fobj)
+        except (IOError, OSError, ValueError):
+            return None
+
+        try:
+            if content["mtime"] != dirstat.st_mtime:
+                return None
+            listing = []
+            prefix = dirpath if dirpath == '/' else dirpath + '/'
+            for name, is_a_dir, deferred, stat, lstat in content["entries"]:
+                if stat is None:
+                    stats = None
+                else:
+                    stat = os.stat_result(stat)
+                    stats = (stat, stat if lstat is None else os.stat_result(lstat))
+                listing.append((prefix + name, stats, is_a_dir, deferred))
+        except (KeyError, TypeError, ValueError):
+            return None
+        return listing
+
+    def set(self, dirstat, listing):
+        """Stores the listing of a directory that was read at dirstat"""
+        entries = []
+        for path, stats, is_a_dir, deferred in listing:
+            if stats is None:
+                stat = lstat = None
+            else:
+                stat = _pack_stat(stats[0])
+                lstat = None if stats[1] is stats[0] else _pack_stat(stats[1])
+            entries.append([os.path.basename(path), is_a_dir, deferred, stat, lstat])
+        content = {"mtime": dirstat.st_mtime, "entries": entries}
+        dump_json(self._get_cachefile(dirstat), content)
+
+        self._stores_until_prune -= 1
+        if self._stores_until_prune <= 0:
+            self._stores_until_prune = PRUNE_INTERVAL
+            self.prune()
+
+    def prune(self):
+        """Removes the listings that were stored longest ago beyond max_listings"""
+        remove_oldest_files(self.path, max_count=self.max_listings)
@@ -3,10 +3,12 @@
 
 from __future__ import (absolute_import, division, print_function)
 
+import codecs
 import errno
 import os.path
 import os
 import select
+import stat
 from collections import deque
 from io import open
 from subprocess import Popen, PIPE
@@ -22,13 +24,225 @@ except ImportError:
 from ranger import PY3
 from ranger.core.shared import FileManagerAware
 from ranger.ext.human_readable import human_readable
-from ranger.ext.safe_path import get_safe_path
 from ranger.ext.signals import SignalDispatcher
+from ranger.ext.power_supply import on_battery
+from ranger.ext.thread_pool import Delay, Job, ThreadPool
+
+try:
+    from os import scandir
+except ImportError:
+    scandir = None  # pylint: disable=invalid-name
+
+
+# The number of directories a SizeCache remembers at most
+SIZE_CACHE_MAX_ENTRIES = 100000
+
+
+class SizeCache(object):
+    """Remembers what calculate_size() found in each directory
+
+    The entries are keyed by the path of the directory.  An entry is a tuple
+    (mtime, dev, follow_file_links, size, links, subdirs), see _scan_size().
+    It is only used while the mtime of its directory is unchanged, so that
+    calculating the size of a tree again mostly takes one stat() per
+    directory.  Like everywhere else in ranger, files that change their size
+    without changing the mtime of their directory go unnoticed.
+    """
+
+    def __init__(self, max_entries=SIZE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, path):
+        return self._entries.get(path)
+
+    def set(self, path, entry):
+        if len(self._entries) >= self.max_entries and path not in self._entries:
+            self._entries.clear()
+        self._entries[path] = entry
+
+    def clear(self):
+        self._entries.clear()
+
+
+def list_entries(path):
+    """Returns the (name, lstat mode, size, mtime) of each entry in the directory
+
+    With scandir(), only regular files need a stat() call.
+    """
+    result = []
+    if scandir is None:
+        for name in os.listdir(path):
+            try:
+                fstat = os.lstat(os.path.join(path, name))
+            except OSError:
+                result.append((name, stat.S_IFREG, 0, 0))
+            else:
+                result.append((name, fstat.st_mode, fstat.st_size, fstat.st_mtime))
+        return result
+    for entry in scandir(path):
+        try:
+            if entry.is_symlink():
+                result.append((entry.name, stat.S_IFLNK, 0, 0))
+            elif entry.is_dir(follow_symlinks=False):
+                result.append((entry.name, stat.S_IFDIR, 0, 0))
+            else:
+                fstat = entry.stat(follow_symlinks=False)
+                result.append((entry.name, fstat.st_mode, fstat.st_size, fstat.st_mtime))
+        except OSError:
+            result.append((entry.name, stat.S_IFREG, 0, 0))
+    return result
+
+
+def _scan_entries(path):
+    """Returns the path and the scandir() entry, if available, of each entry"""
+    if scandir is not None:
+        return [(entry.path, entry) for entry in scandir(path)]
+    return [(os.path.join(path, name), None) for name in os.listdir(path)]
+
+
+def _scan_size(path, follow_file_links, cached=None, root_dev=None):
+    """Returns a SizeCache entry for the files directly in path
+
+    The entry is (mtime, dev, follow_file_links, size, links, subdirs), where
+    size sums up the files that are counted once for sure and links lists
+    the (dev, inode, size) of those that may appear elsewhere too: hard links
+    and the targets of symlinks.  Symlinks to directories are never followed.
+    Symlinks to files count with the size of their target if
+    follow_file_links is True and are skipped otherwise.
+
+    The cached entry is returned as it is if the directory didn't change.
+    Returns None if the directory can't be read or, unless root_dev is None,
+    if it's on another device than root_dev.
+    """
+    try:
+        dirstat = os.stat(path)
+    except OSError:
+        return None
+    if root_dev is not None and dirstat.st_dev != root_dev:
+        return None
+    if cached is not None and cached[:3] == (dirstat.st_mtime, dirstat.st_dev,
+                                             follow_file_links):
+        return cached
+
+    size = 0
+    links = []
+    subdirs = []
+    try:
+        entries = _scan_entries(path)
+    except OSError:
+        return None
+    for fpath, entry in entries:
+        try:
+            if entry is None:
+                fstat = os.lstat(fpath)
+            elif entry.is_dir(follow_symlinks=False):
+                subdirs.append(fpath)
+                continue
+            else:
+                fstat = entry.stat(follow_symlinks=False)
+            if stat.S_ISLNK(fstat.st_mode):
+                if not follow_file_links:
+                    continue
+                fstat = os.stat(fpath)
+                if stat.S_ISDIR(fstat.st_mode):
+                    continue
+                links.append((fstat.st_dev, fstat.st_ino, fstat.st_size))
+                continue
+            elif stat.S_ISDIR(fstat.st_mode):
+                subdirs.append(fpath)
+                continue
+        except OSError:
+            continue
+        if fstat.st_nlink > 1:
+            links.append((dirstat.st_dev, fstat.st_ino, fstat.st_size))
+        else:
+            size += fstat.st_size
+    return (dirstat.st_mtime, dirstat.st_dev, follow_file_links, size, links, subdirs)
+
+
+def calculate_size(  # pylint: disable=too-many-locals
+        loader, paths, follow_file_links=False, one_file_system=False, progress=None):
+    """Sum up the size of the directory trees at the given paths
+
+    The directories are read through loader.submit(), so with worker threads
+    several of them are scanned at the same time.  Files with several hard
+    links are counted once.  With one_file_system, subdirectories on other
+    devices than their tree's root are skipped.  What was found in each
+    directory is kept in loader.size_cache for the next calculation.  If
+    progress is given, it's called with the numbers of read and pending
+    directories.
+
+    This generator yields the pending Job while it waits for one and the
+    running total otherwise, so the last value is the total size.  Closing
+    it cancels the pending jobs.
+    """
+    cache = loader.size_cache
+
+    def submit(path, root_dev):
+        return (path, root_dev, loader.submit(
+            _scan_size, path, follow_file_links, cache.get(path), root_dev))
+
+    jobs = deque(submit(path, None) for path in paths)
+    seen_links = set()
+    size = 0
+    scanned = 0
+    try:
+        while jobs:
+            if not jobs[0][2].done():
+                yield jobs[0][2]
+                continue
+            path, root_dev, job = jobs.popleft()
+            entry = job.result()
+            scanned += 1
+            if entry is None:
+                continue
+            cache.set(path, entry)
+            _, dev, _, dirsize, links, subdirs = entry
+            size += dirsize
+            for link_dev, inode, link_size in links:
+                if (link_dev, inode) not in seen_links:
+                    seen_links.add((link_dev, inode))
+                    size += link_size
+            if one_file_system and root_dev is None:
+                root_dev = dev
+            for subdir in subdirs:
+                jobs.append(submit(subdir, root_dev))
+            if progress is not None:
+                progress(scanned, len(jobs))
+            yield size
+    finally:
+        for _, _, job in jobs:
+            job.cancel()
+
+
+# Priority classes of Loadables.  The Loader runs up to a few Loadables of
+# each class at once, see the setting loader_concurrency, and lower classes
+# get to work first.
+PRIORITY_DIRECTORY = 0
+PRIORITY_PREVIEW = 1
+PRIORITY_BACKGROUND = 2
+PRIORITY_CLASS_NAMES = ('directories', 'previews', 'background')
+DEFAULT_CONCURRENCY = (4, 2, 2)
+
+# Seconds the Loader sleeps at once while all running items wait for jobs
+WAIT_INTERVAL = 0.005
+
+# How long the cursor has to rest on a file before the previews of its
+# neighbours are generated, in seconds
+PREFETCH_DELAY = 0.5
+
+# How many bytes CommandLoader reads from the output of a process at once
+READ_CHUNK_SIZE = 65536
 
 
 class Loadable(object):
     paused = False
     progressbar_supported = False
+    priority_class = PRIORITY_BACKGROUND
 
     def __init__(self, gen, descr):
         self.load_generator = gen
@@ -51,112 +265,148 @@ class Loadable(object):
         pass
 
 
-class CopyLoader(Loadable, FileManagerAware):  # pylint: disable=too-many-instance-attributes
+class CumulativeSizeLoader(Loadable, FileManagerAware):
+    """Calculates the cumulative size of a directory in the background
+
+    While it's counting, the infostring of the directory shows the running
+    total followed by a "+".  Removing it from the loader restores the
+    previous infostring.
+    """
     progressbar_supported = True
 
-    def __init__(  # pylint: disable=too-many-positional-arguments
-        self,
-        copy_buffer,
-        do_cut=False,
-        overwrite=False,
-        dest=None,
-        make_safe_path=get_safe_path,
-    ):
-        self.copy_buffer = tuple(copy_buffer)
-        self.do_cut = do_cut
-        self.original_copy_buffer = copy_buffer
-        self.original_path = dest if dest is not None else self.fm.thistab.path
-        self.overwrite = overwrite
-        self.make_safe_path = make_safe_path
-        self.percent = 0
-        if self.copy_buffer:
-            self.one_file = self.copy_buffer[0]
-        Loadable.__init__(self, self.generate(), 'Calculating size...')
-
-    def _calculate_size(self):
-        from os.path import join
-        size = 0
-        stack = [fobj.path for fobj in self.copy_buffer]
-        while stack:
-            yield size
-            fname = stack.pop()
-            if os.path.islink(fname):
-                continue
-            if os.path.isdir(fname):
-                for item in os.listdir(fname):
-                    stack.append(join(fname, item))
-                    yield size
-            else:
-                try:
-                    fstat = os.stat(fname)
-                    size += fstat.st_size
-                except OSError:
-                    pass
-        yield size
+    def __init__(self, directory):
+        self.directory = directory
+        Loadable.__init__(self, self.generate(), 'Calculating size: ' + directory.path)
 
-    def generate(self):  # pylint: disable=too-many-branches
-        if not self.copy_buffer:
-            return
+    def _set_progress(self, scanned, pending):
+        self.percent = 100. * scanned / (scanned + pending)
 
-        from ranger.ext import shutil_generatorized as shutil_g
-        # TODO: Don't calculate size when renaming (needs detection)
-        size = 0
-        for size in self._calculate_size():
-            yield
-        size = max(1, size)
-        size_str = " (" + human_readable(size) + ")"
-        done = 0
-        if self.do_cut:
-            self.original_copy_buffer.clear()
-            if len(self.copy_buffer) == 1:
-                self.description = "moving: " + self.one_file.path + size_str
-            else:
-                self.description = "moving files from: " + self.one_file.dirname + size_str
-            for fobj in self.copy_buffer:
-                for path in self.fm.tags.tags:
-                    if path == fobj.path or str(path).startswith(fobj.path):
-                        tag = self.fm.tags.tags[path]
-                        self.fm.tags.remove(path)
-                        new_path = path.replace(
-                            fobj.path,
-                            os.path.join(self.original_path, fobj.basename))
-                        self.fm.tags.tags[new_path] = tag
-                        self.fm.tags.dump()
-                n = 0
-                for n in shutil_g.move(src=fobj.path, dst=self.original_path,
-                                       overwrite=self.overwrite,
-                                       make_safe_path=self.make_safe_path):
-                    self.percent = ((done + n) / size) * 100.
-                    yield
-                done += n
+    def generate(self):
+        directory = self.directory
+        prefix = '-> ' if directory.is_link else ' '
+        old_infostring = directory.infostring
+        finished = False
+        try:
+            size = 0
+            for result in calculate_size(
+                    self.fm.loader, [directory.path], follow_file_links=True,
+                    one_file_system=self.fm.settings.cumulative_size_one_file_system,
+                    progress=self._set_progress):
+                if isinstance(result, Job):
+                    yield result
+                    continue
+                infostring = prefix + human_readable(result) + '+'
+                if infostring != directory.infostring:
+                    directory.infostring = infostring
+                    self.fm.ui.redraw_main_column()
+                size = result
+                yield
+            finished = True
+            directory.cumulative_size_calculated = True
+            directory.size = size
+            directory.infostring = prefix + human_readable(size)
+        finally:
+            if not finished:
+                directory.infostring = old_infostring
+            self.fm.ui.redraw_main_column()
+            self.fm.ui.status.request_redraw()
+
+    def unload(self):
+        # Cancels the jobs that are still queued in the thread pool
+        self.load_generator.close()
+
+
+class OutputBuffer(object):
+    """Collects the output of a process and decodes it on the way
+
+    Appending each read to one bytes object copies everything read so far
+    every time, and decoding it all at the end needs another copy.  This
+    decodes each chunk as it arrives and keeps the complete lines in the
+    list self.lines, which grows while the process runs, so that the output
+    can be shown before it's complete.  In Python 2, the lines stay bytes.
+
+    If max_size is given, the bytes beyond it are dropped and truncated is
+    set.  Output that isn't valid UTF-8 is decoded with safe_decode() once
+    it's complete, and self.lines stays empty until then.
+    """
+
+    _empty = '' if PY3 else b''
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size
+        self.size = 0
+        self.truncated = False
+        self.lines = []
+        # The pieces of the last line, which isn't complete yet
+        self._tail = []
+        self._decoder = codecs.getincrementaldecoder('utf-8')() if PY3 else None
+        # The raw chunks, once the output turned out not to be UTF-8
+        self._raw_chunks = None
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def line_count(self):
+        return len(self.lines)
+
+    def append(self, data):
+        """Adds the data, returns False if the buffer is full"""
+        if self.max_size is not None and self.size + len(data) > self.max_size:
+            data = data[:max(0, self.max_size - self.size)]
+            self.truncated = True
+        if not data:
+            return not self.truncated
+        self.size += len(data)
+        if self._raw_chunks is not None:
+            self._raw_chunks.append(data)
+        elif self._decoder is None:
+            self._add_text(data)
         else:
-            if len(self.copy_buffer) == 1:
-                self.description = "copying: " + self.one_file.path + size_str
-            else:
-                self.description = "copying files from: " + self.one_file.dirname + size_str
-            for fobj in self.copy_buffer:
-                if os.path.isdir(fobj.path) and not os.path.islink(fobj.path):
-                    n = 0
-                    for n in shutil_g.copytree(
-                            src=fobj.path,
-                            dst=os.path.join(self.original_path, fobj.basename),
-                            symlinks=True,
-                            overwrite=self.overwrite,
-                            make_safe_path=self.make_safe_path,
-                    ):
-                        self.percent = ((done + n) / size) * 100.
-                        yield
-                    done += n
-                else:
-                    n = 0
-                    for n in shutil_g.copy2(fobj.path, self.original_path,
-                                            symlinks=True, overwrite=self.overwrite,
-                                            make_safe_path=self.make_safe_path):
-                        self.percent = ((done + n) / size) * 100.
-                        yield
-                    done += n
-        cwd = self.fm.get_directory(self.original_path)
-        cwd.load_content()
+            try:
+                self._add_text(self._decoder.decode(data))
+            except UnicodeDecodeError:
+                self._give_up_decoding(data)
+        return not self.truncated
+
+    def _add_text(self, text):
+        newline = '\n' if PY3 else b'\n'
+        if newline not in text:
+            self._tail.append(text)
+            return
+        parts = text.split(newline)
+        self._tail.append(parts[0])
+        parts[0] = self._empty.join(self._tail)
+        self._tail = [parts.pop()]
+        self.lines.extend(parts)
+
+    def _give_up_decoding(self, data):
+        pending = self._decoder.getstate()[0]
+        self._raw_chunks = [self._join().encode('utf-8'), pending, data]
+        self.lines = []
+        self._tail = []
+        self._decoder = None
+
+    def _join(self):
+        newline = '\n' if PY3 else b'\n'
+        return newline.join(self.lines + [self._empty.join(self._tail)])
+
+    def getvalue(self):
+        """Returns what was decoded so far"""
+        if self._raw_chunks is not None:
+            return safe_decode(b''.join(self._raw_chunks))
+        return self._join()
+
+    def close(self):
+        """Decodes the rest of the output and returns all of it"""
+        if self._decoder is not None:
+            try:
+                # The cut of a truncated output may have split a character,
+                # whose first bytes are left out then
+                self._add_text(self._decoder.decode(b'', not self.truncated))
+            except UnicodeDecodeError:
+                self._give_up_decoding(b'')
+        return self.getvalue()
 
 
 class CommandLoader(  # pylint: disable=too-many-instance-attributes
@@ -166,9 +416,21 @@ class CommandLoader(  # pylint: disable=too-many-instance-attributes
     Output from stderr will be reported.  Ensure that the process doesn't
     ever ask for input, otherwise the loader will be blocked until this
     object is removed from the queue (type ^C in ranger)
+
+    With read=True, stdout is collected in self.stdout_output and the signal
+    "output" is emitted whenever more of it arrives.  Once the process is
+    done, it's available as a string in self.stdout_buffer.  If there's
+    more than max_output bytes of it, the process is killed and truncated
+    is set.  The exit code of the process ends up in self.returncode.
     """
     finished = False
     process = None
+    returncode = None
+    truncated = False
+    # The file that a preview script runs for, see Actions.cancel_previews(),
+    # and whether it runs ahead of the cursor, see PreviewPrefetcher
+    preview_path = None
+    preview_prefetch = False
 
     def __init__(
         # pylint: disable=too-many-arguments
@@ -181,8 +443,10 @@ class CommandLoader(  # pylint: disable=too-many-instance-attributes
         input=None,  # pylint: disable=redefined-builtin
         kill_on_pause=False,
         popenArgs=None,
+        max_output=None,
     ):
         SignalDispatcher.__init__(self)
+        self.stdout_output = OutputBuffer(max_output)
         Loadable.__init__(self, self.generate(), descr)
         self.args = args
         self.silent = silent
@@ -229,8 +493,8 @@ class CommandLoader(  # pylint: disable=too-many-instance-attributes
                 selectlist.append(fd_out)
             if not self.silent:
                 selectlist.append(fd_err)
-            chunk_size = 4096
-            read_stdout = read_stderr = None
+            stdout_output = self.stdout_output
+            stderr_output = OutputBuffer()
             while process.poll() is None:
                 yield
                 if self.finished:
@@ -243,19 +507,20 @@ class CommandLoader(  # pylint: disable=too-many-instance-attributes
                         # read something, rather than until it has read the
                         # requested number of bytes or reaches EOF.
                         if robjs == fd_err:
-                            read = os.read(robjs, chunk_size)
-                            if read:
-                                if read_stderr is None:
-                                    read_stderr = read
-                                else:
-                                    read_stderr += read
+                            stderr_output.append(os.read(robjs, READ_CHUNK_SIZE))
                         elif robjs == fd_out:
-                            read = os.read(robjs, chunk_size)
+                            read = os.read(robjs, READ_CHUNK_SIZE)
                             if read:
-                                if read_stdout is None:
-                                    read_stdout = read
-                                else:
-                                    read_stdout += read
+                                full = not stdout_output.append(read)
+                                self.signal_emit('output', process=process, loader=self)
+                                if full:
+                                    # The rest would be dropped anyway
+                                    self.truncated = True
+                                    try:
+                                        process.kill()
+                                    except OSError:
+                                        pass
+                                    break
                 except select.error:
                     sleep(0.03)
             if not self.silent:
@@ -263,19 +528,20 @@ class CommandLoader(  # pylint: disable=too-many-instance-attributes
                     if PY3:
                         line = safe_decode(line)
                     self.fm.notify(line, bad=True)
-            if self.read:
-                read = process.stdout.read()
-                if read:
-                    read_stdout += read
-            if read_stdout:
-                if PY3:
-                    read_stdout = safe_decode(read_stdout)
-                self.stdout_buffer += read_stdout
-            elif read_stderr:
-                if PY3:
-                    read_stderr = safe_decode(read_stderr)
-                self.fm.notify(read_stderr, bad=True)
+            if self.read and not self.truncated:
+                while True:
+                    read = process.stdout.read(READ_CHUNK_SIZE)
+                    if not read:
+                        break
+                    if not stdout_output.append(read):
+                        self.truncated = True
+                        break
+            if stdout_output:
+                self.stdout_buffer += stdout_output.close()
+            elif stderr_output:
+                self.fm.notify(stderr_output.close(), bad=True)
         self.finished = True
+        self.returncode = process.poll()
         self.signal_emit('after', process=process, loader=self)
 
     def pause(self):
@@ -314,6 +580,113 @@ class CommandLoader(  # pylint: disable=too-many-instance-attributes
                 pass
 
 
+class PreviewLoader(CommandLoader):
+    """Runs the preview script, using a worker of fm.preview_workers if possible
+
+    The arguments are those of the preview script.  Without a worker, or if
+    the worker dies, the script runs in a process of its own, like in a
+    CommandLoader.  See ranger.core.preview_workers.
+    """
+    worker = None
+
+    def __init__(self, args, descr, max_output=None):
+        CommandLoader.__init__(self, args, descr, silent=True, read=True,
+                               max_output=max_output)
+
+    def generate(self):
+        self.worker = self.fm.preview_workers.acquire(self.args[0])
+        if self.worker is not None:
+            for _ in self._generate_with_worker():
+                yield
+            if self.finished:
+                return
+            # The worker died, so this starts over without one
+            self.stdout_output = OutputBuffer(self.stdout_output.max_size)
+            self.truncated = False
+        for _ in CommandLoader.generate(self):
+            yield
+
+    def _generate_with_worker(self):
+        worker = self.worker
+        self.process = worker.process
+        if not worker.request(self.args[1:]):
+            self.fm.preview_workers.discard(worker)
+            self.worker = None
+            return
+        self.signal_emit('before', process=worker.process, loader=self)
+        marker = worker.marker
+        stdout_output = self.stdout_output
+        # The end of the output so far, which may be the start of the marker
+        pending = b''
+        while True:
+            yield
+            try:
+                robjs, _, _ = select.select([worker], [], [], 0.03)
+            except select.error:
+                continue
+            if not robjs:
+                continue
+            read = os.read(worker.fileno(), 65536)
+            if not read:
+                break
+            pending += read
+            index = pending.find(marker)
+            if index < 0:
+                # Only a newline can start the marker
+                index = pending.rfind(b'\n', max(0, len(pending) - len(marker) + 1))
+                if index < 0:
+                    index = len(pending)
+            output, pending = pending[:index], pending[index:]
+            if output:
+                if not stdout_output.append(output):
+                    # The worker is killed to stop the script
+                    self.truncated = True
+                    self.returncode = 0
+                    break
+                self.signal_emit('output', process=worker.process, loader=self)
+            if pending.startswith(marker) and pending.endswith(b'\n'):
+                try:
+                    self.returncode = int(pending[len(marker):])
+                except ValueError:
+                    break
+                self.fm.preview_workers.release(worker)
+                self.worker = None
+                self.stdout_buffer += stdout_output.close()
+                self.finished = True
+                self.signal_emit('after', process=worker.process, loader=self)
+                return
+        self.fm.preview_workers.discard(worker)
+        self.worker = None
+        if self.truncated:
+            self.stdout_buffer += stdout_output.close()
+            self.finished = True
+            self.signal_emit('after', process=worker.process, loader=self)
+
+    def pause(self):
+        if self.worker is None:
+            CommandLoader.pause(self)
+        elif not self.paused:
+            self.worker.send_signal(signal.SIGTSTP)
+            Loadable.pause(self)
+
+    def unpause(self):
+        if self.worker is None:
+            CommandLoader.unpause(self)
+        elif self.paused:
+            self.worker.send_signal(signal.SIGCONT)
+            Loadable.unpause(self)
+
+    def destroy(self):
+        worker = self.worker
+        if worker is None:
+            CommandLoader.destroy(self)
+            return
+        self.signal_emit('destroy', process=worker.process, loader=self)
+        # The script can't be stopped without its worker
+        self.worker = None
+        self.fm.preview_workers.discard(worker)
+
+
 def safe_decode(string):
     try:
         return string.decode("utf-8")
@@ -325,9 +698,40 @@ def safe_decode(string):
         return ""
 
 
-class Loader(FileManagerAware):
+class PreviewPrefetcher(Loadable, FileManagerAware):
+    """Starts generating the previews of the files around the cursor
+
+    It waits for PREFETCH_DELAY first, so that nothing is prefetched while
+    the cursor moves quickly.  The previews are generated by background
+    CommandLoaders, see Actions.get_preview().  target identifies the file
+    and preview size that the prefetcher was made for.
+    """
+
+    def __init__(self, target, files, width, height):
+        self.target = target
+        self.files = files
+        self.width = width
+        self.height = height
+        Loadable.__init__(self, self.generate(), 'Prefetching previews')
+
+    def generate(self):
+        delay = Delay(PREFETCH_DELAY)
+        while not delay.done():
+            yield delay
+        if not self.fm.settings.preview_prefetch_on_battery and on_battery():
+            return
+        for fobj in self.files:
+            self.fm.get_preview(fobj, self.width, self.height, prefetch=True)
+            yield
+
+
+class Loader(FileManagerAware):  # pylint: disable=too-many-instance-attributes
     """
     The Manager of 'Loadable' objects, referenced as fm.loader
+
+    Several Loadables are worked on at once, taking turns.  Which ones is
+    decided by their priority_class and the setting loader_concurrency:
+    the first n queued items of each class run, the others wait.
     """
     seconds_of_work_time = 0.03
     throbber_chars = r'/-\|'
@@ -336,11 +740,14 @@ class Loader(FileManagerAware):
 
     def __init__(self):
         self.queue = deque()
+        self.pool = None
+        self.background_pool = None
+        self.size_cache = SizeCache()
         self.item = None
         self.load_generator = None
         self.throbber_status = 0
         self.rotate()
-        self.old_item = None
+        self.active = []
         self.status = None
 
     def rotate(self):
@@ -380,8 +787,6 @@ class Loader(FileManagerAware):
 
         if pos_dest == 0:
             self.queue.appendleft(item)
-            if pos_src != 0:
-                self.queue[1].pause()
         elif pos_dest == -1:
             self.queue.append(item)
         else:
@@ -404,6 +809,8 @@ class Loader(FileManagerAware):
             self.fm.signal_emit("loader.destroy", loadable=item, fm=self.fm)
             item.destroy()
             del self.queue[index]
+            if item in self.active:
+                self.active.remove(item)
             if len(self.queue) == 0:
                 self.status = None
             if item.progressbar_supported:
@@ -418,15 +825,41 @@ class Loader(FileManagerAware):
 
         self.paused = state
 
-        if not self.queue:
-            return
-
-        if state:
-            self.queue[0].pause()
-        else:
-            self.queue[0].unpause()
-
-    def work(self):
+        for item in self.active:
+            if state:
+                item.pause()
+            else:
+                item.unpause()
+
+    def get_concurrency(self, priority_class):
+        """How many Loadables of the priority class may run at once"""
+        limits = self.fm.settings.loader_concurrency
+        if limits and priority_class < len(limits):
+            return max(1, limits[priority_class])
+        return DEFAULT_CONCURRENCY[priority_class]
+
+    def _get_active_items(self):
+        active = []
+        counts = [0] * len(PRIORITY_CLASS_NAMES)
+        for priority_class in range(len(PRIORITY_CLASS_NAMES)):
+            limit = self.get_concurrency(priority_class)
+            for item in self.queue:
+                if item.priority_class == priority_class and counts[priority_class] < limit:
+                    counts[priority_class] += 1
+                    active.append(item)
+        return active
+
+    def get_class_states(self):
+        """Returns (name, running, waiting, limit) for each priority class"""
+        states = []
+        for priority_class, name in enumerate(PRIORITY_CLASS_NAMES):
+            items = [item for item in self.queue if item.priority_class == priority_class]
+            running = sum(1 for item in items if item in self.active)
+            states.append((name, running, len(items) - running,
+                           self.get_concurrency(priority_class)))
+        return states
+
+    def work(self):  # pylint: disable=too-many-branches
         """Load items from the queue if there are any.
 
         Stop after approximately self.seconds_of_work_time.
@@ -435,51 +868,65 @@ class Loader(FileManagerAware):
             self.status = self.throbber_paused
             return
 
-        while True:
-            # get the first item with a proper load_generator
-            try:
-                item = self.queue[0]
-                if item.load_generator is None:
-                    self.queue.popleft()
-                else:
-                    break
-            except IndexError:
-                return
-
-        item.unpause()
+        for item in [item for item in self.queue if item.load_generator is None]:
+            self.queue.remove(item)
+
+        active = self._get_active_items()
+        for item in self.active:
+            if item not in active:
+                item.pause()
+        for item in active:
+            item.unpause()
+        self.active = active
+        if not active:
+            return
 
         self.rotate()
-        if item != self.old_item:
-            if self.old_item:
-                self.old_item.pause()
-            self.old_item = item
-        item.unpause()
 
         end_time = time() + self.seconds_of_work_time
-
-        while time() < end_time:
-            try:
-                next(item.load_generator)
-            except StopIteration:
-                self._remove_current_process(item)
-                break
-            except Exception as ex:  # pylint: disable=broad-except
-                self.fm.notify(
-                    'Loader work process failed: {0} (Percent: {1})'.format(
-                        item.description, item.percent),
-                    bad=True,
-                    exception=ex,
-                )
-                self.old_item = None
-                self._remove_current_process(item)
-                break
-        else:
-            if item.progressbar_supported:
-                self.fm.ui.status.request_redraw()
+        running = list(active)
+        # Maps items to the Job they are waiting for
+        waiting = {}
+
+        while running and time() < end_time:
+            progressed = False
+            for item in tuple(running):
+                job = waiting.get(item)
+                if job is not None:
+                    if not job.done():
+                        continue
+                    del waiting[item]
+                try:
+                    result = next(item.load_generator)
+                    progressed = True
+                    if isinstance(result, Job):
+                        waiting[item] = result
+                except StopIteration:
+                    running.remove(item)
+                    self._remove_current_process(item)
+                except Exception as ex:  # pylint: disable=broad-except
+                    self.fm.notify(
+                        'Loader work process failed: {0} (Percent: {1})'.format(
+                            item.description, item.percent),
+                        bad=True,
+                        exception=ex,
+                    )
+                    running.remove(item)
+                    self._remove_current_process(item)
+            if not progressed and waiting:
+                # All items wait for the thread pool, so sleep instead of
+                # spinning until a job is done or the time is up.
+                next(iter(waiting.values())).wait(
+                    min(WAIT_INTERVAL, max(0, end_time - time())))
+
+        if any(item.progressbar_supported for item in running):
+            self.fm.ui.status.request_redraw()
 
     def _remove_current_process(self, item):
         item.load_generator = None
         self.queue.remove(item)
+        if item in self.active:
+            self.active.remove(item)
         self.fm.signal_emit("loader.after", loadable=item, fm=self.fm)
         if item.progressbar_supported:
             self.fm.ui.status.request_redraw()
@@ -488,6 +935,42 @@ class Loader(FileManagerAware):
         """Is there anything to load?"""
         return bool(self.queue)
 
+    def submit(self, func, *args):
+        """Run func(*args) on the thread pool and return the Job
+
+        The pool has as many threads as the setting loader_threads says.
+        Without threads, the job runs in the main loop once the Loadable
+        that submitted it checks whether it is done.
+        """
+        return self._submit('pool', func, args)
+
+    def submit_background(self, func, *args):
+        """Like submit(), but on a pool of its own for jobs that take long
+
+        Jobs like copying a file would otherwise hold up the short jobs that
+        directories and previews queue in the same pool behind them.
+        """
+        return self._submit('background_pool', func, args)
+
+    def _submit(self, pool_name, func, args):
+        size = self.fm.settings.loader_threads
+        pool = getattr(self, pool_name)
+        if size <= 0:
+            if pool is not None:
+                pool.shutdown()
+                setattr(self, pool_name, None)
+            return Job(func, args)
+        if pool is None:
+            pool = ThreadPool(size)
+            setattr(self, pool_name, pool)
+        elif pool.size != size:
+            pool.resize(size)
+        return pool.submit(func, *args)
+
     def destroy(self):
         while self.queue:
             self.queue.pop().destroy()
+        for pool in (self.pool, self.background_pool):
+            if pool is not None:
+                pool.shutdown()
+        self.pool = self.background_pool = None
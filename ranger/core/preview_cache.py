@@ -0,0 +1,192 @@
+# This file is part of ranger, the console file manager.
+# License: GNU GPL version 3, see the file "AUTHORS" for details.
+
+"""
+A cache of the previews that the preview script generates.
+
+The previews of recently viewed files are kept in memory, up to the setting
+preview_cache_memory.  With preview_cache_persistent, text previews are also
+stored in ranger's cache directory, so that they survive restarts.  A stored
+preview is only used for a file with the same device, inode, mtime and size,
+and for a preview script with the same mtime, so it never needs to be checked
+for being outdated.
+
+Every PRUNE_INTERVAL stored previews, the ones that were stored longest ago
+are removed beyond MAX_STORED_PREVIEWS files or MAX_STORED_BYTES.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+
+import os
+from collections import OrderedDict
+from hashlib import sha1
+from io import open
+
+import ranger
+from ranger.ext.atomic_json import dump_json
+from ranger.ext.remove_oldest_files import remove_oldest_files
+
+
+PREVIEW_CACHE_DIR_NAME = "previews"
+MAX_STORED_PREVIEWS = 2000
+MAX_STORED_BYTES = 64 * 1024 * 1024
+PRUNE_INTERVAL = 100
+
+
+def _get_size(data):
+    return sum(len(value) for value in data.values() if isinstance(value, (str, bytes)))
+
+
+class PreviewCache(object):  # pylint: disable=too-many-instance-attributes
+    """Maps the paths of files to the data of their previews
+
+    The data of a file is a dict that get_preview() fills in, see there.
+    Like a dict, the cache hands out the data of any path it holds, but it
+    forgets the least recently touched ones beyond max_bytes of text.  The
+    data of previews that are still loading is never forgotten.
+
+    memory_hits, disk_hits and misses count how get_preview() found
+    previews: in memory, stored on the disk or not at all.
+    """
+
+    def __init__(self, max_bytes=0):
+        self.max_bytes = max_bytes
+        self.persistent = False
+        self.size = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._sizes = {}
+        # Prune on the first store, so that an oversized cache is noticed
+        self._stores_until_prune = 0
+
+    def __contains__(self, path):
+        return path in self._entries
+
+    def __getitem__(self, path):
+        return self._entries[path]
+
+    def __setitem__(self, path, data):
+        if path in self._entries:
+            del self[path]
+        self._entries[path] = data
+        self.update_size(path)
+
+    def __delitem__(self, path):
+        del self._entries[path]
+        self.size -= self._sizes.pop(path, 0)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, path, default=None):
+        try:
+            return self._entries[path]
+        except KeyError:
+            return default
+
+    def touch(self, path):
+        """Mark the data of the path as recently used"""
+        data = self._entries.pop(path)
+        self._entries[path] = data
+
+    def update_size(self, path):
+        """Account for a change of the data of the path
+
+        The least recently used data is forgotten if the cache grew too big.
+        """
+        size = _get_size(self._entries[path])
+        self.size += size - self._sizes.get(path, 0)
+        self._sizes[path] = size
+        if not self.max_bytes or self.size <= self.max_bytes:
+            return
+        for old_path, data in tuple(self._entries.items()):
+            if self.size <= self.max_bytes:
+                break
+            if old_path != path and not data.get('loading'):
+                del self[old_path]
+
+    def clear(self, disk=False):
+        """Forget all previews, including the stored ones if disk is True"""
+        self._entries.clear()
+        self._sizes.clear()
+        self.size = 0
+        if disk:
+            from shutil import rmtree
+            rmtree(self.path, ignore_errors=True)
+
+    def get_stats(self):
+        return {
+            'entries': len(self._entries),
+            'bytes': self.size,
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+        }
+
+    # -- The previews stored on the disk
+
+    @property
+    def path(self):
+        return os.path.join(ranger.args.cachedir, PREVIEW_CACHE_DIR_NAME)
+
+    def _get_cachefile(self, file_key, size_key):
+        return os.path.join(self.path, '%s-%d-%d' % (file_key, size_key[0], size_key[1]))
+
+    @staticmethod
+    def get_file_key(fstat, script_stat, preview_images):
+        """Returns the name under which the previews of a file are stored
+
+        fstat is the stat() of the file and script_stat the one of the
+        preview script.  Whether preview_images is on changes the output of
+        the script, so it's part of the key as well.
+        """
+        key = '%d-%d-%r-%d-%r-%d' % (fstat.st_dev, fstat.st_ino, fstat.st_mtime,
+                                     fstat.st_size, script_stat.st_mtime,
+                                     bool(preview_images))
+        return sha1(key.encode('ascii')).hexdigest()
+
+    def load(self, file_key, width, height):
+        """Returns (size key, preview) of a stored preview, or None
+
+        The size key is the key of the preview in the data of the file,
+        which is (width, height) with -1 meaning any width or height.  The
+        preview is None if the script found no preview for the file.
+        """
+        if not self.persistent:
+            return None
+        import json
+
+        for size_key in ((-1, -1), (width, -1), (-1, height), (width, height)):
+            try:
+                with open(self._get_cachefile(file_key, size_key), "r",
+                          encoding="utf-8") as fobj:
+                    content = json.load(fobj)
+            except (IOError, OSError, ValueError):
+                continue
+            try:
+                return size_key, content["preview"]
+            except (KeyError, TypeError):
+                continue
+        return None
+
+    def store(self, file_key, size_key, preview):
+        """Stores a preview, see load()
+
+        Only complete previews may be stored.  One that was cut off at
+        preview_max_size would be taken for the whole preview later.
+        """
+        if not self.persistent:
+            return
+        dump_json(self._get_cachefile(file_key, size_key), {"preview": preview})
+
+        self._stores_until_prune -= 1
+        if self._stores_until_prune <= 0:
+            self._stores_until_prune = PRUNE_INTERVAL
+            self.prune()
+
+    def prune(self):
+        """Removes the previews that were stored longest ago beyond the limits"""
+        remove_oldest_files(self.path, max_count=MAX_STORED_PREVIEWS,
+                            max_bytes=MAX_STORED_BYTES)
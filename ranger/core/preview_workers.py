@@ -0,0 +1,186 @@
+# This file is part of ranger, the console file manager.
+# License: GNU GPL version 3, see the file "AUTHORS" for details.
+
+"""
+Long-lived processes that run the preview script.
+
+Starting the preview script for every preview costs a fork, an exec and the
+startup of a shell, which adds up when scrolling through many files.  If the
+preview script is a bash script, ranger keeps up to preview_workers bash
+processes around instead.  A worker reads requests from its stdin and
+sources the preview script in a subshell for each of them, which only costs a
+fork.  The script runs with the usual arguments and its exit code means the
+same as usual.
+
+A request is the five arguments of the preview script, each terminated by a
+null byte.  The worker answers with the output of the script, followed by a
+newline, a boundary string that ranger picked when starting the worker, the
+exit code and another newline.
+
+Other preview scripts are run in a new process for every preview, like when
+all workers are busy or the setting preview_workers is 0.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+
+import binascii
+import os
+import signal
+from io import open
+from subprocess import Popen, PIPE
+
+from ranger import PY3
+from ranger.core.shared import FileManagerAware
+
+WORKER_SCRIPT = r"""
+script=$1
+while IFS= read -r -d '' path && IFS= read -r -d '' width \
+        && IFS= read -r -d '' height && IFS= read -r -d '' cache \
+        && IFS= read -r -d '' images; do
+    ( . "$script" "$path" "$width" "$height" "$cache" "$images" ) </dev/null
+    printf '\n%s %d\n' "$2" "$?"
+done
+"""
+
+
+def is_bash_script(path):
+    """Whether the shebang line of the file asks for bash"""
+    try:
+        with open(path, 'rb') as fobj:
+            line = fobj.readline(256)
+    except (IOError, OSError):
+        return False
+    return line.startswith(b'#!') and b'bash' in line
+
+
+class PreviewWorker(object):
+    """A bash process that runs the preview script for one request at a time
+
+    Raises OSError if the process can't be started.
+    """
+
+    def __init__(self, script):
+        self.script = script
+        boundary = binascii.hexlify(os.urandom(16))
+        # What the output of a request ends with, followed by the exit code
+        self.marker = b'\n' + boundary + b' '
+        # A session of its own, so that the programs the script runs can be
+        # stopped and killed along with it
+        if PY3:
+            kwargs = {'start_new_session': True}
+        else:
+            kwargs = {'preexec_fn': os.setsid}
+        with open(os.devnull, 'wb') as devnull:
+            # pylint: disable=consider-using-with
+            self.process = Popen(
+                ['bash', '-c', WORKER_SCRIPT, 'ranger-preview-worker',
+                 script, boundary.decode('ascii')],
+                stdin=PIPE, stdout=PIPE, stderr=devnull, **kwargs
+            )
+
+    def fileno(self):
+        return self.process.stdout.fileno()
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def request(self, args):
+        """Run the preview script with the arguments
+
+        Returns False if the worker doesn't take requests anymore.
+        """
+        data = []
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = arg.encode('utf-8', 'surrogateescape')
+            data.append(arg + b'\0')
+        try:
+            self.process.stdin.write(b''.join(data))
+            self.process.stdin.flush()
+        except (IOError, OSError):
+            return False
+        return True
+
+    def send_signal(self, signum):
+        try:
+            os.killpg(self.process.pid, signum)
+        except OSError:
+            pass
+
+    def kill(self):
+        self.send_signal(signal.SIGKILL)
+        for pipe in (self.process.stdin, self.process.stdout):
+            try:
+                pipe.close()
+            except (IOError, OSError):
+                pass
+        self.process.wait()
+
+
+class PreviewWorkerPool(FileManagerAware):
+    """The workers that are running, referenced as fm.preview_workers
+
+    A worker is either idle or lent to one preview between acquire() and
+    release().  At most preview_workers of them run at once.
+    """
+
+    def __init__(self):
+        self.idle = []
+        self.busy = []
+        # Maps paths of preview scripts to (mtime, whether it's bash)
+        self._bash_scripts = {}
+
+    def _is_usable(self, script):
+        try:
+            mtime = os.stat(script).st_mtime
+        except OSError:
+            return False
+        cached = self._bash_scripts.get(script)
+        if cached is None or cached[0] != mtime:
+            cached = self._bash_scripts[script] = (mtime, is_bash_script(script))
+        return cached[1]
+
+    def acquire(self, script):
+        """Returns an idle worker for the script, or None if there's none
+
+        A new worker is started if there are less than preview_workers.
+        """
+        limit = self.fm.settings.preview_workers
+        if limit <= 0 or not self._is_usable(script):
+            return None
+        for worker in tuple(self.idle):
+            self.idle.remove(worker)
+            if worker.script == script and worker.alive():
+                self.busy.append(worker)
+                return worker
+            worker.kill()
+        if len(self.busy) >= limit:
+            return None
+        try:
+            worker = PreviewWorker(script)
+        except OSError:
+            return None
+        self.busy.append(worker)
+        return worker
+
+    def release(self, worker):
+        """Give back a worker that finished its request"""
+        if worker in self.busy:
+            self.busy.remove(worker)
+        if worker.alive() and len(self.idle) + len(self.busy) \
+                < self.fm.settings.preview_workers:
+            self.idle.append(worker)
+        else:
+            worker.kill()
+
+    def discard(self, worker):
+        """Kill a worker, e.g. because its request was cancelled"""
+        if worker in self.busy:
+            self.busy.remove(worker)
+        worker.kill()
+
+    def shutdown(self):
+        for worker in self.idle + self.busy:
+            worker.kill()
+        del self.idle[:]
+        del self.busy[:]
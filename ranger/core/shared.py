@@ -8,6 +8,8 @@ from __future__ import (absolute_import, division, print_function)
 
 class FileManagerAware(object):  # pylint: disable=too-few-public-methods
     """Subclass this to gain access to the global "FM" object."""
+    __slots__ = ()
+
     @staticmethod
     def fm_set(fm):
         FileManagerAware.fm = fm
@@ -15,6 +17,8 @@ class FileManagerAware(object):  # pylint: disable=too-few-public-methods
 
 class SettingsAware(object):  # pylint: disable=too-few-public-methods
     """Subclass this to gain access to the global "SettingObject" object."""
+    __slots__ = ()
+
     @staticmethod
     def settings_set(settings):
         SettingsAware.settings = settings
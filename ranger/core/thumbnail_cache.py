@@ -0,0 +1,208 @@
+# This file is part of ranger, the console file manager.
+# License: GNU GPL version 3, see the file "AUTHORS" for details.
+
+"""
+Management of the images that the preview script generates.
+
+With preview_images, the preview script turns files into images in ranger's
+cache directory, named by Actions.sha512_encode().  The ThumbnailCache keeps
+an index of them in the cache directory, with the size and mtime of each
+image, the time it was last shown and the file it belongs to.  Looking up an
+image only consults the index.  Once the images take more space than
+preview_images_cache_size, the ones that weren't shown for the longest time
+are removed.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+
+import os
+import re
+from io import open
+from time import time
+
+import ranger
+from ranger.ext.atomic_json import dump_json
+
+
+THUMBNAIL_INDEX_NAME = "thumbnails.json"
+THUMBNAIL_NAME = re.compile(r'^[0-9a-f]{128}\.jpg$')
+
+# Once the images take too much space, they're pruned down to this share of
+# the limit, so that this doesn't happen again for every new image
+PRUNE_TARGET = 0.9
+
+# The fields of the entries in the index
+SIZE, MTIME, ATIME, SOURCE = range(4)
+
+
+class ThumbnailCache(object):
+    """The index of the images in the cache directory
+
+    The index is read when it's first needed.  Images that were added or
+    removed behind its back, e.g. by another ranger, are noticed then.  It's
+    written back by save().
+    """
+
+    def __init__(self, max_bytes=0):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        # Maps the names of images to [size, mtime, atime, source path]
+        self._entries = None
+        self._removed = set()
+        self._dirty = False
+
+    @property
+    def path(self):
+        return ranger.args.cachedir
+
+    @property
+    def index_path(self):
+        return os.path.join(self.path, THUMBNAIL_INDEX_NAME)
+
+    def _read_index(self):
+        import json
+
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as fobj:
+                entries = json.load(fobj)
+        except (IOError, OSError, ValueError):
+            return {}
+        if not isinstance(entries, dict):
+            return {}
+        return dict((name, entry) for name, entry in entries.items()
+                    if isinstance(entry, list) and len(entry) == 4)
+
+    def _load(self):
+        if self._entries is not None:
+            return
+        self._entries = entries = self._read_index()
+        try:
+            present = set(name for name in os.listdir(self.path)
+                          if THUMBNAIL_NAME.match(name))
+        except OSError:
+            present = set()
+        for name in set(entries) - present:
+            del entries[name]
+            self._dirty = True
+        for name in present - set(entries):
+            try:
+                stat = os.stat(os.path.join(self.path, name))
+            except OSError:
+                continue
+            entries[name] = [stat.st_size, stat.st_mtime, stat.st_atime, None]
+            self._dirty = True
+        self.size = sum(entry[SIZE] for entry in entries.values())
+
+    def __len__(self):
+        self._load()
+        return len(self._entries)
+
+    def get(self, name, mtime):
+        """Returns the path of the image if it's at least as new as mtime"""
+        self._load()
+        entry = self._entries.get(name)
+        if entry is None or entry[MTIME] < mtime:
+            self.misses += 1
+            return None
+        path = os.path.join(self.path, name)
+        if not os.path.exists(path):
+            # Removed behind the back of the index, e.g. by another ranger
+            self._remove(name)
+            self.misses += 1
+            return None
+        self.hits += 1
+        entry[ATIME] = time()
+        self._dirty = True
+        return path
+
+    def add(self, name, source=None):
+        """Take note of an image that the preview script made for source"""
+        self._load()
+        try:
+            stat = os.stat(os.path.join(self.path, name))
+        except OSError:
+            return
+        old = self._entries.get(name)
+        if old is not None:
+            self.size -= old[SIZE]
+        self._entries[name] = [stat.st_size, stat.st_mtime, time(), source]
+        self.size += stat.st_size
+        self._removed.discard(name)
+        self._dirty = True
+        if self.max_bytes and self.size > self.max_bytes:
+            self.prune(int(self.max_bytes * PRUNE_TARGET))
+
+    def _remove(self, name):
+        try:
+            os.remove(os.path.join(self.path, name))
+        except OSError:
+            pass
+        self.size -= self._entries.pop(name)[SIZE]
+        self._removed.add(name)
+        self._dirty = True
+
+    def prune(self, max_bytes=None, check_sources=False):
+        """Remove the least recently shown images beyond max_bytes
+
+        max_bytes defaults to self.max_bytes, and 0 means no limit.  With
+        check_sources, the images of files that were removed or changed
+        since are removed as well.  Returns the number of removed images and
+        the bytes they took.
+        """
+        self._load()
+        count, size = len(self._entries), self.size
+        if check_sources:
+            for name, entry in tuple(self._entries.items()):
+                if entry[SOURCE] is None:
+                    continue
+                try:
+                    outdated = os.stat(entry[SOURCE]).st_mtime > entry[MTIME]
+                except OSError:
+                    outdated = True
+                if outdated:
+                    self._remove(name)
+        if max_bytes is None:
+            max_bytes = self.max_bytes
+        if max_bytes and self.size > max_bytes:
+            for name, _ in sorted(self._entries.items(), key=lambda item: item[1][ATIME]):
+                if self.size <= max_bytes:
+                    break
+                self._remove(name)
+        self.save()
+        return count - len(self._entries), size - self.size
+
+    def clear(self):
+        """Remove all images, returns their number and the bytes they took"""
+        self._load()
+        count, size = len(self._entries), self.size
+        for name in tuple(self._entries):
+            self._remove(name)
+        self.save()
+        return count, size
+
+    def save(self):
+        """Write the index, if anything changed"""
+        if not self._dirty:
+            return
+        # Keep the images that other rangers added in the meantime
+        for name, entry in self._read_index().items():
+            if name not in self._entries and name not in self._removed \
+                    and os.path.exists(os.path.join(self.path, name)):
+                self._entries[name] = entry
+                self.size += entry[SIZE]
+        if not dump_json(self.index_path, self._entries):
+            return
+        self._removed.clear()
+        self._dirty = False
+
+    def get_stats(self):
+        self._load()
+        return {
+            'images': len(self._entries),
+            'bytes': self.size,
+            'limit': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
@@ -0,0 +1,150 @@
+# This file is part of ranger, the console file manager.
+# License: GNU GPL version 3, see the file "AUTHORS" for details.
+
+"""
+Watches loaded directories for changes, using inotify on Linux.
+
+Without a watcher, every redraw checks the mtime of the visible directories
+(and of whole subtrees in flat mode) to find out if they need a reload.  A
+watched directory gets its content_outdated flag set by the watcher instead.
+Changes to a single entry only reload that entry.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+
+from time import time
+
+from ranger.core.shared import FileManagerAware
+from ranger.ext import inotify
+
+ENTRY_CHANGED = inotify.IN_ATTRIB | inotify.IN_MODIFY | inotify.IN_CLOSE_WRITE
+ENTRY_ADDED_OR_REMOVED = inotify.IN_CREATE | inotify.IN_DELETE \
+    | inotify.IN_MOVED_FROM | inotify.IN_MOVED_TO
+SELF_CHANGED = inotify.IN_ATTRIB | inotify.IN_DELETE_SELF | inotify.IN_MOVE_SELF
+WATCH_MASK = ENTRY_CHANGED | ENTRY_ADDED_OR_REMOVED | SELF_CHANGED | inotify.IN_ONLYDIR
+
+
+class Watcher(FileManagerAware):
+    """Notices changes in the directories that were loaded
+
+    Directory.load_bit_by_bit() calls watch() for every directory path it
+    reads, before reading it.  If all of them could be watched, the
+    directory stops polling its mtime, see Directory.watched.
+    """
+
+    def __init__(self):
+        self._inotify = None
+        self._failed = False
+        # Maps watch descriptors to {Directory: watched path}
+        self._watches = {}
+        # Maps watched paths to watch descriptors
+        self._wds = {}
+
+    def _forget_paths(self, wd):
+        for path in [path for path, path_wd in self._wds.items() if path_wd == wd]:
+            del self._wds[path]
+
+    def _get_inotify(self):
+        if self._inotify is None and not self._failed:
+            try:
+                self._inotify = inotify.Inotify()
+            except OSError:
+                self._failed = True
+        return self._inotify
+
+    def watch(self, directory, path):
+        """Report changes in path to the directory, returns whether that works"""
+        if not self.fm.settings.watch_directories:
+            return False
+        notifier = self._get_inotify()
+        if notifier is None:
+            return False
+        try:
+            wd = notifier.add_watch(path, WATCH_MASK)
+        except OSError:
+            # e.g. the limit in /proc/sys/fs/inotify/max_user_watches
+            return False
+        self._watches.setdefault(wd, {})[directory] = path
+        self._wds[path] = wd
+        return True
+
+    def unwatch(self, directory):
+        """Stop reporting changes to the directory"""
+        directory.watched = False
+        for wd, directories in tuple(self._watches.items()):
+            if directory not in directories:
+                continue
+            path = directories.pop(directory)
+            if directories:
+                if path not in directories.values():
+                    self._wds.pop(path, None)
+                continue
+            del self._watches[wd]
+            self._forget_paths(wd)
+            try:
+                self._inotify.rm_watch(wd)
+            except OSError:
+                pass
+
+    def is_watched(self, path):
+        """Whether changes in the directory at path are noticed"""
+        return path in self._wds
+
+    def reset(self):
+        """Drop all watches, the directories go back to polling"""
+        for directories in self._watches.values():
+            for directory in directories:
+                directory.watched = False
+        self._watches.clear()
+        self._wds.clear()
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+        self._failed = False
+
+    def poll(self):
+        """Process the pending events without blocking"""
+        if self._inotify is None:
+            return
+        events = self._inotify.read_events()
+        if not events:
+            return
+
+        outdated = set()
+        changed = {}
+        for wd, mask, _, name in events:
+            if mask & inotify.IN_Q_OVERFLOW:
+                # Events were lost, so anything could have changed
+                for directories in self._watches.values():
+                    outdated.update(directories)
+                continue
+            directories = self._watches.get(wd)
+            if not directories:
+                continue
+            if mask & inotify.IN_IGNORED:
+                # The watch is gone, e.g. because the directory was removed
+                del self._watches[wd]
+                self._forget_paths(wd)
+                for directory in directories:
+                    directory.watched = False
+                    outdated.add(directory)
+            elif name is None or mask & ENTRY_ADDED_OR_REMOVED:
+                outdated.update(directories)
+            else:
+                for directory, path in directories.items():
+                    changed.setdefault(directory, set()).add(
+                        path + (path == '/' and name or '/' + name))
+
+        for directory in outdated:
+            directory.content_outdated = True
+        for directory, paths in changed.items():
+            if directory in outdated or directory.files_all is None:
+                continue
+            for fobj in directory.files_all:
+                if fobj.path in paths and fobj.loaded:
+                    fobj.load()
+            directory.disk_usage = None
+            directory.last_update_time = time()
+
+    def destroy(self):
+        self.reset()
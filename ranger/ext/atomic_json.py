@@ -0,0 +1,40 @@
+# This file is part of ranger, the console file manager.
+# License: GNU GPL version 3, see the file "AUTHORS" for details.
+
+"""Write json files that other processes never see half-written"""
+
+from __future__ import (absolute_import, division, print_function)
+
+import os
+from io import open
+from tempfile import mkstemp
+
+
+def dump_json(path, content):
+    """Writes content as json to the file at path, returns whether that worked
+
+    The content is written to a temporary file in the same directory, which
+    then replaces the file at path.  So neither other ranger instances nor a
+    crash in between ever leave a half-written file behind.  The directory is
+    created if it doesn't exist.
+    """
+    import json
+
+    directory = os.path.dirname(path)
+    try:
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        fd, tmpname = mkstemp(dir=directory)
+    except (IOError, OSError):
+        return False
+    try:
+        with open(fd, "w", encoding="utf-8") as fobj:
+            json.dump(content, fobj)
+        os.rename(tmpname, path)
+    except (IOError, OSError, TypeError, ValueError):
+        try:
+            os.remove(tmpname)
+        except OSError:
+            pass
+        return False
+    return True
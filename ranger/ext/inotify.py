@@ -0,0 +1,134 @@
+# This file is part of ranger, the console file manager.
+# License: GNU GPL version 3, see the file "AUTHORS" for details.
+
+"""Access to the inotify API of Linux through ctypes"""
+
+from __future__ import (absolute_import, division, print_function)
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import struct
+import sys
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+# struct inotify_event without the trailing name
+_EVENT_HEADER = struct.Struct('iIII')
+
+_LIBC = []
+
+
+def _get_libc():
+    if not _LIBC:
+        libc = None
+        if sys.platform.startswith('linux'):
+            try:
+                libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+                                   use_errno=True)
+                libc.inotify_init1  # pylint: disable=pointless-statement
+            except (OSError, AttributeError):
+                libc = None
+        _LIBC.append(libc)
+    return _LIBC[0]
+
+
+def _raise_errno():
+    err = ctypes.get_errno()
+    raise OSError(err, os.strerror(err))
+
+
+def _fsencode(path):
+    if isinstance(path, bytes):
+        return path
+    try:
+        return os.fsencode(path)
+    except AttributeError:
+        return path.encode(sys.getfilesystemencoding())
+
+
+def _fsdecode(name):
+    try:
+        return os.fsdecode(name)
+    except AttributeError:
+        return name
+
+
+def is_available():
+    """Whether inotify can be used on this system"""
+    return _get_libc() is not None
+
+
+class Inotify(object):
+    """A non-blocking inotify instance
+
+    Raises OSError if inotify isn't available.
+    """
+
+    def __init__(self):
+        self._libc = _get_libc()
+        if self._libc is None:
+            raise OSError(errno.ENOSYS, "inotify is not available")
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            _raise_errno()
+
+    def fileno(self):
+        return self.fd
+
+    def add_watch(self, path, mask):
+        """Watch the path for the events in mask and return the watch descriptor
+
+        Adding the same inode twice returns the same watch descriptor.
+        """
+        wd = self._libc.inotify_add_watch(self.fd, _fsencode(path), mask)
+        if wd < 0:
+            _raise_errno()
+        return wd
+
+    def rm_watch(self, wd):
+        if self._libc.inotify_rm_watch(self.fd, wd) < 0:
+            _raise_errno()
+
+    def read_events(self):
+        """Return a list of (wd, mask, cookie, name) tuples for the queued events
+
+        name is None for events about the watched directory itself.
+        """
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except OSError as ex:
+                if ex.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    return events
+                raise
+            if not data:
+                return events
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                events.append((wd, mask, cookie, _fsdecode(name) if name else None))
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
@@ -4,6 +4,8 @@
 
 from __future__ import (absolute_import, division, print_function)
 
+from types import MethodType
+
 
 class lazy_property(object):  # pylint: disable=invalid-name,too-few-public-methods
     """A @property-like decorator with lazy evaluation
@@ -44,19 +46,39 @@ class lazy_property(object):  # pylint: disable=invalid-name,too-few-public-meth
         if obj is None:  # to fix issues with pydoc
             return None
 
+        # The reset function is bound to the object on access, rather than
+        # stored in each object, since there may be many of them
         reset_function_name = self.__name__ + "__reset"
-
-        if not hasattr(obj, reset_function_name):
-            def reset_function():
-                setattr(obj, self.__name__, self)
-                del obj.__dict__[self.__name__]  # force "__get__" being called
-            obj.__dict__[reset_function_name] = reset_function
+        cls = type(obj)
+        if not hasattr(cls, reset_function_name):
+            setattr(cls, reset_function_name, _LazyPropertyReset(self.__name__))
 
         result = self._method(obj)
-        obj.__dict__[self.__name__] = result
+        setattr(obj, self.__name__, result)
         return result
 
 
+class _LazyPropertyReset(object):  # pylint: disable=too-few-public-methods
+    """Gives objects a method that makes a lazy_property evaluate again"""
+
+    def __init__(self, name):
+        def reset_function(obj):
+            # Removing the cached value uncovers the lazy_property again.
+            # It may be in a slot rather than in obj.__dict__.
+            try:
+                delattr(obj, name)
+            except AttributeError:
+                pass
+        self.function = reset_function
+
+    def __get__(self, obj, cls=None):
+        if obj is None:
+            return self
+        # A bound method, so that weak signal bindings keep working even
+        # though each access creates a new one
+        return MethodType(self.function, obj)
+
+
 if __name__ == '__main__':
     import doctest
     import sys
@@ -0,0 +1,38 @@
+# This file is part of ranger, the console file manager.
+# License: GNU GPL version 3, see the file "AUTHORS" for details.
+
+"""Find out whether the computer runs on battery, using Linux's sysfs"""
+
+from __future__ import (absolute_import, division, print_function)
+
+import os
+from io import open
+
+POWER_SUPPLY_PATH = '/sys/class/power_supply'
+
+
+def _read(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as fobj:
+            return fobj.read().strip()
+    except (IOError, OSError):
+        return None
+
+
+def on_battery(path=POWER_SUPPLY_PATH):
+    """Whether there is a battery and no online mains supply
+
+    Returns False where this can't be determined.
+    """
+    try:
+        names = os.listdir(path)
+    except OSError:
+        return False
+    battery = False
+    for name in names:
+        supply_type = _read(os.path.join(path, name, 'type'))
+        if supply_type == 'Battery':
+            battery = True
+        elif supply_type == 'Mains' and _read(os.path.join(path, name, 'online')) == '1':
+            return False
+    return battery
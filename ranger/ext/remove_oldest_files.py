@@ -0,0 +1,45 @@
+# This file is part of ranger, the console file manager.
+# License: GNU GPL version 3, see the file "AUTHORS" for details.
+
+from __future__ import (absolute_import, division, print_function)
+
+import os
+
+
+def remove_oldest_files(path, max_count=None, max_bytes=None):
+    """Removes the least recently modified files in the directory at path
+
+    Files are removed until there are at most max_count of them which take
+    at most max_bytes.  A limit of None means no limit.  Returns the number
+    of removed files.
+    """
+    try:
+        names = os.listdir(path)
+    except OSError:
+        return 0
+    if max_bytes is None and (max_count is None or len(names) <= max_count):
+        return 0
+    files = []
+    for name in names:
+        filepath = os.path.join(path, name)
+        try:
+            fstat = os.stat(filepath)
+        except OSError:
+            continue
+        files.append((fstat.st_mtime, fstat.st_size, filepath))
+    files.sort()
+    count = len(files)
+    size = sum(fsize for _, fsize, _ in files)
+    removed = 0
+    for _, fsize, filepath in files:
+        if (max_count is None or count <= max_count) \
+                and (max_bytes is None or size <= max_bytes):
+            break
+        try:
+            os.remove(filepath)
+        except OSError:
+            continue
+        count -= 1
+        size -= fsize
+        removed += 1
+    return removed
@@ -1,5 +1,5 @@
 # This file was taken from the python 2.7.13 standard library and has been
-# slightly modified to do a "yield" after every 16KB of copying
+# modified to do a "yield" after every chunk of copying
 
 from __future__ import (absolute_import, division, print_function)
 
@@ -9,10 +9,36 @@ import sys
 from shutil import (_samefile, rmtree, _basename, _destinsrc, Error, SpecialFileError)
 from ranger.ext.safe_path import get_safe_path
 
-__all__ = ["copyfileobj", "copyfileobj_range", "copyfile", "copystat", "copy2", "BLOCK_SIZE",
+try:
+    from fcntl import ioctl
+except ImportError:
+    ioctl = None  # pylint: disable=invalid-name
+
+__all__ = ["copyfileobj", "copyfileobj_range", "copyfileobj_sendfile", "clonefileobj",
+           "copyfile", "copystat", "copy2", "BLOCK_SIZE", "MAX_BLOCK_SIZE",
            "copytree", "move", "rmtree", "Error", "SpecialFileError"]
 
-BLOCK_SIZE = 16 * 1024
+# Copying starts with chunks of BLOCK_SIZE bytes.  The chunks double in size
+# up to MAX_BLOCK_SIZE, so that small files are done after a few calls and
+# large files don't need many of them, while there's still a "yield" now and
+# then to show the progress.
+BLOCK_SIZE = 64 * 1024
+MAX_BLOCK_SIZE = 8 * 1024 * 1024
+
+# The ioctl that makes a file share the data of another one (a "reflink") on
+# Linux file systems that support it, like Btrfs or XFS
+FICLONE = 0x40049409
+
+
+def _block_sizes(length=None):
+    """Yields the size of each chunk, see BLOCK_SIZE"""
+    if length is not None:
+        while True:
+            yield length
+    length = BLOCK_SIZE
+    while True:
+        yield length
+        length = min(length * 2, MAX_BLOCK_SIZE)
 
 
 if sys.version_info < (3, 3):
@@ -99,11 +125,11 @@ else:
             pass
 
 
-def copyfileobj(fsrc, fdst, length=BLOCK_SIZE):
+def copyfileobj(fsrc, fdst, length=None):
     """copy data from file-like object fsrc to file-like object fdst"""
     done = 0
-    while 1:
-        buf = fsrc.read(length)
+    for size in _block_sizes(length):
+        buf = fsrc.read(size)
         if not buf:
             break
         fdst.write(buf)
@@ -111,30 +137,68 @@ def copyfileobj(fsrc, fdst, length=BLOCK_SIZE):
         yield done
 
 
+def clonefileobj(fsrc, fdst):
+    """Make fdst share the data of fsrc, returns whether that worked"""
+    if ioctl is None or not sys.platform.startswith('linux'):
+        return False
+    try:
+        ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+    except (IOError, OSError):
+        return False
+    return True
+
+
+# The functions that let the kernel copy the data, in the order they're tried
+_KERNEL_COPY_FUNCTIONS = []
+
 try:
     _copy = os.copy_file_range
 
-    def copyfileobj_range(fsrc, fdst, length=BLOCK_SIZE):
+    def copyfileobj_range(fsrc, fdst, length=None):
         """copy data from fsrc to fdst with copy_file_range to enable CoW"""
         src_fd = fsrc.fileno()
         dst_fd = fdst.fileno()
         done = 0
-        while 1:
+        for size in _block_sizes(length):
             # copy_file_range returns number of bytes read, or -1 if there was
             # an error
-            read = _copy(src_fd, dst_fd, length)
+            read = _copy(src_fd, dst_fd, size)
             if read == 0:
                 break
             elif read == -1:
                 raise OSError
             done += read
             yield done
+    _KERNEL_COPY_FUNCTIONS.append(copyfileobj_range)
 except AttributeError:
     pass
 
+# Only Linux can sendfile() into regular files
+if sys.platform.startswith('linux') and hasattr(os, 'sendfile'):
+    _sendfile = os.sendfile
 
-def copyfile(src, dst):
-    """Copy data from src to dst"""
+    def copyfileobj_sendfile(fsrc, fdst, length=None):
+        """copy data from fsrc to fdst with sendfile, without a userspace buffer"""
+        src_fd = fsrc.fileno()
+        dst_fd = fdst.fileno()
+        done = 0
+        for size in _block_sizes(length):
+            # Without an offset, sendfile reads from the current position
+            # of src_fd and advances it
+            sent = _sendfile(dst_fd, src_fd, None, size)
+            if sent == 0:
+                break
+            done += sent
+            yield done
+    _KERNEL_COPY_FUNCTIONS.append(copyfileobj_sendfile)
+
+
+def copyfile(src, dst, offset=0):
+    """Copy data from src to dst
+
+    With an offset, the first offset bytes of dst are kept and the copy
+    resumes from there.
+    """
     if _samefile(src, dst):
         raise Error("`%s` and `%s` are the same file" % (src, dst))
 
@@ -150,25 +214,37 @@ def copyfile(src, dst):
                 raise SpecialFileError("`%s` is a named pipe" % fn)
 
     with open(src, 'rb') as fsrc:
-        with open(dst, 'wb') as fdst:
-            try:
-                for done in copyfileobj_range(fsrc, fdst):
-                    yield done
+        with open(dst, 'r+b' if offset else 'wb') as fdst:
+            if offset:
+                fsrc.seek(offset, 0)
+                fdst.seek(offset, 0)
+                fdst.truncate()
+            # Try the fastest ways first: a reflink copies nothing at all,
+            # copy_file_range may do the same or copy within the kernel, and
+            # sendfile at least copies within the kernel.
+            elif clonefileobj(fsrc, fdst):
+                yield os.fstat(fdst.fileno()).st_size
                 return
-            except OSError:
-                # Return to start of files first, then use old method
-                fsrc.seek(0, 0)
-                fdst.seek(0, 0)
-            except NameError:
-                pass  # Just fall back if there's no copy_file_range
+            for copy_function in _KERNEL_COPY_FUNCTIONS:
+                try:
+                    for done in copy_function(fsrc, fdst):
+                        yield offset + done
+                    return
+                except OSError:
+                    # Return to the start first, then try the next way
+                    fsrc.seek(offset, 0)
+                    fdst.seek(offset, 0)
+                    fdst.truncate()
             for done in copyfileobj(fsrc, fdst):
-                yield done
+                yield offset + done
 
 
-def copy2(src, dst, overwrite=False, symlinks=False, make_safe_path=get_safe_path):
+def copy2(  # pylint: disable=too-many-positional-arguments
+        src, dst, overwrite=False, symlinks=False, make_safe_path=get_safe_path, offset=0):
     """Copy data and all stat info ("cp -p src dst").
 
-    The destination may be a directory.
+    The destination may be a directory.  A copy of a file can be resumed at
+    an offset, see copyfile().
 
     """
     if os.path.isdir(dst):
@@ -181,7 +257,7 @@ def copy2(src, dst, overwrite=False, symlinks=False, make_safe_path=get_safe_pat
             os.unlink(dst)
         os.symlink(linkto, dst)
     else:
-        for done in copyfile(src, dst):
+        for done in copyfile(src, dst, offset):
             yield done
         copystat(src, dst)
 
@@ -0,0 +1,146 @@
+# This file is part of ranger, the console file manager.
+# License: GNU GPL version 3, see the file "AUTHORS" for details.
+
+"""A minimal pool of worker threads
+
+This covers the small part of concurrent.futures that ranger needs, which
+isn't available in Python 2.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+
+import threading
+from time import sleep, time
+
+# Python 2 compatibility
+try:
+    import queue
+except ImportError:
+    import Queue as queue  # pylint: disable=import-error
+
+
+class Job(object):
+    """A function call that is run by a ThreadPool
+
+    Jobs that aren't attached to a pool are lazy: they run in the calling
+    thread as soon as someone asks whether they are done.
+
+    >>> job = Job(sum, ([1, 2, 3],))
+    >>> job.done()
+    True
+    >>> job.result()
+    6
+    """
+
+    def __init__(self, func, args, pool=None):
+        self.func = func
+        self.args = args
+        self.pool = pool
+        self.cancelled = False
+        self._finished = threading.Event()
+        self._result = None
+        self._exception = None
+
+    def run(self):
+        """Call the function, unless the job was cancelled"""
+        try:
+            if not self.cancelled:
+                self._result = self.func(*self.args)
+        except Exception as ex:  # pylint: disable=broad-except
+            self._exception = ex
+        finally:
+            self._finished.set()
+
+    def cancel(self):
+        """Don't run the job if it hasn't been started yet"""
+        self.cancelled = True
+
+    def done(self):
+        if self.pool is None and not self._finished.is_set():
+            self.run()
+        return self._finished.is_set()
+
+    def wait(self, timeout=None):
+        """Wait until the job is done, returns whether it is"""
+        if self.pool is None:
+            return self.done()
+        return self._finished.wait(timeout)
+
+    def result(self):
+        """Return the result of the function or raise its exception"""
+        self.wait()
+        if self._exception is not None:
+            raise self._exception  # pylint: disable=raising-bad-type
+        return self._result
+
+
+class Delay(Job):
+    """A Job that is done once a number of seconds have passed
+
+    A generator of the Loader can yield it to wait without keeping the
+    Loader busy.
+    """
+
+    def __init__(self, seconds):
+        Job.__init__(self, None, ())
+        self.deadline = time() + seconds
+
+    def done(self):
+        return time() >= self.deadline
+
+    def wait(self, timeout=None):
+        remaining = self.deadline - time()
+        if timeout is not None and timeout < remaining:
+            sleep(max(0, timeout))
+            return False
+        sleep(max(0, remaining))
+        return True
+
+    def result(self):
+        self.wait()
+
+
+class ThreadPool(object):
+    """Runs Jobs on a number of daemon threads"""
+
+    def __init__(self, size=0):
+        self._queue = queue.Queue()
+        self._threads = []
+        self.size = 0
+        self.resize(size)
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            job.run()
+
+    def resize(self, size):
+        """Start or stop threads until there are exactly `size' of them"""
+        self._threads = [thread for thread in self._threads if thread.is_alive()]
+        while self.size < size:
+            thread = threading.Thread(target=self._work)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+            self.size += 1
+        while self.size > size:
+            # Each thread that gets a None quits after its current job
+            self._queue.put(None)
+            self.size -= 1
+
+    def submit(self, func, *args):
+        """Queue func(*args) and return the corresponding Job"""
+        job = Job(func, args, pool=self)
+        self._queue.put(job)
+        return job
+
+    def shutdown(self):
+        self.resize(0)
+
+
+if __name__ == '__main__':
+    import doctest
+    import sys
+    sys.exit(doctest.testmod()[0])
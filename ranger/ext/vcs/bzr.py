@@ -103,13 +103,14 @@ class Bzr(Vcs):
 
         return 'sync'
 
-    def data_status_subpaths(self):
+    def data_status_subpaths(self, ignored=True):
         statuses = {}
 
         # Ignored
-        paths = self._run(['ls', '--null', '--ignored']).split('\0')[:-1]
-        for path in paths:
-            statuses[path] = 'ignored'
+        if ignored:
+            paths = self._run(['ls', '--null', '--ignored']).split('\0')[:-1]
+            for path in paths:
+                statuses[path] = 'ignored'
 
         # Paths with status
         lines = self._run(['status', '--short', '--no-classify']).split('\n')
@@ -118,6 +119,9 @@ class Bzr(Vcs):
 
         return statuses
 
+    def data_status(self, ignored=True):
+        return self.data_branch(), self.data_status_remote(), self.data_status_subpaths(ignored)
+
     def data_status_remote(self):
         if not self._remote_url():
             return 'none'
@@ -143,3 +147,7 @@ class Bzr(Vcs):
             return log[0]
         else:
             raise VcsError('More than one instance of revision {0:s}'.format(rev))
+
+    def data_state_paths(self):
+        return [os.path.join(self.repodir, 'checkout', 'dirstate'),
+                os.path.join(self.repodir, 'branch', 'last-revision')]
@@ -6,11 +6,12 @@
 from __future__ import (absolute_import, division, print_function)
 
 from datetime import datetime
+from io import open
 import os
 import re
 import unicodedata
 
-from .vcs import Vcs, VcsError
+from .vcs import Vcs, VcsError, VcsHelper
 
 
 def string_control_replace(string, replacement):
@@ -33,6 +34,14 @@ class Git(Vcs):
         ('?', '?', 'untracked'),
         ('!', '!', 'ignored'),
     )
+    # The number of fields before the path in the entries of
+    # "git status --porcelain=v2": changed, renamed or copied, and unmerged
+    _v2_path_field = {'1': 8, '2': 9, 'u': 10}
+
+    # The "git cat-file --batch" helper and the length of abbreviated hashes,
+    # see _log_catfile()
+    _catfile = None
+    _abbrev = None
 
     # Generic
 
@@ -75,6 +84,78 @@ class Git(Vcs):
             })
         return log
 
+    @staticmethod
+    def _read_catfile_response(stdout):
+        """Returns (hash, object type, content) or None if there's no object"""
+        header = stdout.readline()
+        if not header.endswith(b'\n'):
+            raise IOError('git cat-file exited')
+        fields = header.split()
+        if len(fields) != 3:
+            # "<rev> missing" or "<rev> ambiguous"
+            return None
+        size = int(fields[2])
+        content = stdout.read(size + 1)
+        if len(content) != size + 1:
+            raise IOError('git cat-file exited')
+        return fields[0].decode('ascii'), fields[1].decode('ascii'), content[:-1]
+
+    def _log_catfile(self, refspec):
+        """Like _log(refspec=refspec), without starting a new git every time
+
+        The commit is read from a "git cat-file --batch" that keeps running.
+        Raises VcsError if that doesn't work.
+        """
+        if '\n' in refspec:
+            raise VcsError('Invalid revision: {0:s}'.format(refspec))
+        if self._catfile is None:
+            self._catfile = VcsHelper(self._get_command(['cat-file', '--batch']), self.path)
+        obj = self._catfile.query('{0:s}^{{commit}}'.format(refspec).encode('utf-8'),
+                                  self._read_catfile_response)
+        if obj is None:
+            return None
+        commit_hash, _, content = obj
+
+        headers, _, message = content.decode('utf-8', 'replace').partition('\n\n')
+        author = date = None
+        try:
+            for line in headers.split('\n'):
+                key, _, value = line.partition(' ')
+                if key == 'author':
+                    author = value.rsplit(' ', 2)[0]
+                elif key == 'committer':
+                    date = datetime.fromtimestamp(int(value.rsplit(' ', 2)[1]))
+        except (IndexError, ValueError):
+            date = None
+        if author is None or date is None:
+            raise VcsError('Malformed commit {0:s}'.format(commit_hash))
+        # Like %s of git log, the first paragraph in one line
+        subject = ' '.join(line.strip() for line in
+                           message.strip().split('\n\n', 1)[0].split('\n'))
+
+        if self._abbrev is None:
+            # git picks the length by the size of the repository
+            self._abbrev = len(self._run(['rev-parse', '--short', commit_hash]))
+        return [{
+            'short': commit_hash[:self._abbrev],
+            'revid': commit_hash,
+            'author': string_control_replace(author, ' '),
+            'date': date,
+            'summary': string_control_replace(subject, ' '),
+        }]
+
+    @staticmethod
+    def _read_link_file(path, prefix, base):
+        """Returns the path that a file like .git or commondir points to"""
+        try:
+            with open(path, 'r', encoding='utf-8') as fobj:
+                line = fobj.readline().strip()
+        except (IOError, OSError):
+            return None
+        if not line.startswith(prefix):
+            return None
+        return os.path.normpath(os.path.join(base, line[len(prefix):]))
+
     def _status_translate(self, code):
         """Translate status code"""
         for code_x, code_y, status in self._status_translations:
@@ -120,16 +201,17 @@ class Git(Vcs):
 
         return 'sync'
 
-    def data_status_subpaths(self):
+    def data_status_subpaths(self, ignored=True):
         statuses = {}
 
         # Ignored directories
-        paths = self._run([
-            'ls-files', '-z', '--others', '--directory', '--ignored', '--exclude-standard'
-        ]).split('\0')[:-1]
-        for path in paths:
-            if path.endswith('/'):
-                statuses[os.path.normpath(path)] = 'ignored'
+        if ignored:
+            paths = self._run([
+                'ls-files', '-z', '--others', '--directory', '--ignored', '--exclude-standard'
+            ]).split('\0')[:-1]
+            for path in paths:
+                if path.endswith('/'):
+                    statuses[os.path.normpath(path)] = 'ignored'
 
         # Empty directories
         paths = self._run(
@@ -139,7 +221,10 @@ class Git(Vcs):
                 statuses[os.path.normpath(path)] = 'none'
 
         # Paths with status
-        lines = self._run(['status', '--porcelain', '-z', '--ignored']).split('\0')[:-1]
+        args = ['status', '--porcelain', '-z']
+        if ignored:
+            args.append('--ignored')
+        lines = self._run(args).split('\0')[:-1]
         skip = False
         for line in lines:
             if skip:
@@ -151,6 +236,61 @@ class Git(Vcs):
 
         return statuses
 
+    def data_status(self, ignored=True):
+        try:
+            return self._status_v2(ignored)
+        except VcsError:
+            # git before 2.16 doesn't know "--ignored=matching"
+            return self.data_branch(), self.data_status_remote(), \
+                self.data_status_subpaths(ignored)
+
+    def _status_v2(self, ignored):
+        """Get the branch, the remote status and the statuses from one git status"""
+        args = ['status', '--porcelain=v2', '--branch', '-z']
+        if ignored:
+            args.append('--ignored=matching')
+        branch = None
+        upstream = None
+        ahead_behind = None
+        statuses = {}
+        records = self._run_records(args)
+        for record in records:
+            kind = record[:1]
+            if kind == '#':
+                key, _, value = record[2:].partition(' ')
+                if key == 'branch.head':
+                    branch = 'detached' if value == '(detached)' else value
+                elif key == 'branch.upstream':
+                    upstream = value
+                elif key == 'branch.ab':
+                    ahead_behind = value.split()
+            elif kind in self._v2_path_field:
+                fields = record.split(' ', self._v2_path_field[kind])
+                statuses[os.path.normpath(fields[-1])] = \
+                    self._status_translate(fields[1].replace('.', ' '))
+                if kind == '2':
+                    # Skip the path that a renamed or copied file came from
+                    next(records, None)
+            elif kind == '?':
+                statuses[os.path.normpath(record[2:])] = 'untracked'
+            elif kind == '!':
+                statuses[os.path.normpath(record[2:])] = 'ignored'
+        return branch, self._status_remote_v2(upstream, ahead_behind), statuses
+
+    @staticmethod
+    def _status_remote_v2(upstream, ahead_behind):
+        """Translate the branch.upstream and branch.ab headers of git status"""
+        if upstream is None:
+            return 'none'
+        if ahead_behind is None:
+            # The upstream branch is gone
+            return 'unknown'
+        ahead = ahead_behind[0] != '+0'
+        behind = ahead_behind[1] != '-0'
+        if ahead:
+            return 'diverged' if behind else 'ahead'
+        return 'behind' if behind else 'sync'
+
     def data_status_remote(self):
         try:
             head = self._head_ref()
@@ -184,7 +324,10 @@ class Git(Vcs):
         if rev is None:
             rev = self.HEAD
 
-        log = self._log(refspec=rev)
+        try:
+            log = self._log_catfile(rev)
+        except VcsError:
+            log = self._log(refspec=rev)
         if not log:
             if rev == self.HEAD:
                 return None
@@ -194,3 +337,19 @@ class Git(Vcs):
             return log[0]
         else:
             raise VcsError('More than one instance of revision {0:s}'.format(rev))
+
+    def data_state_paths(self):
+        gitdir = self.repodir
+        if os.path.isfile(gitdir):
+            # A worktree or a submodule, ".git" points to the repository
+            gitdir = self._read_link_file(gitdir, 'gitdir: ', self.root)
+            if gitdir is None:
+                return [self.repodir]
+        commondir = self._read_link_file(
+            os.path.join(gitdir, 'commondir'), '', gitdir) or gitdir
+        paths = [os.path.join(gitdir, name) for name in ('HEAD', 'index')]
+        paths += [os.path.join(commondir, name) for name in ('packed-refs', 'FETCH_HEAD')]
+        # Refs are changed by renaming files, which changes their directory
+        for dirpath, _, _ in os.walk(os.path.join(commondir, 'refs')):
+            paths.append(dirpath)
+        return paths
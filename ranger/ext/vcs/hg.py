@@ -102,17 +102,23 @@ class Hg(Vcs):
                     return status
         return 'sync'
 
-    def data_status_subpaths(self):
+    def data_status_subpaths(self, ignored=True):
         statuses = {}
 
-        # Paths with status
-        for entry in json.loads(self._run(['status', '--all', '--template', 'json'])):
+        # Paths with status, "--all" adds the ignored and clean ones
+        args = ['status', '--template', 'json']
+        if ignored:
+            args.insert(1, '--all')
+        for entry in json.loads(self._run(args)):
             if entry['status'] == 'C':
                 continue
             statuses[os.path.normpath(entry['path'])] = self._status_translate(entry['status'])
 
         return statuses
 
+    def data_status(self, ignored=True):
+        return self.data_branch(), self.data_status_remote(), self.data_status_subpaths(ignored)
+
     def data_status_remote(self):
         if self._remote_url() is None:
             return 'none'
@@ -135,3 +141,9 @@ class Hg(Vcs):
             return log[0]
         else:
             raise VcsError('More than one instance of revision {0:s}'.format(rev))
+
+    def data_state_paths(self):
+        return [os.path.join(self.repodir, 'dirstate'),
+                os.path.join(self.repodir, 'bookmarks'),
+                os.path.join(self.repodir, 'branch'),
+                os.path.join(self.repodir, 'store', '00changelog.i')]
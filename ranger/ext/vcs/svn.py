@@ -112,7 +112,7 @@ class SVN(Vcs):
                 return status
         return 'sync'
 
-    def data_status_subpaths(self):
+    def data_status_subpaths(self, ignored=True):  # pylint: disable=unused-argument
         statuses = {}
 
         # Paths with status
@@ -126,6 +126,9 @@ class SVN(Vcs):
 
         return statuses
 
+    def data_status(self, ignored=True):
+        return self.data_branch(), self.data_status_remote(), self.data_status_subpaths(ignored)
+
     def data_status_remote(self):
         remote = self._remote_url()
         if remote is None or remote.startswith('file://'):
@@ -149,3 +152,6 @@ class SVN(Vcs):
             return log[0]
         else:
             raise VcsError('More than one instance of revision {0:s}'.format(rev))
+
+    def data_state_paths(self):
+        return [os.path.join(self.repodir, 'wc.db')]
@@ -20,6 +20,13 @@ except ImportError:
     import Queue as queue  # pylint: disable=import-error
 
 
+# Seconds after which a VcsHelper that wasn't used is stopped
+HELPER_TIMEOUT = 60
+
+# The number of directories whose root Vcs._root_cache remembers at most
+ROOT_CACHE_MAX_ENTRIES = 10000
+
+
 class VcsError(Exception):
     """VCS exception"""
 
@@ -68,7 +75,12 @@ class Vcs(object):  # pylint: disable=too-many-instance-attributes
         'unknown',
     )
 
-    def init_state(self, dirobj):
+    # The results of _find_root() for every path that it went through, shared
+    # by all directories.  Maps (path, enabled repotypes) to (path with links
+    # resolved, root, repodir, repotype, links)
+    _root_cache = {}
+
+    def init_state(self, dirobj, refresh=False):
         self.obj = dirobj
         self.path = dirobj.path
         self.repotypes_settings = set(
@@ -76,7 +88,8 @@ class Vcs(object):  # pylint: disable=too-many-instance-attributes
             if getattr(dirobj.settings, values['setting']) in ('enabled', 'local')
         )
 
-        self.root, self.repodir, self.repotype, self.links = self._find_root(self.path)
+        self.root, self.repodir, self.repotype, self.links = \
+            self._find_root(self.path, refresh)
         self.is_root = self.obj.path == self.root
         self.is_root_link = (
             self.obj.is_link and self.obj.realpath == self.root)
@@ -128,11 +141,7 @@ class Vcs(object):  # pylint: disable=too-many-instance-attributes
         rstrip_newline=True
     ):
         """Run a command"""
-        if self.repotype == 'hg':
-            # use "chg", a faster built-in client
-            cmd = ['chg'] + args
-        else:
-            cmd = [self.repotype] + args
+        cmd = self._get_command(args)
         if path is None:
             path = self.path
 
@@ -149,6 +158,52 @@ class Vcs(object):  # pylint: disable=too-many-instance-attributes
         except (subprocess.CalledProcessError, OSError):
             raise VcsError('{0:s}: {1:s}'.format(str(cmd), path))
 
+    def _get_command(self, args):
+        if self.repotype == 'hg':
+            # use "chg", a faster built-in client
+            return ['chg'] + args
+        return [self.repotype] + args
+
+    def _run_records(self, args, path=None):
+        """Run a command and yield the null-terminated records of its output
+
+        The records are decoded as they arrive, so that a huge output is
+        never held in memory as a whole.  VcsError is raised at the end if
+        the command failed.
+        """
+        cmd = self._get_command(args)
+        if path is None:
+            path = self.path
+
+        try:
+            with open(os.devnull, mode='w', encoding="utf-8") as fd_devnull:
+                # pylint: disable=consider-using-with
+                process = subprocess.Popen(cmd, cwd=path, stdout=subprocess.PIPE,
+                                           stderr=fd_devnull)
+        except OSError:
+            raise VcsError('{0:s}: {1:s}'.format(str(cmd), path))
+        completed = False
+        try:
+            pending = b''
+            while True:
+                chunk = process.stdout.read(65536)
+                if not chunk:
+                    break
+                records = (pending + chunk).split(b'\0')
+                pending = records.pop()
+                for record in records:
+                    yield record.decode(spawn.ENCODING)
+            if pending:
+                yield pending.decode(spawn.ENCODING)
+            completed = True
+        finally:
+            process.stdout.close()
+            if not completed:
+                process.kill()
+            returncode = process.wait()
+        if returncode != 0:
+            raise VcsError('{0:s}: {1:s}'.format(str(cmd), path))
+
     def _get_repotype(self, path):
         """Get type for path"""
         for repotype in self.repotypes_settings:
@@ -157,26 +212,79 @@ class Vcs(object):  # pylint: disable=too-many-instance-attributes
                 return (repodir, repotype)
         return (None, None)
 
-    def _find_root(self, path):
-        """Finds root path"""
-        links = set()
+    def _is_cached_root_current(self, cached):
+        """Checks a result of _root_cache against the disk
+
+        The repository of a cached root has to exist still, and the directory
+        mustn't have become the root of a repository since.  Directories
+        above are checked once their own results are looked up.
+        """
+        resolved, root, repodir = cached[:3]
+        if root is not None and not os.path.exists(repodir):
+            return False
+        return root == resolved or self._get_repotype(resolved)[0] is None
+
+    @staticmethod
+    def _get_child_root(parent_result, resolved, links):
+        """Derives the _find_root() result of a directory from its parent's"""
+        parent_resolved, root, repodir, repotype, parent_links = parent_result
+        return (
+            os.path.join(parent_resolved, os.path.basename(resolved)),
+            root, repodir, repotype,
+            None if root is None else parent_links | links,
+        )
+
+    def _find_root(self, path, refresh=False):
+        """Finds root path
+
+        The directories on the way up are looked up in _root_cache first,
+        so that the subdirectories of a known directory only cost a
+        dictionary lookup and a check of the disk, see
+        _is_cached_root_current().  With refresh, the disk is checked for
+        every directory.  The whole cache is dropped if a repository appeared
+        or disappeared, or if it holds more than ROOT_CACHE_MAX_ENTRIES.
+        """
+        repotypes = frozenset(self.repotypes_settings)
+        fresh = {}
+        outdated = False
+        levels = []
+        level = path
         while True:
-            if os.path.islink(path):
-                links.add(path)
-                relpath = os.path.relpath(self.path, path)
-                path = os.path.realpath(path)
-                self.path = os.path.normpath(os.path.join(path, relpath))
-
-            repodir, repotype = self._get_repotype(path)
-            if repodir:
-                return (path, repodir, repotype, links)
-
-            path_old = path
-            path = os.path.dirname(path)
-            if path == path_old:
+            old = self._root_cache.get((level, repotypes))
+            if old is not None and not refresh and self._is_cached_root_current(old):
+                result = old
+                break
+            links = frozenset([level]) if os.path.islink(level) else frozenset()
+            resolved = os.path.realpath(level) if links else level
+
+            repodir, repotype = self._get_repotype(resolved)
+            parent = os.path.dirname(resolved)
+            if repodir or parent == resolved:
+                if repodir:
+                    result = (resolved, resolved, repodir, repotype, links)
+                else:
+                    result = (resolved, None, None, None, None)
+                outdated |= old is not None and old[1:4] != result[1:4]
+                fresh[(level, repotypes)] = result
                 break
+            levels.append((level, resolved, links, old))
+            level = parent
 
-        return (None, None, None, None)
+        # Derive the results of the directories below from the one above
+        for level, resolved, links, old in reversed(levels):
+            result = self._get_child_root(result, resolved, links)
+            outdated |= old is not None and old[1:4] != result[1:4]
+            fresh[(level, repotypes)] = result
+
+        if outdated or len(self._root_cache) + len(fresh) > ROOT_CACHE_MAX_ENTRIES:
+            # The results of other directories may be outdated as well
+            self._root_cache.clear()
+        self._root_cache.update(fresh)
+
+        self.path = result[0]
+        if result[1] is None:
+            return (None, None, None, None)
+        return result[1:4] + (set(result[4]),)
 
     def reinit(self):
         """Reinit"""
@@ -184,7 +292,7 @@ class Vcs(object):  # pylint: disable=too-many-instance-attributes
             if not self.track \
                     or (not self.is_root_pointer and self._get_repotype(self.obj.realpath)[0]) \
                     or not os.path.exists(self.repodir):
-                self.init_state(self.obj)
+                self.init_state(self.obj, refresh=True)
 
     # Action interface
 
@@ -202,10 +310,19 @@ class Vcs(object):  # pylint: disable=too-many-instance-attributes
         """Returns status of self.root cheaply"""
         raise NotImplementedError
 
-    def data_status_subpaths(self):
+    def data_status_subpaths(self, ignored=True):
         """
         Returns a dict indexed by subpaths not in sync with their status as values.
-        Paths are given relative to self.root
+        Paths are given relative to self.root.  Ignored paths are left out
+        unless ignored is True.
+        """
+        raise NotImplementedError
+
+    def data_status(self, ignored=True):
+        """
+        Returns the results of data_branch(), data_status_remote() and
+        data_status_subpaths(ignored) as a tuple, which may be cheaper than
+        asking for them one by one
         """
         raise NotImplementedError
 
@@ -224,6 +341,13 @@ class Vcs(object):  # pylint: disable=too-many-instance-attributes
         """Returns info string about revision rev. None in special cases"""
         raise NotImplementedError
 
+    def data_state_paths(self):
+        """
+        Returns paths in the repository directory whose mtimes change with the
+        state of the repository, e.g. by committing, staging or fetching
+        """
+        raise NotImplementedError
+
 
 class VcsRoot(Vcs):  # pylint: disable=abstract-method
     """Vcs root"""
@@ -232,25 +356,46 @@ class VcsRoot(Vcs):  # pylint: disable=abstract-method
     branch = None
     updatetime = None
     status_subpaths = None
+    # Maps the directories above status_subpaths to the most important of
+    # their statuses, see _get_status_dirs()
+    status_dirs = None
 
     def _status_root(self):
         """Returns root status"""
         if self.status_subpaths is None:
             return 'none'
+        return self.status_dirs.get('', 'sync')
 
-        statuses = set(status for path, status in self.status_subpaths.items())
-        for status in self.DIRSTATUSES:
-            if status in statuses:
-                return status
-        return 'sync'
+    def _get_status_dirs(self, status_subpaths):
+        """Aggregate the statuses of the subpaths for the directories above them
+
+        Each directory, with '' for the root, gets the most important of
+        DIRSTATUSES among the paths below it, so that looking up the status
+        of a directory doesn't need to look at all subpaths.
+        """
+        importance = dict((status, i) for i, status in enumerate(self.DIRSTATUSES))
+        status_dirs = {}
+        for subpath, status in status_subpaths.items():
+            rank = importance.get(status)
+            if rank is None:
+                continue
+            path = subpath
+            while path:
+                path = os.path.dirname(path)
+                old_status = status_dirs.get(path)
+                if old_status is not None and importance[old_status] <= rank:
+                    # The directories above have at least that status too
+                    break
+                status_dirs[path] = status
+        return status_dirs
 
     def init_root(self):
         """Initialize root cheaply"""
         try:
             self.head = self.data_info(self.HEAD)
-            self.branch = self.data_branch()
-            self.obj.vcsremotestatus = self.data_status_remote()
-            self.obj.vcsstatus = self.data_status_root()
+            self.branch, self.obj.vcsremotestatus, status_subpaths = \
+                self.data_status(ignored=False)
+            self.obj.vcsstatus = self._get_status_dirs(status_subpaths).get('', 'sync')
         except VcsError as ex:
             self.obj.fm.notify('VCS Exception: View log for more info', bad=True, exception=ex)
             return False
@@ -261,9 +406,9 @@ class VcsRoot(Vcs):  # pylint: disable=abstract-method
         """Update root state"""
         try:
             self.head = self.data_info(self.HEAD)
-            self.branch = self.data_branch()
-            self.status_subpaths = self.data_status_subpaths()
-            self.obj.vcsremotestatus = self.data_status_remote()
+            self.branch, self.obj.vcsremotestatus, self.status_subpaths = \
+                self.data_status(ignored=self.obj.settings.vcs_status_ignored)
+            self.status_dirs = self._get_status_dirs(self.status_subpaths)
             self.obj.vcsstatus = self._status_root()
         except VcsError as ex:
             self.obj.fm.notify('VCS Exception: View log for more info', bad=True, exception=ex)
@@ -291,7 +436,7 @@ class VcsRoot(Vcs):  # pylint: disable=abstract-method
                     if purge:
                         if fsobj.is_directory:
                             fsobj.vcsstatus = None
-                            fsobj.vcs.init_state(fsobj)
+                            fsobj.vcs.init_state(fsobj, refresh=True)
                         else:
                             fsobj.vcsstatus = None
                         continue
@@ -334,30 +479,47 @@ class VcsRoot(Vcs):  # pylint: disable=abstract-method
                 continue
             if purge:
                 dirobj.vcsstatus = None
-                dirobj.vcs.init_state(dirobj)
+                dirobj.vcs.init_state(dirobj, refresh=True)
             elif dirobj.vcs.path == self.path:
                 dirobj.vcsremotestatus = self.obj.vcsremotestatus
                 dirobj.vcsstatus = self.obj.vcsstatus
         if purge:
-            self.init_state(self.obj)
+            self.init_state(self.obj, refresh=True)
 
     def check_outdated(self):
-        """Check if root is outdated"""
+        """Check if root is outdated
+
+        Changes of the repository itself show in the mtimes of
+        data_state_paths().  Changes of the worktree are only looked for in
+        the directories that are loaded, and directories that the fm.watcher
+        watches are up to date without looking at the disk.
+        """
         if self.updatetime is None:
             return True
 
-        for wroot, wdirs, _ in os.walk(self.path):
-            wrootobj = self.obj.fm.get_directory(wroot)
-            wrootobj.load_if_outdated()
-            if wroot != self.path and wrootobj.vcs.is_root_pointer:
-                wdirs[:] = []
+        for path in self.data_state_paths():
+            try:
+                if self.updatetime < os.stat(path).st_mtime:
+                    return True
+            except OSError:
+                pass
+
+        for dirobj in list(self.obj.fm.directories.values()):
+            # Without triggering the lazy property, which would find the
+            # roots of directories that were never shown with VCS info
+            vcs = vars(dirobj).get('vcs')
+            if vcs is None or vcs.rootvcs is not self or not vcs.track:
                 continue
-
-            if wrootobj.stat and self.updatetime < wrootobj.stat.st_mtime:
+            if dirobj.watched:
+                if dirobj.content_outdated:
+                    return True
+            else:
+                dirobj.load_if_outdated()
+            if dirobj.stat and self.updatetime < dirobj.stat.st_mtime:
                 return True
-            if wrootobj.files_all:
-                for wfile in wrootobj.files_all:
-                    if wfile.stat and self.updatetime < wfile.stat.st_mtime:
+            if dirobj.files_all:
+                for fsobj in dirobj.files_all:
+                    if fsobj.stat and self.updatetime < fsobj.stat.st_mtime:
                         return True
         return False
 
@@ -380,15 +542,86 @@ class VcsRoot(Vcs):  # pylint: disable=abstract-method
             tmppath = os.path.dirname(tmppath)
 
         # check if path contains some file in status
-        if is_directory:
-            statuses = set(status for subpath, status in self.status_subpaths.items()
-                           if subpath.startswith(relpath + '/'))
-            for status in self.DIRSTATUSES:
-                if status in statuses:
-                    return status
+        if is_directory and relpath in self.status_dirs:
+            return self.status_dirs[relpath]
         return 'sync'
 
 
+class VcsHelper(object):
+    """A long-lived VCS process that answers queries from its stdin
+
+    Backends use helpers for queries that would otherwise start a new
+    process every time, like "git cat-file --batch".  A helper is started
+    on its first query and stopped by stop_idle() once it wasn't used for
+    HELPER_TIMEOUT seconds.  Failures raise VcsError, the backend should
+    fall back to _run() then.
+    """
+
+    # The helpers whose processes are running
+    running = set()
+    _running_lock = threading.Lock()
+
+    def __init__(self, cmd, path):
+        self.cmd = cmd
+        self.path = path
+        self.process = None
+        self.last_used = 0
+        self._lock = threading.Lock()
+
+    def _start(self):
+        with open(os.devnull, mode='w', encoding="utf-8") as fd_devnull:
+            # pylint: disable=consider-using-with
+            self.process = subprocess.Popen(self.cmd, cwd=self.path, stdin=subprocess.PIPE,
+                                            stdout=subprocess.PIPE, stderr=fd_devnull)
+        with self._running_lock:
+            self.running.add(self)
+
+    def query(self, request, read_response):
+        """Send the request, a line of bytes, and return read_response(stdout)"""
+        with self._lock:
+            self.last_used = time.time()
+            try:
+                if self.process is None:
+                    self._start()
+                self.process.stdin.write(request + b'\n')
+                self.process.stdin.flush()
+                return read_response(self.process.stdout)
+            except (IOError, OSError, ValueError) as ex:
+                self._stop()
+                raise VcsError('{0:s}: {1:s}: {2!s}'.format(str(self.cmd), self.path, ex))
+
+    def _stop(self):
+        with self._running_lock:
+            self.running.discard(self)
+        process, self.process = self.process, None
+        if process is None:
+            return
+        for pipe in (process.stdin, process.stdout):
+            try:
+                pipe.close()
+            except (IOError, OSError):
+                pass
+        # Without stdin and stdout it exits on its own
+        process.wait()
+
+    def stop(self):
+        with self._lock:
+            self._stop()
+
+    @classmethod
+    def stop_idle(cls, timeout=HELPER_TIMEOUT):
+        """Stop the helpers that weren't used for timeout seconds"""
+        deadline = time.time() - timeout
+        with cls._running_lock:
+            helpers = [helper for helper in cls.running if helper.last_used <= deadline]
+        for helper in helpers:
+            helper.stop()
+
+    @classmethod
+    def stop_all(cls):
+        cls.stop_idle(timeout=-1)
+
+
 class VcsThread(threading.Thread):  # pylint: disable=too-many-instance-attributes
     """VCS thread"""
 
@@ -475,7 +708,9 @@ class VcsThread(threading.Thread):  # pylint: disable=too-many-instance-attribut
         while True:
             self.paused.set()
             self._advance.wait()
-            self._awoken.wait()
+            if not self._awoken.wait(HELPER_TIMEOUT if VcsHelper.running else None):
+                VcsHelper.stop_idle()
+                continue
             if self.__stop.is_set():
                 self.stopped.set()
                 return
@@ -504,6 +739,7 @@ class VcsThread(threading.Thread):  # pylint: disable=too-many-instance-attribut
         self._advance.set()
         self._awoken.set()
         self.stopped.wait(1)
+        VcsHelper.stop_all()
         return self.stopped.is_set()
 
     def pause(self):
@@ -47,6 +47,8 @@ class BrowserColumn(Pager):  # pylint: disable=too-many-instance-attributes
         self.need_redraw = False
         self.image = None
         self.need_clear_image = True
+        # The computed lines of the drawn files, see _draw_directory()
+        self.display_data = {}
         Pager.__init__(self, win)
         Widget.__init__(self, win)  # pylint: disable=non-parent-init-called
         self.level = level
@@ -177,6 +179,7 @@ class BrowserColumn(Pager):  # pylint: disable=too-many-instance-attributes
             self.need_redraw = True
             self.old_dir = target
             self.scroll_extra = 0  # reset scroll start
+            self.display_data.clear()
 
         if target:
             target.use()
@@ -316,6 +319,10 @@ class BrowserColumn(Pager):  # pylint: disable=too-many-instance-attributes
             linum_text_len = nr_of_digits(scroll_end + one_indexed_offset)
         linum_format = "{0:>" + str(linum_text_len) + "}"
 
+        # Only keep the display data of files that are likely drawn again
+        if len(self.display_data) > 8 * self.hei:
+            self.display_data.clear()
+
         for line in range(self.hei):
             i = line + self.scroll_begin
 
@@ -323,6 +330,7 @@ class BrowserColumn(Pager):  # pylint: disable=too-many-instance-attributes
                 drawn = self.target.files[i]
             except IndexError:
                 break
+            drawn.load_once()
 
             tagged = self.fm.tags and drawn.realpath in self.fm.tags
             if tagged:
@@ -340,14 +348,15 @@ class BrowserColumn(Pager):  # pylint: disable=too-many-instance-attributes
                     current_linemode = drawn.linemode_dict[linemode.DEFAULT_LINEMODE]
 
             metakey = hash(repr(sorted(metadata.items()))) if metadata else 0
-            key = (self.wid, selected_i == i, drawn.marked, self.main_column,
+            key = (drawn.path, drawn.last_load_time,
+                   self.wid, selected_i == i, drawn.marked, self.main_column,
                    drawn.path in copied, tagged_marker, drawn.infostring,
                    drawn.vcsstatus, drawn.vcsremotestatus, self.target.has_vcschild,
                    self.fm.do_cut, current_linemode.name, metakey, active_pane,
                    self.settings.line_numbers.lower(), linum_text_len)
 
             # Check if current line has not already computed and cached
-            if key in drawn.display_data:
+            if key in self.display_data:
                 # Recompute line numbers because they can't be reliably cached.
                 if (
                     self.main_column
@@ -356,9 +365,9 @@ class BrowserColumn(Pager):  # pylint: disable=too-many-instance-attributes
                     line_number_text = self._format_line_number(linum_format,
                                                                 i,
                                                                 selected_i)
-                    drawn.display_data[key][0][0] = line_number_text
+                    self.display_data[key][0][0] = line_number_text
 
-                self.execute_curses_batch(line, drawn.display_data[key])
+                self.execute_curses_batch(line, self.display_data[key])
                 self.color_reset()
                 continue
 
@@ -438,7 +447,7 @@ class BrowserColumn(Pager):  # pylint: disable=too-many-instance-attributes
             this_color = base_color + list(drawn.mimetype_tuple) + \
                 self._draw_directory_color(i, drawn, copied)
             display_data = []
-            drawn.display_data[key] = display_data
+            self.display_data[key] = display_data
 
             drawn, this_color = hook_before_drawing(drawn, this_color)
 
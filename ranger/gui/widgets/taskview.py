@@ -12,6 +12,7 @@ from . import Widget
 
 class TaskView(Widget, Accumulator):
     old_lst = None
+    old_states = None
 
     def __init__(self, win):
         Widget.__init__(self, win)
@@ -22,9 +23,11 @@ class TaskView(Widget, Accumulator):
         base_clr = []
         base_clr.append('in_taskview')
         lst = self.get_list()
+        states = self.fm.loader.get_class_states()
 
-        if self.old_lst != lst:
+        if self.old_lst != lst or self.old_states != states:
             self.old_lst = lst
+            self.old_states = states
             self.need_redraw = True
 
         if self.need_redraw:
@@ -35,7 +38,10 @@ class TaskView(Widget, Accumulator):
             if self.hei <= 0:
                 return
 
-            self.addstr(0, 0, "Task View")
+            title = "Task View"
+            if lst:
+                title += " - " + ", ".join(self._format_state(*state) for state in states)
+            self.addstr(0, 0, title, self.wid)
             self.color_at(0, 0, self.wid, tuple(base_clr), 'title')
 
             if lst:
@@ -53,6 +59,8 @@ class TaskView(Widget, Accumulator):
                         clr.append('selected')
 
                     descr = obj.get_description()
+                    if obj not in self.fm.loader.active:
+                        descr = "(waiting) " + descr
                     if obj.progressbar_supported and obj.percent >= 0 and obj.percent <= 100:
                         self.addstr(y, 0, "%3.2f%% - %s" % (obj.percent, descr), self.wid)
                         wid = int((self.wid / 100) * obj.percent)
@@ -69,6 +77,12 @@ class TaskView(Widget, Accumulator):
 
             self.color_reset()
 
+    @staticmethod
+    def _format_state(name, running, waiting, limit):
+        if waiting:
+            return "%s: %d/%d running, %d waiting" % (name, running, limit, waiting)
+        return "%s: %d/%d running" % (name, running, limit)
+
     def finalize(self):
         y = self.y + 1 + self.pointer - self.scroll_begin
         self.fm.ui.win.move(y, self.x)
@@ -0,0 +1,16 @@
+from __future__ import (absolute_import, division, print_function)
+
+import collections
+
+import pytest
+
+import ranger
+
+
+@pytest.fixture(name='cachedir')
+def fixture_cachedir(tmpdir, monkeypatch):
+    """Points ranger.args.cachedir to a new directory, which is returned"""
+    args_tuple = collections.namedtuple('args', 'cachedir')
+    cachedir = tmpdir.mkdir('cache')
+    monkeypatch.setattr(ranger, 'args', args_tuple(cachedir=str(cachedir)), raising=False)
+    return cachedir
@@ -0,0 +1,174 @@
+from __future__ import (absolute_import, division, print_function)
+
+import bisect
+import gc
+
+import pytest
+
+from ranger.container.directory import ReversedSortKey, SortKeySequence, cached_sort_key
+from ranger.container.settings import Settings
+from ranger.core.fm import FM
+from ranger.core.shared import FileManagerAware, SettingsAware
+
+
+class _UIStub(object):  # pylint: disable=too-few-public-methods
+    pass
+
+
+class _TabStub(object):  # pylint: disable=too-few-public-methods
+    thisdir = None
+    thisfile = None
+
+
+@pytest.fixture(name='fm')
+def fixture_fm(cachedir):  # pylint: disable=unused-argument
+    previous = getattr(FileManagerAware, 'fm', None), getattr(SettingsAware, 'settings', None)
+    fm = FM(ui=_UIStub())
+    fm.thistab = _TabStub()
+    FileManagerAware.fm_set(fm)
+    SettingsAware.settings_set(Settings())
+    fm.settings.sort = 'natural'
+    fm.settings.sort_directories_first = True
+    yield fm
+    fm.loader.destroy()
+    FileManagerAware.fm_set(previous[0])
+    SettingsAware.settings_set(previous[1])
+
+
+def _load(fm, path):
+    directory = fm.get_directory(str(path))
+    for _ in directory.load_bit_by_bit():
+        pass
+    return directory
+
+
+def _files_by_name(directory):
+    return dict((fobj.basename, fobj) for fobj in directory.files_all)
+
+
+def test_bisect_sort_keys():
+    words = ['apple', 'fig', 'banana', 'kiwi']
+    words.sort(key=len)
+    keys = SortKeySequence(words, len)
+    words.insert(bisect.bisect_right(keys, keys.get_key('pear')), 'pear')
+    assert [len(word) for word in words] == sorted(len(word) for word in words)
+
+
+def test_bisect_reversed_sort_keys():
+    numbers = [9, 7, 4, 1]
+    keys = SortKeySequence(numbers, abs, reverse=True)
+    for number in (5, 10, 0, 7):
+        numbers.insert(bisect.bisect_right(keys, keys.get_key(number)), number)
+    assert numbers == [10, 9, 7, 7, 5, 4, 1, 0]
+    assert ReversedSortKey(2) < ReversedSortKey(1)
+
+
+def test_cached_sort_key():
+    class Item(object):  # pylint: disable=too-few-public-methods
+        sort_keys = None
+
+    calls = []
+
+    def sort_func(item):
+        calls.append(item)
+        return len(calls)
+    item = Item()
+    assert cached_sort_key(sort_func, 'mode')(item) == 1
+    assert cached_sort_key(sort_func, 'mode')(item) == 1
+    assert cached_sort_key(sort_func, 'other mode')(item) == 2
+    assert len(calls) == 2
+    # The keys of earlier modes are kept
+    assert cached_sort_key(sort_func, 'mode')(item) == 1
+    assert cached_sort_key(sort_func, 'other mode')(item) == 2
+    assert len(calls) == 2
+
+
+def test_stat_is_deferred_until_needed(fm, tmpdir):
+    path = tmpdir.mkdir('dir')
+    path.join('file').write('hello')
+    path.mkdir('subdir')
+    path.join('link').mksymlinkto(path.join('file'))
+    directory = _load(fm, path)
+    files = _files_by_name(directory)
+    assert sorted(files) == ['file', 'link', 'subdir']
+
+    # The types come from the directory entries, without a stat()
+    assert files['subdir'].is_directory
+    assert not files['file'].loaded
+    assert files['file'].stat is None
+    # Symlinks are stat()ed right away, to know what they point to
+    assert files['link'].loaded
+    assert files['link'].is_link
+    assert files['link'].stat.st_size == 5
+
+    assert files['file'].load_once()
+    assert not files['file'].load_once()
+    assert files['file'].stat.st_size == 5
+    assert files['file'].size == 5
+    assert directory.disk_usage == 10
+
+
+def test_stat_based_sort_loads_entries(fm, tmpdir):
+    fm.settings.sort = 'size'
+    path = tmpdir.mkdir('dir')
+    path.join('small').write('a')
+    path.join('big').write('a' * 100)
+    directory = _load(fm, path)
+    assert all(fobj.loaded for fobj in directory.files_all)
+    assert [fobj.basename for fobj in directory.files] == ['big', 'small']
+    assert [fobj.stat.st_size for fobj in directory.files] == [100, 1]
+
+
+def test_reload_updates_changed_entries(fm, tmpdir):
+    path = tmpdir.mkdir('dir')
+    for name in ('kept', 'removed', 'saved', 'replaced'):
+        path.join(name).write('old')
+    directory = _load(fm, path)
+    old_files = _files_by_name(directory)
+    directory.mark_item(old_files['saved'], True)
+
+    path.join('removed').remove()
+    path.join('added').write('new')
+    # Saved like editors do, by renaming a new file over the old one
+    path.join('tmp').write('new content')
+    path.join('tmp').rename(path.join('saved'))
+    path.join('replaced').remove()
+    path.join('replaced').mkdir()
+    _load(fm, path)
+
+    files = _files_by_name(directory)
+    assert sorted(files) == ['added', 'kept', 'replaced', 'saved']
+    assert [fobj.basename for fobj in directory.files] == \
+        ['replaced', 'added', 'kept', 'saved']
+    assert files['kept'] is old_files['kept']
+    assert files['saved'] is not old_files['saved']
+    files['saved'].load_once()
+    assert files['saved'].size == len('new content')
+    assert files['saved'].marked
+    assert directory.marked_items == [files['saved']]
+    assert files['replaced'].is_directory
+
+
+def test_reload_cwd_updates_entries_changed_in_place(fm, tmpdir):
+    fm.settings.sort = 'size'
+    path = tmpdir.mkdir('dir')
+    path.join('file').write('a')
+    directory = _load(fm, path)
+    assert _files_by_name(directory)['file'].size == 1
+
+    path.join('file').write('a' * 100, mode='a')
+    fm.thistab.thisdir = directory
+    fm.reload_cwd()
+    for _ in directory.load_generator:
+        pass
+
+    assert _files_by_name(directory)['file'].size == 101
+
+
+def test_vcs_is_reset_by_vcs_aware(fm, tmpdir):
+    fm.settings.vcs_aware = False
+    directory = fm.get_directory(str(tmpdir))
+    assert directory.vcs is None
+    gc.collect()
+    fm.settings.vcs_aware = True
+    assert directory.vcs is not None
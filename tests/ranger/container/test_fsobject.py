@@ -1,14 +1,19 @@
 from __future__ import (absolute_import, division, print_function)
 
+import mimetypes
 import operator
+import os
 
-from ranger.container.fsobject import FileSystemObject
+from ranger.container.file import File
+from ranger.container.fsobject import FileStat, FileSystemObject
+from ranger.core.linemode import DEFAULT_LINEMODE
 
 
 class MockFM(object):  # pylint: disable=too-few-public-methods
     """Used to fulfill the dependency by FileSystemObject."""
 
     default_linemodes = []
+    mimetypes = mimetypes.MimeTypes()
 
 
 def create_filesystem_object(path):
@@ -53,3 +58,30 @@ def test_basename_natural2():
     ]
     assert fsos == sorted(fsos[::-1], key=operator.attrgetter("basename_natural"))
     assert fsos == sorted(fsos[::-1], key=operator.attrgetter("basename_natural_lower"))
+
+
+def test_file_stat():
+    stat = os.stat(__file__)
+    file_stat = FileStat(stat)
+    for field in ('st_mode', 'st_ino', 'st_size', 'st_atime', 'st_mtime', 'st_ctime',
+                  'st_uid', 'st_gid', 'st_nlink'):
+        assert getattr(file_stat, field) == getattr(stat, field)
+
+
+def test_file_keeps_drawn_attributes_in_slots():
+    fobj = File(__file__)
+    fobj.fm_set(MockFM())
+    # What drawing the file in a column needs
+    assert fobj.realpath == fobj.path
+    assert fobj.linemode == DEFAULT_LINEMODE
+    assert fobj.mimetype_tuple == ('document',)
+    assert fobj.document and not fobj.media
+    assert fobj.extension == 'py'
+    assert fobj.relative_path_lower == 'test_fsobject.py'
+    # Nothing ends up in the instance dictionary, which would take more
+    # memory than all slots together
+    assert not fobj.__dict__
+
+    fobj.relative_path = 'Other.py'
+    fobj.relative_path_lower__reset()  # pylint: disable=no-member
+    assert fobj.relative_path_lower == 'other.py'
@@ -0,0 +1,38 @@
+from __future__ import (absolute_import, division, print_function)
+
+import pytest
+
+from ranger.container.settings import Settings
+from ranger.container.tags import Tags
+from ranger.core.fm import FM
+from ranger.core.shared import FileManagerAware, SettingsAware
+
+
+class _StatusStub(object):  # pylint: disable=too-few-public-methods
+    @staticmethod
+    def request_redraw():
+        pass
+
+
+class _UIStub(object):  # pylint: disable=too-few-public-methods
+    status = _StatusStub()
+
+
+class _TabStub(object):  # pylint: disable=too-few-public-methods
+    thisdir = None
+    thisfile = None
+
+
+@pytest.fixture(name='fm')
+def fixture_fm(cachedir):
+    """An FM without a curses UI, whose loader is driven by the test"""
+    previous = getattr(FileManagerAware, 'fm', None), getattr(SettingsAware, 'settings', None)
+    fm = FM(ui=_UIStub(), tags=Tags(str(cachedir.join('tagged'))))
+    fm.thistab = _TabStub()
+    FileManagerAware.fm_set(fm)
+    SettingsAware.settings_set(Settings())
+    fm.settings.loader_threads = 0
+    yield fm
+    fm.loader.destroy()
+    FileManagerAware.fm_set(previous[0])
+    SettingsAware.settings_set(previous[1])
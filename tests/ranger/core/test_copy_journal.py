@@ -0,0 +1,73 @@
+from __future__ import (absolute_import, division, print_function)
+
+import os
+
+import pytest
+
+from ranger.container.file import File
+from ranger.core.copy_journal import CopyJournal
+from ranger.core.copy_loader import CopyLoader
+
+
+def test_journal_roundtrip(cachedir):
+    journal = CopyJournal()
+    assert journal.load() is None
+    content = {"pid": os.getpid(), "sources": ["/a"], "dest": "/b",
+               "roots": {"/a": "/b/a"}, "partial": {"/a/f": ["/b/a/f", 10]}}
+    journal.save(content)
+    assert journal.load() == content
+    assert [str(path) for path in cachedir.join('copy_jobs').listdir()] == [journal.path]
+    journal.remove()
+    assert journal.load() is None
+
+
+@pytest.mark.usefixtures('cachedir')
+def test_find_interrupted_skips_running_jobs():
+    running = CopyJournal()
+    running.save({"pid": os.getpid(), "sources": [], "dest": "/"})
+    interrupted = CopyJournal(running.path + ".old.json")
+    # A pid that can't belong to a running process
+    interrupted.save({"pid": -1, "sources": [], "dest": "/"})
+    assert [journal.path for journal in CopyJournal.find_interrupted()] \
+        == [interrupted.path]
+
+
+def test_paste_resume_continues_interrupted_copy(fm, tmpdir, monkeypatch):
+    from ranger.ext import shutil_generatorized as shutil_g
+    # Without reflinks, copying the big file takes several steps
+    monkeypatch.setattr(shutil_g, 'clonefileobj', lambda fsrc, fdst: False)
+    big = b'0123456789abcdef' * (192 * 1024)
+    src = tmpdir.mkdir('src')
+    src.join('done').write('done')
+    src.join('partial').write_binary(big)
+    dest = tmpdir.mkdir('dest')
+
+    loadable = CopyLoader([File(str(src.join('done'))), File(str(src.join('partial')))],
+                          dest=str(dest))
+    fm.loader.add(loadable)
+    partial = dest.join('partial')
+    while not partial.check() or partial.size() < 2 * shutil_g.BLOCK_SIZE:
+        next(loadable.load_generator)
+    # Ranger quits in the middle of the copy
+    fm.loader.destroy()
+    content = loadable.journal.load()
+    offset = content['partial'][str(src.join('partial'))][1]
+    assert 0 < offset < len(big)
+    content['pid'] = -1
+    loadable.journal.save(content)
+
+    # Change the copies without changing their size, to tell whether the
+    # resumed job copies them again
+    done_stat = os.stat(str(dest.join('done')))
+    dest.join('done').write('DONE')
+    os.utime(str(dest.join('done')), (done_stat.st_atime, done_stat.st_mtime))
+    with open(str(partial), 'r+b') as fobj:
+        fobj.write(b'x' * 16)
+
+    fm.paste_resume()
+    while fm.loader.has_work():
+        fm.loader.work()
+    assert dest.join('done').read() == 'DONE'
+    assert partial.read_binary() == b'x' * 16 + big[16:]
+    assert not CopyJournal.find_interrupted()
+    assert not loadable.journal.load()
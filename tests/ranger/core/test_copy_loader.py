@@ -0,0 +1,110 @@
+from __future__ import (absolute_import, division, print_function)
+
+import os
+from collections import deque
+
+import pytest
+
+from ranger.container.file import File
+from ranger.core.copy_journal import CopyJournal
+from ranger.core.copy_loader import CopyLoader
+from ranger.ext.thread_pool import Job
+
+
+def test_paused_copies_continue_at_their_offset():
+    jobs = [
+        ('/src/done', '/dst/done', 10, [10], Job(lambda: True, ())),
+        ('/src/paused', '/dst/paused', 10, [4], Job(lambda: False, ())),
+    ]
+    pending = deque([('/src/next', '/dst/next', 5, None)])
+    errors = []
+    assert CopyLoader._finish_copies(  # pylint: disable=protected-access
+        jobs, pending, errors) == 10
+    assert not jobs
+    assert not errors
+    assert list(pending) == [
+        ('/src/paused', '/dst/paused', 10, 4),
+        ('/src/next', '/dst/next', 5, None),
+    ]
+
+
+def _work(fm):
+    while fm.loader.has_work():
+        fm.loader.work()
+
+
+BIG = b'0123456789abcdef' * (192 * 1024)
+
+
+def _make_tree(tmpdir):
+    src = tmpdir.mkdir('src')
+    tree = src.mkdir('tree')
+    tree.join('big').write_binary(BIG)
+    tree.mkdir('sub').join('small').write('small')
+    os.symlink('big', str(tree.join('link')))
+    src.join('single').write('single')
+    return src
+
+
+def _assert_tree_copied(dst):
+    assert sorted(path.basename for path in dst.listdir()) == ['big', 'link', 'sub']
+    assert dst.join('big').read_binary() == BIG
+    assert dst.join('sub', 'small').read() == 'small'
+    assert dst.join('link').islink()
+    assert dst.join('link').readlink() == 'big'
+
+
+@pytest.mark.parametrize('threads', [0, 2])
+def test_paste_copies_trees(fm, tmpdir, threads):
+    fm.settings.loader_threads = threads
+    src = _make_tree(tmpdir)
+    dest = tmpdir.mkdir('dest')
+    dest.mkdir('tree').join('old').write('old')
+    dest.join('single').write('old')
+
+    fm.copy_buffer = set(File(str(path)) for path in (src.join('tree'), src.join('single')))
+    fm.paste(dest=str(dest))
+    loadable = fm.loader.queue[0]
+    _work(fm)
+
+    # The names that were taken get a suffix
+    assert sorted(path.basename for path in dest.listdir()) == \
+        ['single', 'single_', 'tree', 'tree_']
+    assert dest.join('single').read() == 'old'
+    assert dest.join('single_').read() == 'single'
+    assert dest.join('tree').listdir() == [dest.join('tree', 'old')]
+    _assert_tree_copied(dest.join('tree_'))
+    # The walk found every file before the copy ended
+    assert loadable.size == len(BIG) + len('small') + len('single')
+    assert loadable.percent == 100
+    assert src.join('tree', 'big').check()
+    assert not CopyJournal.find_interrupted()
+
+
+@pytest.mark.parametrize('threads', [0, 2])
+def test_move_to_other_device(fm, tmpdir, monkeypatch, threads):
+    fm.settings.loader_threads = threads
+    src = _make_tree(tmpdir)
+    dest = tmpdir.mkdir('dest')
+    original = src.join('tree')
+    inode = os.stat(str(original.join('big'))).st_ino
+
+    stat = os.stat
+
+    def stat_on_other_device(path, *args, **kwargs):
+        result = stat(path, *args, **kwargs)
+        if path == str(dest):
+            return os.stat_result(result[:2] + (result.st_dev + 1,) + result[3:])
+        return result
+    monkeypatch.setattr(os, 'stat', stat_on_other_device)
+
+    fm.copy_buffer = set([File(str(original))])
+    fm.do_cut = True
+    fm.paste(dest=str(dest))
+    _work(fm)
+
+    assert not original.check()
+    assert dest.listdir() == [dest.join('tree')]
+    _assert_tree_copied(dest.join('tree'))
+    # Copied, not renamed
+    assert os.stat(str(dest.join('tree', 'big'))).st_ino != inode
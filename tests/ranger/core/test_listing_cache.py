@@ -0,0 +1,56 @@
+from __future__ import (absolute_import, division, print_function)
+
+import os
+
+import pytest
+
+from ranger.container.directory_entries import stat_entries
+from ranger.core.listing_cache import ListingCache
+
+
+@pytest.fixture(name='cache')
+def fixture_cache(cachedir):  # pylint: disable=unused-argument
+    return ListingCache()
+
+
+def test_listing_roundtrip(tmpdir, cache):
+    tmpdir.join('file').write('content')
+    tmpdir.mkdir('subdir')
+    tmpdir.join('link').mksymlinkto(tmpdir.join('file'))
+    dirpath = str(tmpdir)
+    paths = [os.path.join(dirpath, name) for name in ('file', 'subdir', 'link')]
+    listing = stat_entries(paths, None, False)
+
+    dirstat = os.stat(dirpath)
+    cache.set(dirstat, listing)
+    cached = cache.get(dirpath, dirstat)
+    assert [result[0] for result in cached] == paths
+    assert [result[2] for result in cached] == [False, True, False]
+    for (_, stats, _, _), (_, cached_stats, _, _) in zip(listing, cached):
+        for stat, cached_stat in zip(stats, cached_stats):
+            assert stat.st_mode == cached_stat.st_mode
+            assert stat.st_size == cached_stat.st_size
+            assert stat.st_mtime == cached_stat.st_mtime
+
+
+def test_outdated_listing(tmpdir, cache):
+    dirpath = str(tmpdir)
+    dirstat = os.stat(dirpath)
+    assert cache.get(dirpath, dirstat) is None
+    cache.set(dirstat, [])
+    assert cache.get(dirpath, dirstat) == []
+    os.utime(dirpath, (dirstat.st_atime, dirstat.st_mtime + 10))
+    assert cache.get(dirpath, os.stat(dirpath)) is None
+
+
+def test_oldest_listings_are_pruned(tmpdir, cachedir):
+    cache = ListingCache(max_listings=2)
+    dirstats = [os.stat(str(tmpdir.mkdir(name))) for name in ('a', 'b', 'c')]
+    for dirstat in dirstats:
+        cache.set(dirstat, [])
+    # Make one of them the listing that was stored longest ago
+    oldest = cachedir.join('listings').listdir(sort=True)[0]
+    oldest.setmtime(0)
+    cache.prune()
+    assert len(cachedir.join('listings').listdir()) == 2
+    assert not oldest.exists()
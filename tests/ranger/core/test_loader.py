@@ -0,0 +1,134 @@
+from __future__ import (absolute_import, division, print_function)
+
+import os
+
+from ranger import PY3
+from ranger.core.loader import (
+    PRIORITY_DIRECTORY, Loadable, Loader, OutputBuffer, SizeCache, calculate_size,
+    safe_decode)
+from ranger.ext.thread_pool import Job
+
+
+class MockLoader(object):  # pylint: disable=too-few-public-methods
+    def __init__(self):
+        self.size_cache = SizeCache()
+
+    @staticmethod
+    def submit(func, *args):
+        return Job(func, args)
+
+
+def get_size(loader, path, **kw):
+    size = 0
+    for result in calculate_size(loader, [path], **kw):
+        if not isinstance(result, Job):
+            size = result
+    return size
+
+
+def test_hard_links_count_once(tmpdir):
+    tmpdir.mkdir('sub').join('file').write('x' * 100)
+    os.link(str(tmpdir.join('sub', 'file')), str(tmpdir.join('link')))
+    tmpdir.join('other').write('x' * 10)
+    assert get_size(MockLoader(), str(tmpdir)) == 110
+
+
+def test_size_cache(tmpdir):
+    loader = MockLoader()
+    sub = tmpdir.mkdir('sub')
+    sub.join('file').write('x' * 100)
+    assert get_size(loader, str(tmpdir)) == 100
+    assert loader.size_cache.get(str(sub))[3] == 100
+
+    # An unchanged directory isn't read again
+    entry = loader.size_cache.get(str(sub))
+    assert get_size(loader, str(tmpdir)) == 100
+    assert loader.size_cache.get(str(sub)) is entry
+
+    sub.join('new').write('x' * 10)
+    os.utime(str(sub), (0, entry[0] + 10))
+    assert get_size(loader, str(tmpdir)) == 110
+
+
+class MockFM(object):
+    class settings(object):  # pylint: disable=invalid-name,too-few-public-methods
+        loader_concurrency = [1, 1, 2]
+        loader_threads = 0
+
+    class ui(object):  # pylint: disable=invalid-name,too-few-public-methods
+        class status(object):  # pylint: disable=invalid-name,too-few-public-methods
+            @staticmethod
+            def request_redraw():
+                pass
+
+    @staticmethod
+    def notify(*_, **__):
+        pass
+
+    @staticmethod
+    def signal_emit(*_, **__):
+        pass
+
+
+def test_loader_runs_items_by_priority_class():
+    steps = []
+    finish = []
+
+    def generate(name):
+        steps.append(name)
+        while not finish:
+            yield
+
+    loader = Loader()
+    loader.fm = MockFM()
+    items = {}
+    for name in ('copy1', 'copy2', 'copy3', 'dir1', 'dir2'):
+        items[name] = Loadable(generate(name), name)
+        if name.startswith('dir'):
+            items[name].priority_class = PRIORITY_DIRECTORY
+        loader.add(items[name], append=True)
+
+    loader.work()
+    assert [item.description for item in loader.active] == ['dir1', 'copy1', 'copy2']
+    assert loader.get_class_states() == [
+        ('directories', 1, 1, 1), ('previews', 0, 0, 1), ('background', 2, 1, 2)]
+    assert 'copy3' not in steps and 'dir2' not in steps
+
+    finish.append(True)
+    while loader.has_work():
+        loader.work()
+    assert set(steps) == set(items)
+
+
+def test_output_buffer():
+    line = b'\xc3\xa4\xc3\xb6\xc3\xbc'.decode('utf-8')
+    text = (line + '\n') * 1000
+    data = text.encode('utf-8')
+    output = OutputBuffer()
+    # Chunks that split the characters in the middle
+    for i in range(0, len(data), 7):
+        assert output.append(data[i:i + 7])
+        # Complete lines are available right away
+        assert output.line_count == data[:i + 7].count(b'\n')
+    assert output.lines[-1] == (line if PY3 else line.encode('utf-8'))
+    assert output.close() == (text if PY3 else data)
+
+    output = OutputBuffer(max_size=10)
+    assert output.append(b'12345')
+    assert not output.append(b'67890abc')
+    assert output.truncated
+    assert output.close() == ('1234567890' if PY3 else b'1234567890')
+
+    if PY3:
+        # The cut splits the two bytes of the "e" with an accent, which is left out
+        output = OutputBuffer(max_size=10)
+        assert not output.append(b'abcdefghi\xc3\xa9xyz\n')
+        assert output.close() == 'abcdefghi'
+
+    if PY3:
+        # Not UTF-8 after all, so it's decoded like before
+        data = b'\xc3\xa4' * 10 + b'\xff\xfe'
+        output = OutputBuffer()
+        output.append(data[:5])
+        output.append(data[5:])
+        assert output.close() == safe_decode(data)
@@ -0,0 +1,82 @@
+from __future__ import (absolute_import, division, print_function)
+
+import os
+
+import pytest
+
+from ranger.core import preview_cache
+from ranger.core.preview_cache import PreviewCache
+
+
+@pytest.fixture(name='cache')
+def fixture_cache(cachedir):  # pylint: disable=unused-argument
+    cache = PreviewCache(max_bytes=100)
+    cache.persistent = True
+    return cache
+
+
+def test_least_recently_used_previews_are_dropped(cache):
+    cache['/a'] = {'loading': False, (80, 24): 'a' * 40}
+    cache['/b'] = {'loading': True}
+    cache['/c'] = {'loading': False, (80, 24): 'c' * 40}
+    cache.touch('/a')
+    cache['/b'][(80, 24)] = 'b' * 40
+    cache.update_size('/b')
+    # /c is the least recently used one that isn't loading
+    assert '/c' not in cache
+    assert cache.size == 80
+
+    cache['/d'] = {'loading': False, (-1, -1): 'd' * 40}
+    assert '/a' not in cache
+    assert sorted(path for path in ('/a', '/b', '/c', '/d') if path in cache) == ['/b', '/d']
+
+
+def test_stored_previews(tmpdir, cache):
+    tmpdir.join('file').write('content')
+    script = tmpdir.join('script')
+    script.write('')
+    fstat = os.stat(str(tmpdir.join('file')))
+    key = cache.get_file_key(fstat, os.stat(str(script)), False)
+    assert cache.load(key, 80, 24) is None
+
+    cache.store(key, (80, -1), 'preview')
+    assert cache.load(key, 80, 24) == ((80, -1), 'preview')
+    assert cache.load(key, 100, 24) is None
+    cache.store(key, (-1, -1), None)
+    assert cache.load(key, 100, 24) == ((-1, -1), None)
+
+    # Changing the file changes the key
+    os.utime(str(tmpdir.join('file')), (fstat.st_atime, fstat.st_mtime + 10))
+    assert cache.get_file_key(os.stat(str(tmpdir.join('file'))),
+                              os.stat(str(script)), False) != key
+
+    cache.clear(disk=True)
+    assert cache.load(key, 100, 24) is None
+
+
+def test_oldest_stored_previews_are_pruned(tmpdir, cache, monkeypatch):
+    monkeypatch.setattr(preview_cache, 'MAX_STORED_PREVIEWS', 2)
+    tmpdir.join('script').write('')
+    script_stat = os.stat(str(tmpdir.join('script')))
+    keys = []
+    for i in range(3):
+        tmpdir.join(str(i)).write(str(i))
+        keys.append(cache.get_file_key(os.stat(str(tmpdir.join(str(i)))), script_stat, False))
+        cache.store(keys[-1], (-1, -1), str(i))
+    for i, key in enumerate(keys):
+        os.utime(os.path.join(cache.path, '%s--1--1' % key), (i, i))
+    cache.prune()
+    assert cache.load(keys[0], 80, 24) is None
+    assert cache.load(keys[1], 80, 24) == ((-1, -1), '1')
+    assert cache.load(keys[2], 80, 24) == ((-1, -1), '2')
+
+
+@pytest.mark.usefixtures('cachedir')
+def test_nothing_is_stored_by_default(tmpdir):
+    cache = PreviewCache()
+    tmpdir.join('script').write('')
+    script_stat = os.stat(str(tmpdir.join('script')))
+    key = cache.get_file_key(script_stat, script_stat, False)
+    cache.store(key, (-1, -1), 'preview')
+    assert cache.load(key, 80, 24) is None
+    assert not os.path.exists(cache.path)
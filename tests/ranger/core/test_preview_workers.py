@@ -0,0 +1,43 @@
+from __future__ import (absolute_import, division, print_function)
+
+import os
+
+import pytest
+
+from ranger.core.preview_workers import PreviewWorker, is_bash_script
+from ranger.ext.which import which
+
+
+def _read_reply(worker):
+    reply = b''
+    while not (worker.marker in reply and reply.endswith(b'\n')):
+        reply += os.read(worker.fileno(), 4096)
+    output, code = reply.split(worker.marker)
+    return output, int(code)
+
+
+def test_is_bash_script(tmpdir):
+    script = tmpdir.join('scope.sh')
+    script.write('#!/usr/bin/env bash\nexit 1\n')
+    assert is_bash_script(str(script))
+    script.write('#!/bin/sh\nexit 1\n')
+    assert not is_bash_script(str(script))
+    assert not is_bash_script(str(tmpdir.join('missing')))
+
+
+@pytest.mark.skipif(not which('bash'), reason="needs bash")
+def test_worker_runs_requests(tmpdir):
+    script = tmpdir.join('scope.sh')
+    script.write('#!/usr/bin/env bash\n'
+                 'printf "%s %s" "$1" "$2"\n'
+                 '[ "$1" = "no preview" ] && exit 1\n'
+                 'exit 5\n')
+    worker = PreviewWorker(str(script))
+    try:
+        assert worker.request(['a file\nwith a newline', '80', '24', '', 'False'])
+        assert _read_reply(worker) == (b'a file\nwith a newline 80', 5)
+        assert worker.request(['no preview', '80', '24', '', 'False'])
+        assert _read_reply(worker) == (b'no preview 80', 1)
+    finally:
+        worker.kill()
+    assert not worker.alive()
@@ -0,0 +1,68 @@
+from __future__ import (absolute_import, division, print_function)
+
+import os
+
+from ranger.core.thumbnail_cache import ThumbnailCache
+
+
+def _make_image(cachedir, char, size):
+    name = char * 128 + '.jpg'
+    cachedir.join(name).write('x' * size)
+    return name
+
+
+def test_images_are_found_through_the_index(cachedir):
+    old = _make_image(cachedir, 'a', 10)
+    cache = ThumbnailCache()
+    mtime = os.path.getmtime(str(cachedir.join(old)))
+    assert cache.get(old, mtime) == str(cachedir.join(old))
+    assert cache.get(old, mtime + 1) is None
+    new = _make_image(cachedir, 'b', 20)
+    # Only images that were there at first or were added are known
+    assert cache.get(new, 0) is None
+    cache.add(new, '/some/file')
+    assert cache.get(new, 0) is not None
+    assert cache.size == 30
+    cache.save()
+    assert len(ThumbnailCache()) == 2
+
+
+def test_least_recently_shown_images_are_removed(cachedir):
+    cache = ThumbnailCache(max_bytes=100)
+    for char in 'abc':
+        cache.add(_make_image(cachedir, char, 40))
+        cache.get(char * 128 + '.jpg', 0)
+    # Adding c took them over the limit, a was shown the longest time ago
+    assert not cachedir.join('a' * 128 + '.jpg').exists()
+    assert cache.size == 80
+    assert cache.prune(40) == (1, 40)
+    assert cachedir.join('c' * 128 + '.jpg').exists()
+
+
+def test_images_of_removed_files_are_pruned(cachedir, tmpdir):
+    source = tmpdir.join('picture')
+    source.write('')
+    cache = ThumbnailCache()
+    cache.add(_make_image(cachedir, 'a', 10), str(source))
+    cache.add(_make_image(cachedir, 'b', 10), str(tmpdir.join('missing')))
+    assert cache.prune(check_sources=True) == (1, 10)
+    assert cachedir.join('a' * 128 + '.jpg').exists()
+
+
+def test_images_removed_behind_the_index_are_dropped(cachedir):
+    name = _make_image(cachedir, 'a', 10)
+    cache = ThumbnailCache()
+    assert len(cache) == 1
+    cachedir.join(name).remove()
+    assert cache.get(name, 0) is None
+    assert len(cache) == 0
+    assert cache.size == 0
+
+
+def test_clear_removes_all_images(cachedir):
+    cache = ThumbnailCache()
+    for char in 'ab':
+        cache.add(_make_image(cachedir, char, 10))
+    assert cache.clear() == (2, 20)
+    assert not cachedir.join('a' * 128 + '.jpg').exists()
+    assert len(ThumbnailCache()) == 0
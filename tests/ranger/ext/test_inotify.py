@@ -0,0 +1,21 @@
+from __future__ import (absolute_import, division, print_function)
+
+import pytest
+
+from ranger.ext import inotify
+
+
+@pytest.mark.skipif(not inotify.is_available(), reason="inotify is not available")
+def test_create_and_modify_events(tmpdir):
+    notifier = inotify.Inotify()
+    try:
+        wd = notifier.add_watch(str(tmpdir), inotify.IN_CREATE | inotify.IN_MODIFY)
+        assert not notifier.read_events()
+        tmpdir.join('file').write('content')
+        events = notifier.read_events()
+        assert (wd, inotify.IN_CREATE, 0, 'file') in events
+        assert (wd, inotify.IN_MODIFY, 0, 'file') in events
+        notifier.rm_watch(wd)
+        assert [mask for _, mask, _, _ in notifier.read_events()] == [inotify.IN_IGNORED]
+    finally:
+        notifier.close()
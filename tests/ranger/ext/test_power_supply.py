@@ -0,0 +1,25 @@
+from __future__ import (absolute_import, division, print_function)
+
+from ranger.ext.power_supply import on_battery
+
+
+def _add_supply(tmpdir, name, supply_type, online=None):
+    supply = tmpdir.mkdir(name)
+    supply.join('type').write(supply_type + '\n')
+    if online is not None:
+        supply.join('online').write(online + '\n')
+
+
+def test_on_battery(tmpdir):
+    path = str(tmpdir)
+    assert not on_battery(path)
+    _add_supply(tmpdir, 'BAT0', 'Battery')
+    assert on_battery(path)
+    _add_supply(tmpdir, 'AC', 'Mains', '0')
+    assert on_battery(path)
+    tmpdir.join('AC', 'online').write('1\n')
+    assert not on_battery(path)
+
+
+def test_without_sysfs(tmpdir):
+    assert not on_battery(str(tmpdir.join('missing')))
@@ -2,7 +2,8 @@ from __future__ import (absolute_import, division, print_function)
 
 import os
 
-from ranger.ext.shutil_generatorized import move
+from ranger.ext import shutil_generatorized
+from ranger.ext.shutil_generatorized import copyfile, copyfileobj, move
 
 
 def consume(generator):
@@ -147,3 +148,36 @@ def test_move_symlink_to_file_into_directory(tmpdir):
     with open(moved, encoding="utf-8") as f:
         assert f.read() == "data"
     assert not os.path.lexists(symlink)
+
+
+def test_copyfile_methods(tmpdir):
+    data = os.urandom(3 * shutil_generatorized.BLOCK_SIZE + 5)
+    src = tmpdir.join("src")
+    src.write_binary(data)
+
+    consume(copyfile(str(src), str(tmpdir.join("dst"))))
+    assert tmpdir.join("dst").read_binary() == data
+
+    # pylint: disable=protected-access
+    for copy_function in [copyfileobj] + shutil_generatorized._KERNEL_COPY_FUNCTIONS:
+        dst = tmpdir.join(copy_function.__name__)
+        with open(str(src), 'rb') as fsrc:
+            with open(str(dst), 'wb') as fdst:
+                progress = list(copy_function(fsrc, fdst))
+        assert dst.read_binary() == data
+        # The chunks grow, so there are fewer steps than with fixed blocks
+        assert progress[-1] == len(data)
+        assert len(progress) == 3
+
+
+def test_copyfile_resumes_at_offset(tmpdir):
+    data = os.urandom(2 * shutil_generatorized.BLOCK_SIZE)
+    src = tmpdir.join("src")
+    src.write_binary(data)
+    dst = tmpdir.join("dst")
+    # A copy that was interrupted, with garbage after what was journaled
+    dst.write_binary(data[:1000] + b"garbage")
+
+    progress = list(copyfile(str(src), str(dst), offset=1000))
+    assert dst.read_binary() == data
+    assert progress[-1] == len(data)
@@ -0,0 +1,62 @@
+from __future__ import (absolute_import, division, print_function)
+
+import threading
+import time
+
+from ranger.ext.thread_pool import Delay, Job, ThreadPool
+
+
+def test_lazy_job_runs_on_demand():
+    calls = []
+    job = Job(calls.append, (1,))
+    assert not calls
+    assert job.done()
+    assert calls == [1]
+    job.done()
+    assert calls == [1]
+
+
+def test_pool_runs_jobs():
+    pool = ThreadPool(3)
+    try:
+        jobs = [pool.submit(pow, i, 2) for i in range(20)]
+        assert [job.result() for job in jobs] == [i * i for i in range(20)]
+    finally:
+        pool.shutdown()
+
+
+def test_cancelled_job_is_skipped():
+    gate = threading.Event()
+    pool = ThreadPool(1)
+    try:
+        blocker = pool.submit(gate.wait)
+        calls = []
+        job = pool.submit(calls.append, 1)
+        job.cancel()
+        gate.set()
+        blocker.wait()
+        assert job.wait(5)
+        assert job.result() is None
+        assert not calls
+    finally:
+        pool.shutdown()
+
+
+def test_job_reraises_exception():
+    job = Job(int, ("not a number",))
+    try:
+        job.result()
+    except ValueError:
+        pass
+    else:
+        assert False, "ValueError expected"
+
+
+def test_delay_is_done_after_its_time():
+    delay = Delay(0.05)
+    assert not delay.done()
+    assert not delay.wait(0)
+    start = time.time()
+    assert delay.wait()
+    assert delay.done()
+    assert time.time() - start < 1
@@ -0,0 +1,136 @@
+from __future__ import (absolute_import, division, print_function)
+
+from io import BytesIO
+
+import pytest
+
+from ranger.ext.vcs import vcs as vcs_module
+from ranger.ext.vcs.git import Git
+from ranger.ext.vcs.vcs import Vcs, VcsRoot
+
+
+def _make_root(status_subpaths):
+    # Only the status lookups are tested, which need no directory object
+    root = VcsRoot.__new__(VcsRoot)
+    root.path = '/repo'
+    root.status_subpaths = status_subpaths
+    root.status_dirs = root._get_status_dirs(  # pylint: disable=protected-access
+        status_subpaths)
+    return root
+
+
+def test_directory_statuses():
+    root = _make_root({
+        'a/b/changed': 'changed',
+        'a/b/c/untracked': 'untracked',
+        'a/staged': 'staged',
+        'build': 'ignored',
+        'd/ignored': 'ignored',
+    })
+    assert root.status_subpath('/repo/a', is_directory=True) == 'untracked'
+    assert root.status_subpath('/repo/a/b', is_directory=True) == 'untracked'
+    assert root.status_subpath('/repo/a/b/c', is_directory=True) == 'untracked'
+    assert root.status_subpath('/repo/a/staged') == 'staged'
+    assert root.status_subpath('/repo/a/other') == 'sync'
+    # Ignored paths don't make their directories ignored
+    assert root.status_subpath('/repo/d', is_directory=True) == 'sync'
+    assert root.status_subpath('/repo/build/sub', is_directory=True) == 'ignored'
+    assert root._status_root() == 'untracked'  # pylint: disable=protected-access
+
+
+def test_root_without_statuses():
+    root = _make_root({'build': 'ignored'})
+    assert root._status_root() == 'sync'  # pylint: disable=protected-access
+
+
+class _FakeGit(Git):
+    def __init__(self, records):  # pylint: disable=super-init-not-called
+        self.records = records
+
+    def _run_records(self, args, path=None):
+        return iter(self.records)
+
+
+def test_git_status_v2():
+    git = _FakeGit([
+        '# branch.oid 0123456789abcdef0123456789abcdef01234567',
+        '# branch.head master',
+        '# branch.upstream origin/master',
+        '# branch.ab +2 -0',
+        '1 .M N... 100644 100644 100644 0123 0123 dir/with space',
+        '1 A. N... 000000 100644 100644 0000 0123 staged',
+        '2 R. N... 100644 100644 100644 0123 0123 R100 new',
+        'old',
+        'u UU N... 100644 100644 100644 100644 0123 0123 0123 conflict',
+        '? untracked/',
+        '! build/',
+    ])
+    branch, remote, statuses = git.data_status()
+    assert branch == 'master'
+    assert remote == 'ahead'
+    assert statuses == {
+        'dir/with space': 'changed',
+        'staged': 'staged',
+        'new': 'staged',
+        'conflict': 'conflict',
+        'untracked': 'untracked',
+        'build': 'ignored',
+    }
+
+
+def test_git_status_v2_detached():
+    branch, remote, statuses = _FakeGit([
+        '# branch.oid 0123456789abcdef0123456789abcdef01234567',
+        '# branch.head (detached)',
+    ]).data_status()
+    assert (branch, remote, statuses) == ('detached', 'none', {})
+
+
+def test_git_catfile_response():
+    # pylint: disable=protected-access
+    stdout = BytesIO(b'0123abcd commit 5\nhello\nHEAD^{commit} missing\n0123 commit 9\nshort\n')
+    assert Git._read_catfile_response(stdout) == ('0123abcd', 'commit', b'hello')
+    assert Git._read_catfile_response(stdout) is None
+    with pytest.raises(IOError):
+        Git._read_catfile_response(stdout)
+
+
+def _find_root(path, refresh=False):
+    vcs = Vcs.__new__(Vcs)
+    vcs.path = path
+    vcs.repotypes_settings = set(['git'])
+    return vcs._find_root(path, refresh)  # pylint: disable=protected-access
+
+
+def test_find_root_cache(tmpdir, monkeypatch):
+    monkeypatch.setattr(Vcs, '_root_cache', {})
+    repo = tmpdir.join('repo')
+    repo.join('.git').ensure(dir=True)
+    sub = repo.join('sub', 'dir').ensure(dir=True)
+    tmpdir.join('link').mksymlinkto(repo.join('sub'))
+
+    found = (str(repo), str(repo.join('.git')), 'git', set())
+    assert _find_root(str(sub)) == found
+    assert _find_root(str(tmpdir.join('link', 'dir'))) == \
+        (str(repo), str(repo.join('.git')), 'git', set([str(tmpdir.join('link'))]))
+
+    # A cached directory that became a repository is noticed without a refresh
+    sub.join('.git').ensure(dir=True)
+    assert _find_root(str(sub)) == (str(sub), str(sub.join('.git')), 'git', set())
+    assert _find_root(str(sub.join('new').ensure(dir=True))) == \
+        (str(sub), str(sub.join('.git')), 'git', set())
+    sub.join('.git').remove()
+    assert _find_root(str(sub), refresh=True) == found
+
+    # So is a cached repository that is gone
+    repo.join('.git').remove()
+    assert _find_root(str(repo.join('sub'))) == (None, None, None, None)
+    assert _find_root(str(sub)) == (None, None, None, None)
+
+
+def test_find_root_cache_is_bounded(tmpdir, monkeypatch):
+    monkeypatch.setattr(Vcs, '_root_cache', {})
+    monkeypatch.setattr(vcs_module, 'ROOT_CACHE_MAX_ENTRIES', 20)
+    for i in range(50):
+        _find_root(str(tmpdir.mkdir(str(i))))
+        assert len(Vcs._root_cache) <= 20  # pylint: disable=protected-access